@@ -6,14 +6,55 @@ Each subfolder corresponds to one ZIP release (e.g. "xxxx_TEOS_XML_01A").
 """
     # These lines bring in external functionality:
     #  - os (operating system): to work with file paths and directories
-    #  - pandas (pd): to build and save tables of data
+    #  - mmap, re: to peek at a file's raw bytes before deciding whether to parse it
+    #  - zipfile: to read XML files straight out of the IRS ZIP downloads
+    #  - multiprocessing: to parse files on several CPU cores at once
+    #  - threading: to read the next files in the background while the current one is parsed
+    #  - hashlib, sqlite3, time: to remember which files were already processed (resumable runs)
+    #  - json, sys: to keep extracted rows in the extraction cache, and its "cache" command
+    #  - pickle, tempfile: to park rows in a temporary file while duplicate filings are resolved
+    #  - heapq, time: to find the slowest and largest files for the timing report
+    #  - csv: to write output rows to the CSV as they are extracted
+    #  - datetime, glob, pyarrow (optional): to write typed Parquet / Arrow files instead of a CSV
     #  - BeautifulSoup: to parse XML content
+    #  - lxml (etree): a fast XML parser, used by the streaming extraction engine
     #  - tqdm: to show a progress bar when looping through many files
+import csv
+import datetime
+import glob
+import hashlib
+import heapq
+import io
+import json
+import mmap
+import multiprocessing
 import os
-import pandas as pd
+import pickle
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter, namedtuple
 from bs4 import BeautifulSoup
+from lxml import etree
 from tqdm import tqdm
 
+# pyarrow is only needed for output_format = "parquet" or "arrow"
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# numpy is only needed for validate_community_benefit = True
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
     # 1) PARENT FOLDER and output CSV
     # Here we tell the script where to find the XML folders (parent_folder)
     # and where to save the final combined data (output_csv)
@@ -21,6 +62,152 @@ from tqdm import tqdm
 parent_folder = r"C:\IRS990H_Parser\EIN zip files 2025"
 output_csv = r"C:\IRS990H_Parser\csv output\IRS 990H 2025.csv"
 
+    # Batch mode: to refresh several years in one run, set batch_root_folder to the folder that holds the
+    # "EIN zip files 20xx" folders (e.g. r"C:\IRS990H_Parser"). Every year folder found there is then extracted in turn,
+    # each into its own "IRS 990H 20xx.csv" in batch_output_folder (None means the "csv output" folder inside
+    # batch_root_folder), and all of them share one set of worker processes. parent_folder and output_csv are not used then.
+    # batch_years limits the run to some years, e.g. [2023, 2024, 2025]; None means every year folder found
+batch_root_folder = None
+batch_output_folder = None
+batch_years = None
+
+    # Which extraction engine reads each XML file:
+    #  - "streaming": walks each file once from top to bottom (much faster, recommended)
+    #  - "soup": the original BeautifulSoup extraction, kept as a reference to check the streaming engine against
+extraction_engine = "streaming"
+
+    # Pre-filter: most 990 filings have no Schedule H, so we check each file's raw bytes first
+    # and skip the ones that cannot produce a row before the XML parser ever sees them.
+    #  - prefilter_schedule_h: True = only parse files that contain an IRS990ScheduleH tag
+    #  - prefilter_return_types: only parse these header ReturnTypeCd values, e.g. {"990"} (None = any type)
+prefilter_schedule_h = True
+prefilter_return_types = None
+
+    # ZIP input: the IRS ZIP downloads (e.g. "2023_TEOS_XML_01A.zip") can be placed directly in parent_folder
+    # instead of being extracted into subfolders. Their XML files are read straight out of the ZIP.
+    # ZIP files and extracted subfolders can be mixed. If both "X.zip" and a subfolder "X" exist, only the subfolder is used.
+read_zip_archives = True
+
+    # Parallel extraction: parse files on several CPU cores at the same time
+    #  - num_workers: how many worker processes to use (1 = everything runs in this process, None = one per CPU core)
+    #  - chunk_size: how many files a worker is handed at a time
+    # The output rows come out in the same order no matter how many workers run.
+num_workers = 1
+chunk_size = 256
+
+    # Background reading: on slow disks, network drives and synced folders (OneDrive, Dropbox) most of the time goes into
+    # waiting for each file to be read. With prefetch_threads above 0, that many threads (per worker) read the next files
+    # ahead while the current one is parsed, so reading and parsing overlap instead of adding up.
+    #  - prefetch_threads: number of reading threads (0 = off, read each file right before it is parsed)
+    #  - prefetch_buffer_mb: how many MB of read-ahead files may wait in memory at once (per worker)
+prefetch_threads = 0
+prefetch_buffer_mb = 64
+
+    # Folder listings: on a network drive or synced folder, just listing a release folder with hundreds of thousands of
+    # files can take minutes. With reuse_folder_listings = True, each folder's listing is also saved ("folder listings.sqlite" in parent_folder) and
+    # used again by the next runs, for as long as no file is added to, removed from or renamed in that folder.
+reuse_folder_listings = False
+
+    # Resumable, incremental runs: when True, a small database ("IRS 990H 2025.manifest.sqlite") is kept next to
+    # output_csv that remembers every file already processed (size, modified time, content hash and outcome).
+    # Later runs skip unchanged files and only append rows for new or changed ones to the existing CSV.
+    # A changed file's old row is taken out of the CSV at the end of the run, so each file keeps one row.
+    # (With output_format "parquet"/"arrow", and for rows recorded by an older version of this script, the old row
+    # stays; the "Manifest:" line of each release counts these files. Delete the .manifest.sqlite file to rebuild.)
+    # Rows are written as they are extracted, so a run that crashed picks up where it stopped.
+    # The first run with this setting starts the CSV over. Delete the .manifest.sqlite file to start over again.
+resume_with_manifest = False
+
+    # Delta releases: the IRS now publishes a new release every month (2025_TEOS_XML_01A, 02A, 03A, ...).
+    # When True, a small record next to output_csv ("IRS 990H 2025.releases.json") lists the releases already in the
+    # output, and a run only extracts the releases (subfolders or ZIPs) that are not on it yet. Their rows are appended to
+    # the CSV (or added as new partitions with parquet/arrow) instead of writing the whole year again.
+    # The first run with this setting writes the output from scratch and starts the record.
+delta_releases = False
+
+    # Output format:
+    #  - "csv": one CSV file at output_csv, every value written as text
+    #  - "parquet" or "arrow": typed columns (amounts as whole numbers, Pct fields as decimals, Ind fields as True/False,
+    #    dates as dates) in a folder next to output_csv with the same name, e.g. "IRS 990H 2025", split by release:
+    #    IRS 990H 2025/IRS_RELEASEYEAR=2025/IRS_RELEASETEOS=2025_TEOS_XML_01A.zip/part-0.parquet
+    #    These two need pyarrow installed (pip install pyarrow).
+output_format = "csv"
+
+    # Typed values: when True, every value is converted to its column's type right when the file is extracted, using the
+    # kind in field_registry: amounts, counts and years become whole numbers, Pct fields decimals, Ind fields True/False and
+    # dates dates. Parquet / Arrow output then stores them as they are, and the CSV gets them in one consistent format
+    # (e.g. 0.0500 becomes 0.05, X becomes True). A value that does not fit (e.g. "N/A" in an amount) is left empty and
+    # counted: the run prints how many there were in which columns.
+typed_values = False
+
+    # Timing report: when True, the time spent reading, parsing and extracting every file (and writing every release's
+    # rows) is measured, and a summary is printed at the end: time per phase for each release, a histogram of file
+    # times, and the phase_timing_top slowest and largest files. With phase_timing_csv set to a file path,
+    # every file's timings are saved there as well. Leave it off for normal runs.
+phase_timing = False
+phase_timing_top = 10
+phase_timing_csv = None
+
+    # Filing index: when True, a small database ("filing index.sqlite" in parent_folder) lists every filing of every release
+    # with its EIN, tax year, tax period end date, return type, state, schema version and whether it has a Schedule H.
+    # A release is scanned into the index the first time it is seen (refresh_filing_index = True re-checks all releases
+    # for new or changed files). After that, only the filings that have a Schedule H and match the filters below are
+    # opened, instead of every file in the release. prefilter_return_types is used as a filter as well.
+    #  - filter_eins: e.g. {"123456789", "987654321"} (None = any EIN)
+    #  - filter_tax_years: e.g. {"2021", "2022"} (None = any year)
+    #  - filter_states: the filer's state, e.g. {"CA", "NY"} (None = any state)
+filing_index = False
+refresh_filing_index = False
+filter_eins = None
+filter_tax_years = None
+filter_states = None
+
+    # Column selection: None writes every column. To write only some, list IRS_* column names and/or these groups:
+    #  - "release": the 4 release columns          - "metadata": file name, tax period, preparation date and filer
+    #  - "outside_financials": the core 990 fields  - "part1", "part2", "part3", "part4": Schedule H Parts I to IV
+    #  - "facilities": Part V facility list and types    - "part5_policies": Part V Section B facility policies (CHNA, FAP, ...)
+    #  - "other_facilities": Part V non-hospital health care facilities
+    # e.g. selected_columns = {"metadata", "outside_financials", "IRS_TCBNNCBEA", "part3"}
+    # With the streaming engine, unselected columns are never searched for, and a file stops being read
+    # as soon as every selected column has been found.
+selected_columns = None
+
+    # Facility table: when True, a second output lists every hospital facility of every filing, one row each
+    # (the main output only has the first two facilities as columns): the filing's EIN, tax year and file, the facility's
+    # number, name, address and type, and its own Part V Section B policy block. It is written next to the main output
+    # with " facilities" added to the name, e.g. "IRS 990H 2025 facilities.csv" (or folder, for Parquet / Arrow).
+    # It needs the streaming engine.
+facility_table = False
+
+    # Extraction cache: a database shared by all runs (e.g. r"C:\IRS990H_Parser\extraction cache.sqlite") that keeps what
+    # was extracted from every filing, keyed by the file's content. A filing that was extracted before (in another release,
+    # or in an earlier run of the same year) is then neither read nor parsed again.
+    #  - extraction_cache: path of the cache database (None = off)
+    #  - extraction_cache_mb: size limit in MB; at the end of a run the least recently used filings are removed to stay under it
+    # To see what is in it or make it smaller, run: python "Parsing Code.py" cache info   (or: cache prune, cache clear)
+extraction_cache = None
+extraction_cache_mb = 2048
+
+    # Duplicate filings: one organization and tax period can have several filings (an original and an amended return,
+    # or the same filing in two releases). With dedupe_policy set, only one row per (filer EIN, tax period end) is written.
+    # The policy lists what decides which row is kept, most important first:
+    #  - "amended": an amended return wins over the original (the AmendedReturnInd box of the Form 990, not an output column)
+    #  - "preparation_date": the latest PreparationDt wins
+    #  - "release": the latest release wins (by ReleaseYear, then ReleaseDownload, then the release folder/ZIP name)
+    # When the policy cannot tell two rows apart, the one processed last is kept.
+    # e.g. dedupe_policy = ("amended", "preparation_date", "release"), or just "release"   (None = keep every row)
+    # It cannot be combined with resume_with_manifest, since rows of earlier runs are already in the output.
+dedupe_policy = None
+
+    # Community benefit checks: when True, the rows are checked while they are written, in batches, for Part I and II:
+    #  - every line's NetCommunityBenefitExpnsAmt = TotalCommunityBenefitExpnsAmt - DirectOffsettingRevenueAmt
+    #  - the total lines (Part I lines 7d, 7j and 7k, Part II line 10) equal the sum of their lines, for all three amounts
+    # An empty amount counts as 0. The run prints how many rows break each rule, and every broken rule of every row is
+    # listed in "IRS 990H 2025.validation.csv" next to the output. It needs numpy (pip install numpy).
+    # validation_tolerance is how many dollars an amount may be off before it counts (0 = it has to add up exactly)
+validate_community_benefit = False
+validation_tolerance = 0
+
     # This big dictionary maps each subfolder name to metadata about that release:
     #  - ReleaseYear: the IRS data year
     #  - ReleaseSource: the URL where the ZIP originally came from
@@ -518,710 +705,408 @@ release_info_for_subfolder = {
     },
 }
 
-    # These lists ("release_columns" all the way to "columns_order") tell pandas which columns to include and in what order
-    # They correspond to pieces of data we will pull out of each XML file
-# Release columns
-release_columns = [
-    "ReleaseYear",
-    "ReleaseSource",
-    "ReleaseDownload",
-    "ReleaseFileName",
-]
+    # FIELD REGISTRY
+    # Every output column is declared once, here, in the order it appears in the output:
+    #  - name: the short IRS_* column name written to the output
+    #  - raw_name: the long XML-style name the script uses internally (e.g. in the BeautifulSoup engine)
+    #  - path: where the value is found, starting at the top of the filing.
+    #    "IRS990ScheduleH/ResearchGrp/TotalExpensePct" means the first <TotalExpensePct> inside the first <ResearchGrp>
+    #    inside <IRS990ScheduleH>, the same as soup.find("IRS990ScheduleH").find("ResearchGrp").find("TotalExpensePct").
+    #    None means the value is filled in after the file is read (see finish_streaming_row): the release info and
+    #    file name, the filer's country, the facility list, the first two facilities and SupplementalFacilityNum.
+    #    The filer address paths point at <USAddress>; a foreign address fills the same columns when there is no US one.
+    #  - kind: "int", "float", "bool", "date" or "string", the column's type in Parquet / Arrow output, or "category" for
+    #    text with only a few different values (states, countries, codes, release names), stored as a dictionary column
+    #    that pandas loads as a categorical
+    # To add a column, add one Field line. The streaming engine compiles the registry once at startup
+    # into row positions (see compile_streaming_plan), so each row is filled directly in output order.
+Field = namedtuple("Field", ["name", "raw_name", "path", "kind"])
 
-# Base Metadata
-base_columns = [
-    "FileName", "TaxPeriodBeginDt", "TaxPeriodEndDt", "TaxYr", "PreparationDt",
-    "Filer_EIN", "Filer_BusinessName", "Filer_BusinessNameControlTxt", "Filer_PhoneNum",
-    "Filer_AddressLine1Txt", "Filer_CityNm", "Filer_StateAbbreviationCd", "Filer_ZIPCd", "Filer_Country"
-]
+def community_benefit_group(group, code):
+    """The four columns every Part I / Part II group has, e.g. IRS_FAACTCBEA to IRS_FAACNCBEP for code "FAAC"."""
+    return [
+        Field(f"IRS_{code}TCBEA", f"{group}_TotalCommunityBenefitExpnsAmt", f"IRS990ScheduleH/{group}/TotalCommunityBenefitExpnsAmt", "int"),
+        Field(f"IRS_{code}DORVA", f"{group}_DirectOffsettingRevenueAmt", f"IRS990ScheduleH/{group}/DirectOffsettingRevenueAmt", "int"),
+        Field(f"IRS_{code}NCBEA", f"{group}_NetCommunityBenefitExpnsAmt", f"IRS990ScheduleH/{group}/NetCommunityBenefitExpnsAmt", "int"),
+        Field(f"IRS_{code}NCBEP", f"{group}_TotalExpensePct", f"IRS990ScheduleH/{group}/TotalExpensePct", "float"),
+    ]
 
-# “Outside” core 990 fields
-outside_fields = [
-    "TotalEmployeeCnt",
-    "TotalGrossUBIAmt",
-    "NetUnrelatedBusTxblIncmAmt",
-    "PYContributionsGrantsAmt",
-    "CYContributionsGrantsAmt",
-    "PYProgramServiceRevenueAmt",
-    "CYProgramServiceRevenueAmt",
-    "PYInvestmentIncomeAmt",
-    "CYInvestmentIncomeAmt",
-    "PYOtherRevenueAmt",
-    "CYOtherRevenueAmt",
-    "PYTotalRevenueAmt",
-    "CYTotalRevenueAmt",
-    "PYGrantsAndSimilarPaidAmt",
-    "CYGrantsAndSimilarPaidAmt",
-    "PYBenefitsPaidToMembersAmt",
-    "CYBenefitsPaidToMembersAmt",
-    "PYSalariesCompEmpBnftPaidAmt",
-    "CYSalariesCompEmpBnftPaidAmt",
-    "PYTotalProfFndrsngExpnsAmt",
-    "CYTotalProfFndrsngExpnsAmt",
-    "CYTotalFundraisingExpenseAmt",
-    "PYOtherExpensesAmt",
-    "CYOtherExpensesAmt",
-    "PYTotalExpensesAmt",
-    "CYTotalExpensesAmt",
-    "PYRevenuesLessExpensesAmt",
-    "CYRevenuesLessExpensesAmt",
-    "TotalAssetsBOYAmt",
-    "TotalAssetsEOYAmt",
-    "TotalLiabilitiesBOYAmt",
-    "TotalLiabilitiesEOYAmt",
-    "NetAssetsOrFundBalancesBOYAmt",
-    "NetAssetsOrFundBalancesEOYAmt",
-]
+field_registry = [
+    # Release columns (filled from release_info_for_subfolder)
+    Field("IRS_RELEASEYEAR", "ReleaseYear", None, "category"),
+    Field("IRS_RELEASESITE", "ReleaseSource", None, "category"),
+    Field("IRS_RELEASEDOWN", "ReleaseDownload", None, "date"),
+    Field("IRS_RELEASETEOS", "ReleaseFileName", None, "category"),
 
-# Part I – Basic FAP & Inds
-part1_basic_fields = [
-    "FinancialAssistancePolicy",
-    "WrittenPolicyInd",
-    "HospitalPolicyInd_AllHospitalsPolicyInd",
-    "HospitalPolicyInd_MostHospitalsPolicyInd",
-    "HospitalPolicyInd_IndivHospitalTailoredPolicyInd",
-    "FPGReferenceFreeCareInd_Percent100Ind",
-    "FPGReferenceFreeCareInd_Percent150Ind",
-    "FPGReferenceFreeCareInd_Percent200Ind",
-    "FPGReferenceFreeCareInd_FreeCareOtherPct",
-    "FPGReferenceDiscountedCareInd_Percent200DInd",
-    "FPGReferenceDiscountedCareInd_Percent250Ind",
-    "FPGReferenceDiscountedCareInd_Percent300Ind",
-    "FPGReferenceDiscountedCareInd_Percent350Ind",
-    "FPGReferenceDiscountedCareInd_Percent400Ind",
-    "FPGReferenceDiscountedCareInd_DiscountedCareOthPercentageGrp",
-    "FreeCareMedicallyIndigentInd",
-    "FinancialAssistanceBudgetInd",
-    "ExpensesExceedBudgetInd",
-    "UnableToProvideCareInd",
-    "AnnualCommunityBnftReportInd",
-    "ReportPublicallyAvailableInd",
-]
+    # Base Metadata
+    Field("IRS_RELEASEXML", "FileName", None, "string"),
+    Field("IRS_TAXPERBEGDT", "TaxPeriodBeginDt", "ReturnHeader/TaxPeriodBeginDt", "date"),
+    Field("IRS_TAXPERENDDT", "TaxPeriodEndDt", "ReturnHeader/TaxPeriodEndDt", "date"),
+    Field("IRS_TAXYEAR", "TaxYr", "ReturnHeader/TaxYr", "int"),
+    Field("IRS_PREPAREDT", "PreparationDt", "ReturnHeader/PreparerPersonGrp/PreparationDt", "date"),
+    Field("IRS_FILER_EIN", "Filer_EIN", "Filer/EIN", "string"),
+    Field("IRS_FLRBUSNAME", "Filer_BusinessName", "Filer/BusinessName/BusinessNameLine1Txt", "string"),
+    Field("IRS_FLRBUSNMTXT", "Filer_BusinessNameControlTxt", "Filer/BusinessNameControlTxt", "string"),
+    Field("IRS_FLRPHONENUM", "Filer_PhoneNum", "Filer/PhoneNum", "string"),
+    Field("IRS_FLRADDRESS", "Filer_AddressLine1Txt", "Filer/USAddress/AddressLine1Txt", "string"),
+    Field("IRS_FLRCITYNAME", "Filer_CityNm", "Filer/USAddress/CityNm", "string"),
+    Field("IRS_FLRSTATEABB", "Filer_StateAbbreviationCd", "Filer/USAddress/StateAbbreviationCd", "category"),
+    Field("IRS_FLRZIPCODE", "Filer_ZIPCd", "Filer/USAddress/ZIPCd", "string"),
+    Field("IRS_FLRCOUNTRY", "Filer_Country", None, "category"),
 
-fa_at_cost_fields = [
-    "FinancialAssistanceAtCostTyp_TotalCommunityBenefitExpnsAmt",
-    "FinancialAssistanceAtCostTyp_DirectOffsettingRevenueAmt",
-    "FinancialAssistanceAtCostTyp_NetCommunityBenefitExpnsAmt",
-    "FinancialAssistanceAtCostTyp_TotalExpensePct"
-]
-unreimbursed_fields = [
-    "UnreimbursedMedicaidGrp_TotalCommunityBenefitExpnsAmt",
-    "UnreimbursedMedicaidGrp_DirectOffsettingRevenueAmt",
-    "UnreimbursedMedicaidGrp_NetCommunityBenefitExpnsAmt",
-    "UnreimbursedMedicaidGrp_TotalExpensePct"
-]
-other_means_tested_fields = [
-    "UnreimbursedCostsGrp_TotalCommunityBenefitExpnsAmt",
-    "UnreimbursedCostsGrp_DirectOffsettingRevenueAmt",
-    "UnreimbursedCostsGrp_NetCommunityBenefitExpnsAmt",
-    "UnreimbursedCostsGrp_TotalExpensePct"
-]
-total_fa_fields = [
-    "TotalFinancialAssistanceTyp_TotalCommunityBenefitExpnsAmt",
-    "TotalFinancialAssistanceTyp_DirectOffsettingRevenueAmt",
-    "TotalFinancialAssistanceTyp_NetCommunityBenefitExpnsAmt",
-    "TotalFinancialAssistanceTyp_TotalExpensePct"
-]
-community_health_fields = [
-    "CommunityHealthServicesGrp_TotalCommunityBenefitExpnsAmt",
-    "CommunityHealthServicesGrp_DirectOffsettingRevenueAmt",
-    "CommunityHealthServicesGrp_NetCommunityBenefitExpnsAmt",
-    "CommunityHealthServicesGrp_TotalExpensePct"
-]
-health_prof_fields = [
-    "HealthProfessionsEducationGrp_TotalCommunityBenefitExpnsAmt",
-    "HealthProfessionsEducationGrp_DirectOffsettingRevenueAmt",
-    "HealthProfessionsEducationGrp_NetCommunityBenefitExpnsAmt",
-    "HealthProfessionsEducationGrp_TotalExpensePct"
-]
-subsidized_fields = [
-    "SubsidizedHealthServicesGrp_TotalCommunityBenefitExpnsAmt",
-    "SubsidizedHealthServicesGrp_DirectOffsettingRevenueAmt",
-    "SubsidizedHealthServicesGrp_NetCommunityBenefitExpnsAmt",
-    "SubsidizedHealthServicesGrp_TotalExpensePct"
-]
-research_fields = [
-    "ResearchGrp_TotalCommunityBenefitExpnsAmt",
-    "ResearchGrp_DirectOffsettingRevenueAmt",
-    "ResearchGrp_NetCommunityBenefitExpnsAmt",
-    "ResearchGrp_TotalExpensePct"
-]
-cash_in_kind_fields = [
-    "CashAndInKindContributionsGrp_TotalCommunityBenefitExpnsAmt",
-    "CashAndInKindContributionsGrp_DirectOffsettingRevenueAmt",
-    "CashAndInKindContributionsGrp_NetCommunityBenefitExpnsAmt",
-    "CashAndInKindContributionsGrp_TotalExpensePct"
-]
-total_other_fields = [
-    "TotalOtherBenefitsGrp_TotalCommunityBenefitExpnsAmt",
-    "TotalOtherBenefitsGrp_DirectOffsettingRevenueAmt",
-    "TotalOtherBenefitsGrp_NetCommunityBenefitExpnsAmt",
-    "TotalOtherBenefitsGrp_TotalExpensePct"
-]
-total_community_fields = [
-    "TotalCommunityBenefitsGrp_TotalCommunityBenefitExpnsAmt",
-    "TotalCommunityBenefitsGrp_DirectOffsettingRevenueAmt",
-    "TotalCommunityBenefitsGrp_NetCommunityBenefitExpnsAmt",
-    "TotalCommunityBenefitsGrp_TotalExpensePct"
-]
+    # “Outside” core 990 fields
+    Field("IRS_TOTEMPCNT", "TotalEmployeeCnt", "IRS990/TotalEmployeeCnt", "int"),
+    Field("IRS_TOTGRUBIAMT", "TotalGrossUBIAmt", "IRS990/TotalGrossUBIAmt", "int"),
+    Field("IRS_NETUBIAMT", "NetUnrelatedBusTxblIncmAmt", "IRS990/NetUnrelatedBusTxblIncmAmt", "int"),
+    Field("IRS_PYCNTGRTAMT", "PYContributionsGrantsAmt", "IRS990/PYContributionsGrantsAmt", "int"),
+    Field("IRS_CYCNTGRTAMT", "CYContributionsGrantsAmt", "IRS990/CYContributionsGrantsAmt", "int"),
+    Field("IRS_PYPSREVAMT", "PYProgramServiceRevenueAmt", "IRS990/PYProgramServiceRevenueAmt", "int"),
+    Field("IRS_CYPSREVAMT", "CYProgramServiceRevenueAmt", "IRS990/CYProgramServiceRevenueAmt", "int"),
+    Field("IRS_PYINVINCAMT", "PYInvestmentIncomeAmt", "IRS990/PYInvestmentIncomeAmt", "int"),
+    Field("IRS_CYINVINCAMT", "CYInvestmentIncomeAmt", "IRS990/CYInvestmentIncomeAmt", "int"),
+    Field("IRS_PYOTHREVAMT", "PYOtherRevenueAmt", "IRS990/PYOtherRevenueAmt", "int"),
+    Field("IRS_CYOTHREVAMT", "CYOtherRevenueAmt", "IRS990/CYOtherRevenueAmt", "int"),
+    Field("IRS_PYTOTREVAMT", "PYTotalRevenueAmt", "IRS990/PYTotalRevenueAmt", "int"),
+    Field("IRS_CYTOTREVAMT", "CYTotalRevenueAmt", "IRS990/CYTotalRevenueAmt", "int"),
+    Field("IRS_PYGASPAIAMT", "PYGrantsAndSimilarPaidAmt", "IRS990/PYGrantsAndSimilarPaidAmt", "int"),
+    Field("IRS_CYGASPAIAMT", "CYGrantsAndSimilarPaidAmt", "IRS990/CYGrantsAndSimilarPaidAmt", "int"),
+    Field("IRS_PYBENPTMAMT", "PYBenefitsPaidToMembersAmt", "IRS990/PYBenefitsPaidToMembersAmt", "int"),
+    Field("IRS_CYBENPTMAMT", "CYBenefitsPaidToMembersAmt", "IRS990/CYBenefitsPaidToMembersAmt", "int"),
+    Field("IRS_PYSCEBPAMT", "PYSalariesCompEmpBnftPaidAmt", "IRS990/PYSalariesCompEmpBnftPaidAmt", "int"),
+    Field("IRS_CYSCEBPAMT", "CYSalariesCompEmpBnftPaidAmt", "IRS990/CYSalariesCompEmpBnftPaidAmt", "int"),
+    Field("IRS_PYTPFEXPAMT", "PYTotalProfFndrsngExpnsAmt", "IRS990/PYTotalProfFndrsngExpnsAmt", "int"),
+    Field("IRS_CYTPFEXPAMT", "CYTotalProfFndrsngExpnsAmt", "IRS990/CYTotalProfFndrsngExpnsAmt", "int"),
+    Field("IRS_CYTFEXPAMT", "CYTotalFundraisingExpenseAmt", "IRS990/CYTotalFundraisingExpenseAmt", "int"),
+    Field("IRS_PYOTHEXPAMT", "PYOtherExpensesAmt", "IRS990/PYOtherExpensesAmt", "int"),
+    Field("IRS_CYOTHEXPAMT", "CYOtherExpensesAmt", "IRS990/CYOtherExpensesAmt", "int"),
+    Field("IRS_PYTOTEXPAMT", "PYTotalExpensesAmt", "IRS990/PYTotalExpensesAmt", "int"),
+    Field("IRS_CYTOTEXPAMT", "CYTotalExpensesAmt", "IRS990/CYTotalExpensesAmt", "int"),
+    Field("IRS_PYREVLEXAMT", "PYRevenuesLessExpensesAmt", "IRS990/PYRevenuesLessExpensesAmt", "int"),
+    Field("IRS_CYREVLEXAMT", "CYRevenuesLessExpensesAmt", "IRS990/CYRevenuesLessExpensesAmt", "int"),
+    Field("IRS_TLASSBOYAMT", "TotalAssetsBOYAmt", "IRS990/TotalAssetsBOYAmt", "int"),
+    Field("IRS_TLASSEOYAMT", "TotalAssetsEOYAmt", "IRS990/TotalAssetsEOYAmt", "int"),
+    Field("IRS_TLLBLBOYAMT", "TotalLiabilitiesBOYAmt", "IRS990/TotalLiabilitiesBOYAmt", "int"),
+    Field("IRS_TLLBLEOYAMT", "TotalLiabilitiesEOYAmt", "IRS990/TotalLiabilitiesEOYAmt", "int"),
+    Field("IRS_NAOFBBOYAMT", "NetAssetsOrFundBalancesBOYAmt", "IRS990/NetAssetsOrFundBalancesBOYAmt", "int"),
+    Field("IRS_NAOFBEOYAMT", "NetAssetsOrFundBalancesEOYAmt", "IRS990/NetAssetsOrFundBalancesEOYAmt", "int"),
 
-# Part II – Detailed Community Building
-part2_cb_physical = [
-    "PhysicalImprvAndHousingGrp_TotalCommunityBenefitExpnsAmt",
-    "PhysicalImprvAndHousingGrp_DirectOffsettingRevenueAmt",
-    "PhysicalImprvAndHousingGrp_NetCommunityBenefitExpnsAmt",
-    "PhysicalImprvAndHousingGrp_TotalExpensePct"
-]
-part2_cb_economic = [
-    "EconomicDevelopmentGrp_TotalCommunityBenefitExpnsAmt",
-    "EconomicDevelopmentGrp_DirectOffsettingRevenueAmt",
-    "EconomicDevelopmentGrp_NetCommunityBenefitExpnsAmt",
-    "EconomicDevelopmentGrp_TotalExpensePct"
-]
-part2_cb_communitysupport = [
-    "CommunitySupportGrp_TotalCommunityBenefitExpnsAmt",
-    "CommunitySupportGrp_DirectOffsettingRevenueAmt",
-    "CommunitySupportGrp_NetCommunityBenefitExpnsAmt",
-    "CommunitySupportGrp_TotalExpensePct"
-]
-part2_cb_environment = [
-    "EnvironmentalImprovementsGrp_TotalCommunityBenefitExpnsAmt",
-    "EnvironmentalImprovementsGrp_DirectOffsettingRevenueAmt",
-    "EnvironmentalImprovementsGrp_NetCommunityBenefitExpnsAmt",
-    "EnvironmentalImprovementsGrp_TotalExpensePct"
-]
-part2_cb_leadership = [
-    "LeadershipDevelopmentGrp_TotalCommunityBenefitExpnsAmt",
-    "LeadershipDevelopmentGrp_DirectOffsettingRevenueAmt",
-    "LeadershipDevelopmentGrp_NetCommunityBenefitExpnsAmt",
-    "LeadershipDevelopmentGrp_TotalExpensePct"
-]
-part2_cb_coalition = [
-    "CoalitionBuildingGrp_TotalCommunityBenefitExpnsAmt",
-    "CoalitionBuildingGrp_DirectOffsettingRevenueAmt",
-    "CoalitionBuildingGrp_NetCommunityBenefitExpnsAmt",
-    "CoalitionBuildingGrp_TotalExpensePct"
-]
-part2_cb_healthadv = [
-    "HealthImprovementAdvocacyGrp_TotalCommunityBenefitExpnsAmt",
-    "HealthImprovementAdvocacyGrp_DirectOffsettingRevenueAmt",
-    "HealthImprovementAdvocacyGrp_NetCommunityBenefitExpnsAmt",
-    "HealthImprovementAdvocacyGrp_TotalExpensePct"
-]
-part2_cb_workforce = [
-    "WorkforceDevelopmentGrp_TotalCommunityBenefitExpnsAmt",
-    "WorkforceDevelopmentGrp_DirectOffsettingRevenueAmt",
-    "WorkforceDevelopmentGrp_NetCommunityBenefitExpnsAmt",
-    "WorkforceDevelopmentGrp_TotalExpensePct"
+    # Part I – Basic FAP & Inds
+    Field("IRS_FNASPOLYN", "FinancialAssistancePolicy", "IRS990ScheduleH/FinancialAssistancePolicyInd", "category"),
+    Field("IRS_FAPWRTNYN", "WrittenPolicyInd", "IRS990ScheduleH/WrittenPolicyInd", "bool"),
+    Field("IRS_FAPALLHSP", "HospitalPolicyInd_AllHospitalsPolicyInd", "IRS990ScheduleH/AllHospitalsPolicyInd", "bool"),
+    Field("IRS_FAPMSTHSP", "HospitalPolicyInd_MostHospitalsPolicyInd", "IRS990ScheduleH/MostHospitalsPolicyInd", "bool"),
+    Field("IRS_FAPTLRHSP", "HospitalPolicyInd_IndivHospitalTailoredPolicyInd", "IRS990ScheduleH/IndivHospitalTailoredPolicyInd", "bool"),
+    Field("IRS_FAPFCPG100", "FPGReferenceFreeCareInd_Percent100Ind", "IRS990ScheduleH/Percent100Ind", "bool"),
+    Field("IRS_FAPFCPG150", "FPGReferenceFreeCareInd_Percent150Ind", "IRS990ScheduleH/Percent150Ind", "bool"),
+    Field("IRS_FAPFCPG200", "FPGReferenceFreeCareInd_Percent200Ind", "IRS990ScheduleH/Percent200Ind", "bool"),
+    Field("IRS_FAPFCPGOTH", "FPGReferenceFreeCareInd_FreeCareOtherPct", "IRS990ScheduleH/FreeCareOtherPct", "float"),
+    Field("IRS_FAPDCPG200", "FPGReferenceDiscountedCareInd_Percent200DInd", "IRS990ScheduleH/Percent200DInd", "bool"),
+    Field("IRS_FAPDCPG250", "FPGReferenceDiscountedCareInd_Percent250Ind", "IRS990ScheduleH/Percent250Ind", "bool"),
+    Field("IRS_FAPDCPG300", "FPGReferenceDiscountedCareInd_Percent300Ind", "IRS990ScheduleH/Percent300Ind", "bool"),
+    Field("IRS_FAPDCPG350", "FPGReferenceDiscountedCareInd_Percent350Ind", "IRS990ScheduleH/Percent350Ind", "bool"),
+    Field("IRS_FAPDCPG400", "FPGReferenceDiscountedCareInd_Percent400Ind", "IRS990ScheduleH/Percent400Ind", "bool"),
+    Field("IRS_FAPDCPGOTH", "FPGReferenceDiscountedCareInd_DiscountedCareOthPercentageGrp", "IRS990ScheduleH/DiscountedCareOthPercentageGrp/DiscountedCareOtherPct", "string"),
+    Field("IRS_FDCRMEDIND", "FreeCareMedicallyIndigentInd", "IRS990ScheduleH/FreeCareMedicallyIndigentInd", "bool"),
+    Field("IRS_FNASBDGT", "FinancialAssistanceBudgetInd", "IRS990ScheduleH/FinancialAssistanceBudgetInd", "bool"),
+    Field("IRS_EXPEXCBDGT", "ExpensesExceedBudgetInd", "IRS990ScheduleH/ExpensesExceedBudgetInd", "bool"),
+    Field("IRS_UNTOPRFDCR", "UnableToProvideCareInd", "IRS990ScheduleH/UnableToProvideCareInd", "bool"),
+    Field("IRS_PRANCMBNRT", "AnnualCommunityBnftReportInd", "IRS990ScheduleH/AnnualCommunityBnftReportInd", "bool"),
+    Field("IRS_CBRPUBAVL", "ReportPublicallyAvailableInd", "IRS990ScheduleH/ReportPublicallyAvailableInd", "bool"),
+
+    # Part I – Financial Assistance and Other Community Benefits at Cost
+    *community_benefit_group("FinancialAssistanceAtCostTyp", "FAAC"),
+    *community_benefit_group("UnreimbursedMedicaidGrp", "UMCD"),
+    *community_benefit_group("UnreimbursedCostsGrp", "OMTG"),
+    # This group's first column is IRS_TFMTCBEA rather than IRS_TFMTTCBEA, so it is spelled out
+    Field("IRS_TFMTCBEA", "TotalFinancialAssistanceTyp_TotalCommunityBenefitExpnsAmt", "IRS990ScheduleH/TotalFinancialAssistanceTyp/TotalCommunityBenefitExpnsAmt", "int"),
+    Field("IRS_TFMTDORVA", "TotalFinancialAssistanceTyp_DirectOffsettingRevenueAmt", "IRS990ScheduleH/TotalFinancialAssistanceTyp/DirectOffsettingRevenueAmt", "int"),
+    Field("IRS_TFMTNCBEA", "TotalFinancialAssistanceTyp_NetCommunityBenefitExpnsAmt", "IRS990ScheduleH/TotalFinancialAssistanceTyp/NetCommunityBenefitExpnsAmt", "int"),
+    Field("IRS_TFMTNCBEP", "TotalFinancialAssistanceTyp_TotalExpensePct", "IRS990ScheduleH/TotalFinancialAssistanceTyp/TotalExpensePct", "float"),
+    *community_benefit_group("CommunityHealthServicesGrp", "CHIS"),
+    *community_benefit_group("HealthProfessionsEducationGrp", "HPED"),
+    *community_benefit_group("SubsidizedHealthServicesGrp", "SBHS"),
+    *community_benefit_group("ResearchGrp", "RSCH"),
+    *community_benefit_group("CashAndInKindContributionsGrp", "CIKC"),
+    *community_benefit_group("TotalOtherBenefitsGrp", "TOBN"),
+    *community_benefit_group("TotalCommunityBenefitsGrp", "TCBN"),
+
+    # Part II – Detailed Community Building
+    *community_benefit_group("PhysicalImprvAndHousingGrp", "PIAH"),
+    *community_benefit_group("EconomicDevelopmentGrp", "ECDV"),
+    *community_benefit_group("CommunitySupportGrp", "CSPT"),
+    *community_benefit_group("EnvironmentalImprovementsGrp", "ENVI"),
+    *community_benefit_group("LeadershipDevelopmentGrp", "LDAT"),
+    *community_benefit_group("CoalitionBuildingGrp", "CBLD"),
+    *community_benefit_group("HealthImprovementAdvocacyGrp", "CHAI"),
+    *community_benefit_group("WorkforceDevelopmentGrp", "WKDV"),
+    *community_benefit_group("OtherCommuntityBuildingActyGrp", "OCBA"),
+    *community_benefit_group("TotalCommuntityBuildingActyGrp", "TCBA"),
+
+    # Part III – Bad Debt, Medicare & Collection
+    Field("IRS_RPBDHFMA15", "BadDebtExpenseReportedInd", "IRS990ScheduleH/BadDebtExpenseReportedInd", "bool"),
+    Field("IRS_BADDBTTLAMT", "BadDebtExpenseAmt", "IRS990ScheduleH/BadDebtExpenseAmt", "int"),
+    Field("IRS_BADDBTATFAP", "BadDebtExpenseAttributableAmt", "IRS990ScheduleH/BadDebtExpenseAttributableAmt", "int"),
+    Field("IRS_TTLMCRREV", "ReimbursedByMedicareAmt", "IRS990ScheduleH/ReimbursedByMedicareAmt", "int"),
+    Field("IRS_TTLMCRCST", "CostOfCareReimbursedByMedcrAmt", "IRS990ScheduleH/CostOfCareReimbursedByMedcrAmt", "int"),
+    Field("IRS_TTLMCRSRPLS", "MedicareSurplusOrShortfallAmt", "IRS990ScheduleH/MedicareSurplusOrShortfallAmt", "int"),
+    Field("IRS_MCRCMUCAS", "CostAccountingSystemInd", "IRS990ScheduleH/CostAccountingSystemInd", "bool"),
+    Field("IRS_MCRCMUCCR", "CostToChargeRatioInd", "IRS990ScheduleH/CostToChargeRatioInd", "bool"),
+    Field("IRS_MCRCMUOTH", "CostingMethodologyOtherInd", "IRS990ScheduleH/CostingMethodologyUsedGrp/OtherInd", "bool"),
+    Field("IRS_DBTCOLWRT", "WrittenDebtCollectionPolicyInd", "IRS990ScheduleH/WrittenDebtCollectionPolicyInd", "bool"),
+    Field("IRS_DBTCOLFAP", "FinancialAssistancePrvsnInd", "IRS990ScheduleH/FinancialAssistancePrvsnInd", "bool"),
+
+    # Part IV – Management Companies & Joint Ventures
+    Field("IRS_MCJVNAME", "ManagementCompany_BusinessNameLine1Txt", "IRS990ScheduleH/ManagementCoAndJntVenturesGrp/BusinessNameLine1Txt", "string"),
+    Field("IRS_MCJVDOPA", "ManagementCompany_PrimaryActivitiesTxt", "IRS990ScheduleH/ManagementCoAndJntVenturesGrp/PrimaryActivitiesTxt", "string"),
+    Field("IRS_MJORGPRFPCT", "ManagementCompany_OrgProfitOrOwnershipPct", "IRS990ScheduleH/ManagementCoAndJntVenturesGrp/OrgProfitOrOwnershipPct", "float"),
+    Field("IRS_MJODTPRFPCT", "ManagementCompany_OfcrEtcProfitOrOwnershipPct", "IRS990ScheduleH/ManagementCoAndJntVenturesGrp/OfcrEtcProfitOrOwnershipPct", "float"),
+    Field("IRS_MJMDSPRFPCT", "ManagementCompany_PhysiciansProfitOrOwnershipPct", "IRS990ScheduleH/ManagementCoAndJntVenturesGrp/PhysiciansProfitOrOwnershipPct", "float"),
+
+    # Part V – Facility Info
+    Field("IRS_TOTCNTFCLTY", "HospitalFacilitiesCnt", "IRS990ScheduleH/HospitalFacilitiesCnt", "int"),
+    Field("IRS_LSTALLFCLTY", "HospitalFacilitiesGrp", None, "string"),
+    Field("IRS_FC1BUSNAME", "FacilityNum1BusinessName", None, "string"),
+    Field("IRS_FC1ADDRESS", "FacilityNum1Street", None, "string"),
+    Field("IRS_FC1CITYNAME", "FacilityNum1City", None, "string"),
+    Field("IRS_FC1STATEABB", "FacilityNum1State", None, "category"),
+    Field("IRS_FC1ZIPCODE", "FacilityNum1ZIP", None, "string"),
+    Field("IRS_FC1COUNTRY", "FacilityNum1Country", None, "category"),
+    Field("IRS_FC2BUSNAME", "FacilityNum2BusinessName", None, "string"),
+    Field("IRS_FC2ADDRESS", "FacilityNum2Street", None, "string"),
+    Field("IRS_FC2CITYNAME", "FacilityNum2City", None, "string"),
+    Field("IRS_FC2STATEABB", "FacilityNum2State", None, "category"),
+    Field("IRS_FC2ZIPCODE", "FacilityNum2ZIP", None, "string"),
+    Field("IRS_FC2COUNTRY", "FacilityNum2Country", None, "category"),
+    Field("IRS_SUBHSPNAME", "SubordinateHospitalName", "IRS990ScheduleH/SubordinateHospitalName", "string"),
+    Field("IRS_SUBHSPEIN", "SubordinateHospitalEIN", "IRS990ScheduleH/SubordinateHospitalEIN", "string"),
+    Field("IRS_FCISLICHSP", "LicensedHospitalInd", "IRS990ScheduleH/LicensedHospitalInd", "bool"),
+    Field("IRS_FCISGMSHSP", "GeneralMedicalAndSurgicalInd", "IRS990ScheduleH/GeneralMedicalAndSurgicalInd", "bool"),
+    Field("IRS_FCISCLDHSP", "ChildrensHospitalInd", "IRS990ScheduleH/ChildrensHospitalInd", "bool"),
+    Field("IRS_FCISTCHHSP", "TeachingHospitalInd", "IRS990ScheduleH/TeachingHospitalInd", "bool"),
+    Field("IRS_FCISCRAHSP", "CriticalAccessHospitalInd", "IRS990ScheduleH/CriticalAccessHospitalInd", "bool"),
+    Field("IRS_FCISRSRCHF", "ResearchFacilityInd", "IRS990ScheduleH/ResearchFacilityInd", "bool"),
+
+    # Part V – Facility Policies
+    Field("IRS_CHNAVB1", "FirstLicensedCYOrPYInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/FirstLicensedCYOrPYInd", "bool"),
+    Field("IRS_CHNAVB2", "TaxExemptHospitalCYOrPYInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/TaxExemptHospitalCYOrPYInd", "bool"),
+    Field("IRS_CHNAVB3", "CHNAConductedInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/CHNAConductedInd", "bool"),
+    Field("IRS_CHNAVB3A", "CommunityDefinitionInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/CommunityDefinitionInd", "bool"),
+    Field("IRS_CHNAVB3B", "CommunityDemographicsInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/CommunityDemographicsInd", "bool"),
+    Field("IRS_CHNAVB3C", "ExistingResourcesInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/ExistingResourcesInd", "bool"),
+    Field("IRS_CHNAVB3D", "HowDataObtainedInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/HowDataObtainedInd", "bool"),
+    Field("IRS_CHNAVB3E", "CommunityHealthNeedsInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/CommunityHealthNeedsInd", "bool"),
+    Field("IRS_CHNAVB3F", "OtherHealthIssuesInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/OtherHealthIssuesInd", "bool"),
+    Field("IRS_CHNAVB3G", "CommunityHlthNeedsIdProcessInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/CommunityHlthNeedsIdProcessInd", "bool"),
+    Field("IRS_CHNAVB3H", "ConsultingProcessInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/ConsultingProcessInd", "bool"),
+    Field("IRS_CHNAVB3I", "PriorCHNAImpactInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/PriorCHNAImpactInd", "bool"),
+    Field("IRS_CHNAVB3J", "CHNAOtherInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/OtherInd", "bool"),
+    Field("IRS_CHNAVB4", "CHNAConductedYr", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/CHNAConductedYr", "int"),
+    Field("IRS_CHNAVB5", "TakeIntoAccountOthersInputInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/TakeIntoAccountOthersInputInd", "bool"),
+    Field("IRS_CHNAVB6A", "CHNAConductedWithOtherFcltsInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/CHNAConductedWithOtherFcltsInd", "bool"),
+    Field("IRS_CHNAVB6B", "CHNAConductedWithNonFcltsInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/CHNAConductedWithNonFcltsInd", "bool"),
+    Field("IRS_CHNAVB7", "CHNAReportWidelyAvailableInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/CHNAReportWidelyAvailableInd", "bool"),
+    Field("IRS_CHNAVB7A", "RptAvailableOnOwnWebsiteInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/RptAvailableOnOwnWebsiteInd", "bool"),
+    Field("IRS_CHNAVB7AURL", "OwnWebsiteURLTxt", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/OwnWebsiteURLTxt", "string"),
+    Field("IRS_CHNAVB7B", "OtherWebsiteInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/OtherWebsiteInd", "bool"),
+    Field("IRS_CHNAVB7BURL", "OtherWebsiteURLTxt", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/OtherWebsiteURLTxt", "string"),
+    Field("IRS_CHNAVB7C", "PaperCopyPublicInspectionInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/PaperCopyPublicInspectionInd", "bool"),
+    Field("IRS_CHNAVB7D", "RptAvailableThruOtherMethodInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/RptAvailableThruOtherMethodInd", "bool"),
+    Field("IRS_CHNAVB8", "ImplementationStrategyAdoptInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/ImplementationStrategyAdoptInd", "bool"),
+    Field("IRS_CHNAVB9", "ImplementationStrategyAdptYr", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/ImplementationStrategyAdptYr", "int"),
+    Field("IRS_CHNAVB10", "StrategyPostedWebsiteInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/StrategyPostedWebsiteInd", "bool"),
+    Field("IRS_CHNAVB10A", "StrategyWebsiteURLTxt", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/StrategyWebsiteURLTxt", "string"),
+    Field("IRS_CHNAVB10B", "StrategyAttachedInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/StrategyAttachedInd", "bool"),
+    Field("IRS_CHNAVB10B2", "BinaryAttachment", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/BinaryAttachment", "string"),
+    Field("IRS_CHNAVB12A", "OrganizationIncurExciseTaxInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/OrganizationIncurExciseTaxInd", "bool"),
+    Field("IRS_CHNAVB12B", "Form4720FiledInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/Form4720FiledInd", "bool"),
+    Field("IRS_CHNAVB12C", "ExciseReportForm4720ForAllAmt", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/ExciseReportForm4720ForAllAmt", "int"),
+    Field("IRS_FAPVB13", "EligCriteriaExplainedInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/EligCriteriaExplainedInd", "bool"),
+    Field("IRS_FAPVB13A", "FPGFamilyIncmLmtFreeDscntInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/FPGFamilyIncmLmtFreeDscntInd", "bool"),
+    Field("IRS_FAPVB13AFC", "FPGFamilyIncmLmtFreeCarePct", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/FPGFamilyIncmLmtFreeCarePct", "float"),
+    Field("IRS_FAPVB13ADC", "FPGFamilyIncmLmtDscntCarePct", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/FPGFamilyIncmLmtDscntCarePct", "float"),
+    Field("IRS_FAPVB13B", "IncomeLevelCriteriaInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/IncomeLevelCriteriaInd", "bool"),
+    Field("IRS_FAPVB13C", "AssetLevelCriteriaInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/AssetLevelCriteriaInd", "bool"),
+    Field("IRS_FAPVB13D", "MedicalIndigencyCriteriaInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/MedicalIndigencyCriteriaInd", "bool"),
+    Field("IRS_FAPVB13E", "InsuranceStatusCriteriaInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/InsuranceStatusCriteriaInd", "bool"),
+    Field("IRS_FAPVB13F", "UnderinsuranceStatCriteriaInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/UnderinsuranceStatCriteriaInd", "bool"),
+    Field("IRS_FAPVB13G", "ResidencyCriteriaInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/ResidencyCriteriaInd", "bool"),
+    Field("IRS_FAPVB13H", "OtherCriteriaInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/OtherCriteriaInd", "bool"),
+    Field("IRS_FAPVB14", "ExplainedBasisInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/ExplainedBasisInd", "bool"),
+    Field("IRS_FAPVB15", "AppFinancialAsstExplnInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/AppFinancialAsstExplnInd", "bool"),
+    Field("IRS_FAPVB15A", "DescribedInfoInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/DescribedInfoInd", "bool"),
+    Field("IRS_FAPVB15B", "DescribedSuprtDocInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/DescribedSuprtDocInd", "bool"),
+    Field("IRS_FAPVB15C", "ProvidedHospitalContactInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/ProvidedHospitalContactInd", "bool"),
+    Field("IRS_FAPVB15D", "ProvidedNonprofitContactInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/ProvidedNonprofitContactInd", "bool"),
+    Field("IRS_FAPVB15E", "OtherMethodInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/OtherMethodInd", "bool"),
+    Field("IRS_FAPVB16", "IncludesPublicityMeasuresInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/IncludesPublicityMeasuresInd", "bool"),
+    Field("IRS_FAPVB16A", "FAPAvailableOnWebsiteInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/FAPAvailableOnWebsiteInd", "bool"),
+    Field("IRS_FAPVB16AURL", "FAPAvailableOnWebsiteURLTxt", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/FAPAvailableOnWebsiteURLTxt", "string"),
+    Field("IRS_FAPVB16B", "FAPAppAvailableOnWebsiteInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/FAPAppAvailableOnWebsiteInd", "bool"),
+    Field("IRS_FAPVB16BURL", "FAPAppAvailableOnWebsiteURLTxt", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/FAPAppAvailableOnWebsiteURLTxt", "string"),
+    Field("IRS_FAPVB16C", "FAPSummaryOnWebsiteInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/FAPSummaryOnWebsiteInd", "bool"),
+    Field("IRS_FAPVB16CURL", "FAPSummaryOnWebsiteURLTxt", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/FAPSummaryOnWebsiteURLTxt", "string"),
+    Field("IRS_FAPVB16D", "FAPAvlblOnRequestNoChargeInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/FAPAvlblOnRequestNoChargeInd", "bool"),
+    Field("IRS_FAPVB16E", "FAPAppAvlblOnRequestNoChrgInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/FAPAppAvlblOnRequestNoChrgInd", "bool"),
+    Field("IRS_FAPVB16F", "FAPSumAvlblOnRequestNoChrgInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/FAPSumAvlblOnRequestNoChrgInd", "bool"),
+    Field("IRS_FAPVB16G", "NotifiedFAPCopyBillDisplayInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/NotifiedFAPCopyBillDisplayInd", "bool"),
+    Field("IRS_FAPVB16H", "CommuntityNotifiedFAPInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/CommuntityNotifiedFAPInd", "bool"),
+    Field("IRS_FAPVB16I", "FAPTranslatedInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/FAPTranslatedInd", "bool"),
+    Field("IRS_FAPVB16J", "OtherPublicityInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/OtherPublicityInd", "bool"),
+    Field("IRS_BACVB17", "FAPActionsOnNonpaymentInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/FAPActionsOnNonpaymentInd", "bool"),
+    Field("IRS_BACVB18A", "PermitReportToCreditAgencyInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/PermitReportToCreditAgencyInd", "bool"),
+    Field("IRS_BACVB18B", "PermitSellingDebtInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/PermitSellingDebtInd", "bool"),
+    Field("IRS_BACVB18C", "PermitDeferDenyRqrPaymentInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/PermitDeferDenyRqrPaymentInd", "bool"),
+    Field("IRS_BACVB18D", "PermitLegalJudicialProcessInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/PermitLegalJudicialProcessInd", "bool"),
+    Field("IRS_BACVB18E", "PermitOtherActionsInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/PermitOtherActionsInd", "bool"),
+    Field("IRS_BACVB18F", "PermitNoActionsInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/PermitNoActionsInd", "bool"),
+    Field("IRS_BACVB19", "CollectionActivitiesInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/CollectionActivitiesInd", "bool"),
+    Field("IRS_BACVB19A", "ReportingToCreditAgencyInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/ReportingToCreditAgencyInd", "bool"),
+    Field("IRS_BACVB19B", "EngagedSellingDebtInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/EngagedSellingDebtInd", "bool"),
+    Field("IRS_BACVB19C", "EngageDeferDenyRqrPaymentInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/EngageDeferDenyRqrPaymentInd", "bool"),
+    Field("IRS_BACVB19D", "EngagedLegalJudicialProcessInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/EngagedLegalJudicialProcessInd", "bool"),
+    Field("IRS_BACVB19E", "OtherActionsInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/OtherActionsInd", "bool"),
+    Field("IRS_BACVB20A", "ProvidedWrittenNoticeInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/ProvidedWrittenNoticeInd", "bool"),
+    Field("IRS_BACVB20B", "MadeEffortOrallyNotifyInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/MadeEffortOrallyNotifyInd", "bool"),
+    Field("IRS_BACVB20C", "ProcessedFAPApplicationInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/ProcessedFAPApplicationInd", "bool"),
+    Field("IRS_BACVB20D", "MadePresumptiveEligDetermInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/MadePresumptiveEligDetermInd", "bool"),
+    Field("IRS_BACVB20E", "OtherActionsTakenInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/OtherActionsTakenInd", "bool"),
+    Field("IRS_BACVB20F", "NoneMadeInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/NoneMadeInd", "bool"),
+    Field("IRS_EMCVB21", "NondisEmergencyCarePolicyInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/NondisEmergencyCarePolicyInd", "bool"),
+    Field("IRS_EMCVB21A", "NoEmergencyCareInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/NoEmergencyCareInd", "bool"),
+    Field("IRS_EMCVB21B", "NoEmergencyCarePolicyInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/NoEmergencyCarePolicyInd", "bool"),
+    Field("IRS_EMCVB21C", "EmergencyCareLimitedInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/EmergencyCareLimitedInd", "bool"),
+    Field("IRS_EMCVB21D", "OtherReasonInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/OtherReasonInd", "bool"),
+    Field("IRS_EMCVB22A", "LookBackMedicareInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/LookBackMedicareInd", "bool"),
+    Field("IRS_EMCVB22B", "LookBackMedicarePrivateInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/LookBackMedicarePrivateInd", "bool"),
+    Field("IRS_EMCVB22C", "LookBackMedicaidMedcrPrvtInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/LookBackMedicaidMedcrPrvtInd", "bool"),
+    Field("IRS_EMCVB22D", "ProspectiveMedicareMedicaidInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/ProspectiveMedicareMedicaidInd", "bool"),
+    Field("IRS_EMCVB23", "AmountsGenerallyBilledInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/AmountsGenerallyBilledInd", "bool"),
+    Field("IRS_EMCVB24", "GrossChargesInd", "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/GrossChargesInd", "bool"),
+
+    # Part V – Non-Hospital Healthcare Facilities
+    Field("IRS_TOTCNTOHF", "SupplementalFacilityNum", None, "string"),
+    Field("IRS_OHFBUSNAME", "OthHlthCareFcltsGrp_BusinessName", "IRS990ScheduleH/OthHlthCareFcltsNotHospitalGrp/OthHlthCareFcltsGrp/BusinessNameLine1Txt", "string"),
+    Field("IRS_OHFADDRESS", "OthHlthCareFcltsGrp_AddressLine1Txt", "IRS990ScheduleH/OthHlthCareFcltsNotHospitalGrp/OthHlthCareFcltsGrp/USAddress/AddressLine1Txt", "string"),
+    Field("IRS_OHFCITYNAME", "OthHlthCareFcltsGrp_CityNm", "IRS990ScheduleH/OthHlthCareFcltsNotHospitalGrp/OthHlthCareFcltsGrp/USAddress/CityNm", "string"),
+    Field("IRS_OHFSTATEABB", "OthHlthCareFcltsGrp_StateAbbreviationCd", "IRS990ScheduleH/OthHlthCareFcltsNotHospitalGrp/OthHlthCareFcltsGrp/USAddress/StateAbbreviationCd", "category"),
+    Field("IRS_OHFZIPCODE", "OthHlthCareFcltsGrp_ZIPCd", "IRS990ScheduleH/OthHlthCareFcltsNotHospitalGrp/OthHlthCareFcltsGrp/USAddress/ZIPCd", "string"),
 ]
-part2_cb_otheracty = [
-    "OtherCommuntityBuildingActyGrp_TotalCommunityBenefitExpnsAmt",
-    "OtherCommuntityBuildingActyGrp_DirectOffsettingRevenueAmt",
-    "OtherCommuntityBuildingActyGrp_NetCommunityBenefitExpnsAmt",
-    "OtherCommuntityBuildingActyGrp_TotalExpensePct"
+
+# Position of each column in a row, by raw name
+field_positions = {field.raw_name: i for i, field in enumerate(field_registry)}
+
+# Column groups for selected_columns: (first column, last column) of each section of field_registry
+column_groups = {
+    "release": ("IRS_RELEASEYEAR", "IRS_RELEASETEOS"),
+    "metadata": ("IRS_RELEASEXML", "IRS_FLRCOUNTRY"),
+    "outside_financials": ("IRS_TOTEMPCNT", "IRS_NAOFBEOYAMT"),
+    "part1": ("IRS_FNASPOLYN", "IRS_TCBNNCBEP"),
+    "part2": ("IRS_PIAHTCBEA", "IRS_TCBANCBEP"),
+    "part3": ("IRS_RPBDHFMA15", "IRS_DBTCOLFAP"),
+    "part4": ("IRS_MCJVNAME", "IRS_MJMDSPRFPCT"),
+    "facilities": ("IRS_TOTCNTFCLTY", "IRS_FCISRSRCHF"),
+    "part5_policies": ("IRS_CHNAVB1", "IRS_EMCVB24"),
+    "other_facilities": ("IRS_TOTCNTOHF", "IRS_OHFZIPCODE"),
+}
+
+def select_output_fields(selection):
+    """The fields of field_registry named by selection (IRS_* names and column_groups), in output order."""
+    if selection is None:
+        return list(field_registry)
+    column_index = {field.name: i for i, field in enumerate(field_registry)}
+    chosen = set()
+    for name in selection:
+        if name in column_groups:
+            first, last = column_groups[name]
+            chosen.update(range(column_index[first], column_index[last] + 1))
+        elif name in column_index:
+            chosen.add(column_index[name])
+        else:
+            raise SystemExit(f'selected_columns: "{name}" is not an IRS_* column or one of: {", ".join(column_groups)}')
+    return [field for i, field in enumerate(field_registry) if i in chosen]
+
+# The columns written to the output, their names, and their positions in a full row (None when all are written)
+output_fields = select_output_fields(selected_columns)
+output_header = [field.name for field in output_fields]
+output_positions = None if selected_columns is None else [field_positions[field.raw_name] for field in output_fields]
+output_raw_names = None if selected_columns is None else {field.raw_name for field in output_fields}
+
+# Check boxes and "category" columns repeat the same few values ("X", "1", "CA", a release name, ...) in every row.
+# Their values are interned, so all rows share one string object per value instead of holding their own copy;
+# that also makes a chunk's rows much smaller to send from a worker to the main process.
+interned_positions = [i for i, field in enumerate(output_fields) if field.kind in ("bool", "category")]
+
+def compact_row(values, positions):
+    """values (a list) as a tuple, with the strings at positions interned."""
+    for i in positions:
+        if type(values[i]) is str:
+            values[i] = sys.intern(values[i])
+    return tuple(values)
+
+def project_row(row):
+    """
+    A full row as the compact tuple written to the output: only the selected_columns, in output order,
+    converted to their types with typed_values on.
+    """
+    values = list(row) if output_positions is None else [row[i] for i in output_positions]
+    if typed_values:
+        convert_row(values, output_converters)
+    return compact_row(values, interned_positions)
+
+    # FACILITY TABLE COLUMNS (facility_table)
+    # One row per <HospitalFacilitiesGrp>. Its columns come in three parts:
+    #  - the filing's columns, copied from its row in the main output
+    #  - the facility's own tags; path is inside <HospitalFacilitiesGrp> and raw_name its place in the facility record
+    #  - the Part V Section B policy columns, with the same names as in the main output; path is inside the
+    #    <HospitalFcltyPoliciesPrctcGrp> block that describes this facility (see facility_table_rows)
+facility_filing_fields = [
+    field for name in ("IRS_FILER_EIN", "IRS_TAXYEAR", "IRS_TAXPERENDDT", "IRS_RELEASEYEAR", "IRS_RELEASETEOS", "IRS_RELEASEXML")
+    for field in field_registry if field.name == name
 ]
-part2_cb_total = [
-    "TotalCommuntityBuildingActyGrp_TotalCommunityBenefitExpnsAmt",
-    "TotalCommuntityBuildingActyGrp_DirectOffsettingRevenueAmt",
-    "TotalCommuntityBuildingActyGrp_NetCommunityBenefitExpnsAmt",
-    "TotalCommuntityBuildingActyGrp_TotalExpensePct"
+facility_own_fields = [
+    Field("IRS_FCNUMBER", "FacilityNum", "FacilityNum", "int"),
+    Field("IRS_FCRPTGRPCD", "FacilityReportingGroupCd", "FacilityReportingGroupCd", "category"),
+    Field("IRS_FCBUSNAME", "BusinessNameLine1Txt", "BusinessName/BusinessNameLine1Txt", "string"),
+    Field("IRS_FCBUSNAME2", "BusinessNameLine2Txt", "BusinessName/BusinessNameLine2Txt", "string"),
+    Field("IRS_FCADDRESS", "AddressLine1Txt", "USAddress/AddressLine1Txt", "string"),
+    Field("IRS_FCCITYNAME", "CityNm", "USAddress/CityNm", "string"),
+    Field("IRS_FCSTATEABB", "StateAbbreviationCd", "USAddress/StateAbbreviationCd", "category"),
+    Field("IRS_FCZIPCODE", "ZIPCd", "USAddress/ZIPCd", "string"),
+    Field("IRS_FCCOUNTRY", "Country", None, "category"),
+    Field("IRS_FCISLICHSP", "LicensedHospitalInd", "LicensedHospitalInd", "bool"),
+    Field("IRS_FCISGMSHSP", "GeneralMedicalAndSurgicalInd", "GeneralMedicalAndSurgicalInd", "bool"),
+    Field("IRS_FCISCLDHSP", "ChildrensHospitalInd", "ChildrensHospitalInd", "bool"),
+    Field("IRS_FCISTCHHSP", "TeachingHospitalInd", "TeachingHospitalInd", "bool"),
+    Field("IRS_FCISCRAHSP", "CriticalAccessHospitalInd", "CriticalAccessHospitalInd", "bool"),
+    Field("IRS_FCISRSRCHF", "ResearchFacilityInd", "ResearchFacilityInd", "bool"),
 ]
-
-# Part III – Bad Debt, Medicare & Collection
-part3_fields = [
-    "BadDebtExpenseReportedInd",
-    "BadDebtExpenseAmt",
-    "BadDebtExpenseAttributableAmt",
-    "ReimbursedByMedicareAmt",
-    "CostOfCareReimbursedByMedcrAmt",
-    "MedicareSurplusOrShortfallAmt",
-    "CostAccountingSystemInd",
-    "CostToChargeRatioInd",
-    "CostingMethodologyOtherInd",
-    "CHNAOtherInd",
-    "WrittenDebtCollectionPolicyInd",
-    "FinancialAssistancePrvsnInd",
+facility_policy_fields = [
+    Field(field.name, field.raw_name, field.path.rpartition("/")[2], field.kind) for field in field_registry
+    if field.path and field.path.startswith("IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/")
 ]
+facility_table_fields = facility_filing_fields + facility_own_fields + facility_policy_fields
+facility_table_header = [field.name for field in facility_table_fields]
+facility_interned_positions = [i for i, field in enumerate(facility_table_fields) if field.kind in ("bool", "category")]
 
-# Part IV – Management Companies & Joint Ventures
-part4_fields = [
-    "ManagementCompany_BusinessNameLine1Txt",
-    "ManagementCompany_PrimaryActivitiesTxt",
-    "ManagementCompany_OrgProfitOrOwnershipPct",
-    "ManagementCompany_OfcrEtcProfitOrOwnershipPct",
-    "ManagementCompany_PhysiciansProfitOrOwnershipPct",
-]
+def project_facility_row(facility_row):
+    """A facility table row as the compact tuple written to the output, converted to its types with typed_values on."""
+    values = list(facility_row)
+    if typed_values:
+        convert_row(values, facility_converters)
+    return compact_row(values, facility_interned_positions)
 
-# Part V – Facility Info
-facility_info_fields = [
-    "HospitalFacilitiesCnt",
-    "HospitalFacilitiesGrp",
-    "FacilityNum1BusinessName",
-    "FacilityNum1Street",
-    "FacilityNum1City",
-    "FacilityNum1State",
-    "FacilityNum1ZIP",
-    "FacilityNum1Country",
-    "FacilityNum2BusinessName",
-    "FacilityNum2Street",
-    "FacilityNum2City",
-    "FacilityNum2State",
-    "FacilityNum2ZIP",
-    "FacilityNum2Country",
-    "SubordinateHospitalName",
-    "SubordinateHospitalEIN",
-    "LicensedHospitalInd",
-    "GeneralMedicalAndSurgicalInd",
-    "ChildrensHospitalInd",
-    "TeachingHospitalInd",
-    "CriticalAccessHospitalInd",
-    "ResearchFacilityInd",
+# The columns dedupe_policy tells filings apart by; they are extracted even when selected_columns leaves them out
+# (the amended return box is not a column: it is read into a helper slot, see filing_amended_return)
+dedupe_fields = [
+    field for field in field_registry if field.raw_name in ("Filer_EIN", "TaxPeriodEndDt", "PreparationDt")
 ]
 
-# Additional Facility Policy fields
+# The <HospitalFcltyPoliciesPrctcGrp> tags the BeautifulSoup engine copies under their own name
 policy_extra_fields = [
-    "FirstLicensedCYOrPYInd",
-    "TaxExemptHospitalCYOrPYInd",
-    "CHNAConductedInd",
-    "CommunityDefinitionInd",
-    "CommunityDemographicsInd",
-    "ExistingResourcesInd",
-    "HowDataObtainedInd",
-    "CommunityHealthNeedsInd",
-    "OtherHealthIssuesInd",
-    "CommunityHlthNeedsIdProcessInd",
-    "ConsultingProcessInd",
-    "PriorCHNAImpactInd",
-    "CHNAConductedYr",
-    "TakeIntoAccountOthersInputInd",
-    "CHNAConductedWithOtherFcltsInd",
-    "CHNAConductedWithNonFcltsInd",
-    "CHNAReportWidelyAvailableInd",
-    "RptAvailableOnOwnWebsiteInd",
-    "OwnWebsiteURLTxt",
-    "OtherWebsiteInd",
-    "OtherWebsiteURLTxt",
-    "PaperCopyPublicInspectionInd",
-    "RptAvailableThruOtherMethodInd",
-    "ImplementationStrategyAdoptInd",
-    "ImplementationStrategyAdptYr",
-    "StrategyPostedWebsiteInd",
-    "StrategyWebsiteURLTxt",
-    "StrategyAttachedInd",
-    "BinaryAttachment",
-    "OrganizationIncurExciseTaxInd",
-    "Form4720FiledInd",
-    "ExciseReportForm4720ForAllAmt",
-    "EligCriteriaExplainedInd",
-    "FPGFamilyIncmLmtFreeDscntInd",
-    "FPGFamilyIncmLmtFreeCarePct",
-    "FPGFamilyIncmLmtDscntCarePct",
-    "IncomeLevelCriteriaInd",
-    "AssetLevelCriteriaInd",
-    "MedicalIndigencyCriteriaInd",
-    "InsuranceStatusCriteriaInd",
-    "UnderinsuranceStatCriteriaInd",
-    "ResidencyCriteriaInd",
-    "OtherCriteriaInd",
-    "ExplainedBasisInd",
-    "AppFinancialAsstExplnInd",
-    "DescribedInfoInd",
-    "DescribedSuprtDocInd",
-    "ProvidedHospitalContactInd",
-    "ProvidedNonprofitContactInd",
-    "OtherMethodInd",
-    "IncludesPublicityMeasuresInd",
-    "FAPAvailableOnWebsiteInd",
-    "FAPAvailableOnWebsiteURLTxt",
-    "FAPAppAvailableOnWebsiteInd",
-    "FAPAppAvailableOnWebsiteURLTxt",
-    "FAPSummaryOnWebsiteInd",
-    "FAPSummaryOnWebsiteURLTxt",
-    "FAPAvlblOnRequestNoChargeInd",
-    "FAPAppAvlblOnRequestNoChrgInd",
-    "FAPSumAvlblOnRequestNoChrgInd",
-    "NotifiedFAPCopyBillDisplayInd",
-    "CommuntityNotifiedFAPInd",
-    "FAPTranslatedInd",
-    "OtherPublicityInd",
-    "FAPActionsOnNonpaymentInd",
-    "PermitReportToCreditAgencyInd",
-    "PermitSellingDebtInd",
-    "PermitDeferDenyRqrPaymentInd",
-    "PermitLegalJudicialProcessInd",
-    "PermitOtherActionsInd",
-    "PermitNoActionsInd",
-    "CollectionActivitiesInd",
-    "ReportingToCreditAgencyInd",
-    "EngagedSellingDebtInd",
-    "EngageDeferDenyRqrPaymentInd",
-    "EngagedLegalJudicialProcessInd",
-    "OtherActionsInd",
-    "ProvidedWrittenNoticeInd",
-    "MadeEffortOrallyNotifyInd",
-    "ProcessedFAPApplicationInd",
-    "MadePresumptiveEligDetermInd",
-    "OtherActionsTakenInd",
-    "NoneMadeInd",
-    "NondisEmergencyCarePolicyInd",
-    "NoEmergencyCareInd",
-    "NoEmergencyCarePolicyInd",
-    "EmergencyCareLimitedInd",
-    "OtherReasonInd",
-    "LookBackMedicareInd",
-    "LookBackMedicarePrivateInd",
-    "LookBackMedicaidMedcrPrvtInd",
-    "ProspectiveMedicareMedicaidInd",
-    "AmountsGenerallyBilledInd",
-    "GrossChargesInd",
-]
-
-# Part V – Non-Hospital Healthcare Facilities
-other_facilities_fields = [
-    "OthHlthCareFcltsGrp_BusinessName",
-    "OthHlthCareFcltsGrp_AddressLine1Txt",
-    "OthHlthCareFcltsGrp_CityNm",
-    "OthHlthCareFcltsGrp_StateAbbreviationCd",
-    "OthHlthCareFcltsGrp_ZIPCd",
+    field.raw_name for field in field_registry
+    if field.path == f"IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/{field.raw_name}"
 ]
 
-# Final column order
-columns_order = (
-    release_columns
-    + base_columns
-    + outside_fields
-    + part1_basic_fields
-    + fa_at_cost_fields
-    + unreimbursed_fields
-    + other_means_tested_fields
-    + total_fa_fields
-    + community_health_fields
-    + health_prof_fields
-    + subsidized_fields
-    + research_fields
-    + cash_in_kind_fields
-    + total_other_fields
-    + total_community_fields
-    + part2_cb_physical
-    + part2_cb_economic
-    + part2_cb_communitysupport
-    + part2_cb_environment
-    + part2_cb_leadership
-    + part2_cb_coalition
-    + part2_cb_healthadv
-    + part2_cb_workforce
-    + part2_cb_otheracty
-    + part2_cb_total
-    + part3_fields
-    + part4_fields
-    + facility_info_fields
-    + policy_extra_fields
-    + ["SupplementalFacilityNum"]
-    + other_facilities_fields
-)
-
-    # Mapping Dictionary: Long XML variable names to abbreviated SAS variable names
-    # After extracting data with the long XML tag names,
-    # we rename columns (variables) to more concise identifiers for output.
-rename_dict = {
-    "ReleaseYear": "IRS_RELEASEYEAR",
-    "ReleaseSource": "IRS_RELEASESITE",
-    "ReleaseDownload": "IRS_RELEASEDOWN",
-    "ReleaseFileName": "IRS_RELEASETEOS",
-    "FileName": "IRS_RELEASEXML",
-    "TaxPeriodBeginDt": "IRS_TAXPERBEGDT",
-    "TaxPeriodEndDt": "IRS_TAXPERENDDT",
-    "TaxYr": "IRS_TAXYEAR",
-    "PreparationDt": "IRS_PREPAREDT",
-    "Filer_EIN": "IRS_FILER_EIN",
-    "Filer_BusinessName": "IRS_FLRBUSNAME",
-    "Filer_BusinessNameControlTxt": "IRS_FLRBUSNMTXT",
-    "Filer_PhoneNum": "IRS_FLRPHONENUM",
-    "Filer_AddressLine1Txt": "IRS_FLRADDRESS",
-    "Filer_CityNm": "IRS_FLRCITYNAME",
-    "Filer_StateAbbreviationCd": "IRS_FLRSTATEABB",
-    "Filer_ZIPCd": "IRS_FLRZIPCODE",
-    "Filer_Country": "IRS_FLRCOUNTRY",
-    "TotalEmployeeCnt": "IRS_TOTEMPCNT",
-    "TotalGrossUBIAmt": "IRS_TOTGRUBIAMT",
-    "NetUnrelatedBusTxblIncmAmt": "IRS_NETUBIAMT",
-    "PYContributionsGrantsAmt": "IRS_PYCNTGRTAMT",
-    "CYContributionsGrantsAmt": "IRS_CYCNTGRTAMT",
-    "PYProgramServiceRevenueAmt": "IRS_PYPSREVAMT",
-    "CYProgramServiceRevenueAmt": "IRS_CYPSREVAMT",
-    "PYInvestmentIncomeAmt": "IRS_PYINVINCAMT",
-    "CYInvestmentIncomeAmt": "IRS_CYINVINCAMT",
-    "PYOtherRevenueAmt": "IRS_PYOTHREVAMT",
-    "CYOtherRevenueAmt": "IRS_CYOTHREVAMT",
-    "PYTotalRevenueAmt": "IRS_PYTOTREVAMT",
-    "CYTotalRevenueAmt": "IRS_CYTOTREVAMT",
-    "PYGrantsAndSimilarPaidAmt": "IRS_PYGASPAIAMT",
-    "CYGrantsAndSimilarPaidAmt": "IRS_CYGASPAIAMT",
-    "PYBenefitsPaidToMembersAmt": "IRS_PYBENPTMAMT",
-    "CYBenefitsPaidToMembersAmt": "IRS_CYBENPTMAMT",
-    "PYSalariesCompEmpBnftPaidAmt": "IRS_PYSCEBPAMT",
-    "CYSalariesCompEmpBnftPaidAmt": "IRS_CYSCEBPAMT",
-    "PYTotalProfFndrsngExpnsAmt": "IRS_PYTPFEXPAMT",
-    "CYTotalProfFndrsngExpnsAmt": "IRS_CYTPFEXPAMT",
-    "CYTotalFundraisingExpenseAmt": "IRS_CYTFEXPAMT",
-    "PYOtherExpensesAmt": "IRS_PYOTHEXPAMT",
-    "CYOtherExpensesAmt": "IRS_CYOTHEXPAMT",
-    "PYTotalExpensesAmt": "IRS_PYTOTEXPAMT",
-    "CYTotalExpensesAmt": "IRS_CYTOTEXPAMT",
-    "PYRevenuesLessExpensesAmt": "IRS_PYREVLEXAMT",
-    "CYRevenuesLessExpensesAmt": "IRS_CYREVLEXAMT",
-    "TotalAssetsBOYAmt": "IRS_TLASSBOYAMT",
-    "TotalAssetsEOYAmt": "IRS_TLASSEOYAMT",
-    "TotalLiabilitiesBOYAmt": "IRS_TLLBLBOYAMT",
-    "TotalLiabilitiesEOYAmt": "IRS_TLLBLEOYAMT",
-    "NetAssetsOrFundBalancesBOYAmt": "IRS_NAOFBBOYAMT",
-    "NetAssetsOrFundBalancesEOYAmt": "IRS_NAOFBEOYAMT",
-    "FinancialAssistancePolicy": "IRS_FNASPOLYN",
-    "WrittenPolicyInd": "IRS_FAPWRTNYN",
-    "HospitalPolicyInd_AllHospitalsPolicyInd": "IRS_FAPALLHSP",
-    "HospitalPolicyInd_MostHospitalsPolicyInd": "IRS_FAPMSTHSP",
-    "HospitalPolicyInd_IndivHospitalTailoredPolicyInd": "IRS_FAPTLRHSP",
-    "FPGReferenceFreeCareInd_Percent100Ind": "IRS_FAPFCPG100",
-    "FPGReferenceFreeCareInd_Percent150Ind": "IRS_FAPFCPG150",
-    "FPGReferenceFreeCareInd_Percent200Ind": "IRS_FAPFCPG200",
-    "FPGReferenceFreeCareInd_FreeCareOtherPct": "IRS_FAPFCPGOTH",
-    "FPGReferenceDiscountedCareInd_Percent200DInd": "IRS_FAPDCPG200",
-    "FPGReferenceDiscountedCareInd_Percent250Ind": "IRS_FAPDCPG250",
-    "FPGReferenceDiscountedCareInd_Percent300Ind": "IRS_FAPDCPG300",
-    "FPGReferenceDiscountedCareInd_Percent350Ind": "IRS_FAPDCPG350",
-    "FPGReferenceDiscountedCareInd_Percent400Ind": "IRS_FAPDCPG400",
-    "FPGReferenceDiscountedCareInd_DiscountedCareOthPercentageGrp": "IRS_FAPDCPGOTH",
-    "FreeCareMedicallyIndigentInd": "IRS_FDCRMEDIND",
-    "FinancialAssistanceBudgetInd": "IRS_FNASBDGT",
-    "ExpensesExceedBudgetInd": "IRS_EXPEXCBDGT",
-    "UnableToProvideCareInd": "IRS_UNTOPRFDCR",
-    "AnnualCommunityBnftReportInd": "IRS_PRANCMBNRT",
-    "ReportPublicallyAvailableInd": "IRS_CBRPUBAVL",
-    "FinancialAssistanceAtCostTyp_TotalCommunityBenefitExpnsAmt": "IRS_FAACTCBEA",
-    "FinancialAssistanceAtCostTyp_DirectOffsettingRevenueAmt": "IRS_FAACDORVA",
-    "FinancialAssistanceAtCostTyp_NetCommunityBenefitExpnsAmt": "IRS_FAACNCBEA",
-    "FinancialAssistanceAtCostTyp_TotalExpensePct": "IRS_FAACNCBEP",
-    "UnreimbursedMedicaidGrp_TotalCommunityBenefitExpnsAmt": "IRS_UMCDTCBEA",
-    "UnreimbursedMedicaidGrp_DirectOffsettingRevenueAmt": "IRS_UMCDDORVA",
-    "UnreimbursedMedicaidGrp_NetCommunityBenefitExpnsAmt": "IRS_UMCDNCBEA",
-    "UnreimbursedMedicaidGrp_TotalExpensePct": "IRS_UMCDNCBEP",
-    "UnreimbursedCostsGrp_TotalCommunityBenefitExpnsAmt": "IRS_OMTGTCBEA",
-    "UnreimbursedCostsGrp_DirectOffsettingRevenueAmt": "IRS_OMTGDORVA",
-    "UnreimbursedCostsGrp_NetCommunityBenefitExpnsAmt": "IRS_OMTGNCBEA",
-    "UnreimbursedCostsGrp_TotalExpensePct": "IRS_OMTGNCBEP",
-    "TotalFinancialAssistanceTyp_TotalCommunityBenefitExpnsAmt": "IRS_TFMTCBEA",
-    "TotalFinancialAssistanceTyp_DirectOffsettingRevenueAmt": "IRS_TFMTDORVA",
-    "TotalFinancialAssistanceTyp_NetCommunityBenefitExpnsAmt": "IRS_TFMTNCBEA",
-    "TotalFinancialAssistanceTyp_TotalExpensePct": "IRS_TFMTNCBEP",
-    "CommunityHealthServicesGrp_TotalCommunityBenefitExpnsAmt": "IRS_CHISTCBEA",
-    "CommunityHealthServicesGrp_DirectOffsettingRevenueAmt": "IRS_CHISDORVA",
-    "CommunityHealthServicesGrp_NetCommunityBenefitExpnsAmt": "IRS_CHISNCBEA",
-    "CommunityHealthServicesGrp_TotalExpensePct": "IRS_CHISNCBEP",
-    "HealthProfessionsEducationGrp_TotalCommunityBenefitExpnsAmt": "IRS_HPEDTCBEA",
-    "HealthProfessionsEducationGrp_DirectOffsettingRevenueAmt": "IRS_HPEDDORVA",
-    "HealthProfessionsEducationGrp_NetCommunityBenefitExpnsAmt": "IRS_HPEDNCBEA",
-    "HealthProfessionsEducationGrp_TotalExpensePct": "IRS_HPEDNCBEP",
-    "SubsidizedHealthServicesGrp_TotalCommunityBenefitExpnsAmt": "IRS_SBHSTCBEA",
-    "SubsidizedHealthServicesGrp_DirectOffsettingRevenueAmt": "IRS_SBHSDORVA",
-    "SubsidizedHealthServicesGrp_NetCommunityBenefitExpnsAmt": "IRS_SBHSNCBEA",
-    "SubsidizedHealthServicesGrp_TotalExpensePct": "IRS_SBHSNCBEP",
-    "ResearchGrp_TotalCommunityBenefitExpnsAmt": "IRS_RSCHTCBEA",
-    "ResearchGrp_DirectOffsettingRevenueAmt": "IRS_RSCHDORVA",
-    "ResearchGrp_NetCommunityBenefitExpnsAmt": "IRS_RSCHNCBEA",
-    "ResearchGrp_TotalExpensePct": "IRS_RSCHNCBEP",
-    "CashAndInKindContributionsGrp_TotalCommunityBenefitExpnsAmt": "IRS_CIKCTCBEA",
-    "CashAndInKindContributionsGrp_DirectOffsettingRevenueAmt": "IRS_CIKCDORVA",
-    "CashAndInKindContributionsGrp_NetCommunityBenefitExpnsAmt": "IRS_CIKCNCBEA",
-    "CashAndInKindContributionsGrp_TotalExpensePct": "IRS_CIKCNCBEP",
-    "TotalOtherBenefitsGrp_TotalCommunityBenefitExpnsAmt": "IRS_TOBNTCBEA",
-    "TotalOtherBenefitsGrp_DirectOffsettingRevenueAmt": "IRS_TOBNDORVA",
-    "TotalOtherBenefitsGrp_NetCommunityBenefitExpnsAmt": "IRS_TOBNNCBEA",
-    "TotalOtherBenefitsGrp_TotalExpensePct": "IRS_TOBNNCBEP",
-    "TotalCommunityBenefitsGrp_TotalCommunityBenefitExpnsAmt": "IRS_TCBNTCBEA",
-    "TotalCommunityBenefitsGrp_DirectOffsettingRevenueAmt": "IRS_TCBNDORVA",
-    "TotalCommunityBenefitsGrp_NetCommunityBenefitExpnsAmt": "IRS_TCBNNCBEA",
-    "TotalCommunityBenefitsGrp_TotalExpensePct": "IRS_TCBNNCBEP",
-    "PhysicalImprvAndHousingGrp_TotalCommunityBenefitExpnsAmt": "IRS_PIAHTCBEA",
-    "PhysicalImprvAndHousingGrp_DirectOffsettingRevenueAmt": "IRS_PIAHDORVA",
-    "PhysicalImprvAndHousingGrp_NetCommunityBenefitExpnsAmt": "IRS_PIAHNCBEA",
-    "PhysicalImprvAndHousingGrp_TotalExpensePct": "IRS_PIAHNCBEP",
-    "EconomicDevelopmentGrp_TotalCommunityBenefitExpnsAmt": "IRS_ECDVTCBEA",
-    "EconomicDevelopmentGrp_DirectOffsettingRevenueAmt": "IRS_ECDVDORVA",
-    "EconomicDevelopmentGrp_NetCommunityBenefitExpnsAmt": "IRS_ECDVNCBEA",
-    "EconomicDevelopmentGrp_TotalExpensePct": "IRS_ECDVNCBEP",
-    "CommunitySupportGrp_TotalCommunityBenefitExpnsAmt": "IRS_CSPTTCBEA",
-    "CommunitySupportGrp_DirectOffsettingRevenueAmt": "IRS_CSPTDORVA",
-    "CommunitySupportGrp_NetCommunityBenefitExpnsAmt": "IRS_CSPTNCBEA",
-    "CommunitySupportGrp_TotalExpensePct": "IRS_CSPTNCBEP",
-    "EnvironmentalImprovementsGrp_TotalCommunityBenefitExpnsAmt": "IRS_ENVITCBEA",
-    "EnvironmentalImprovementsGrp_DirectOffsettingRevenueAmt": "IRS_ENVIDORVA",
-    "EnvironmentalImprovementsGrp_NetCommunityBenefitExpnsAmt": "IRS_ENVINCBEA",
-    "EnvironmentalImprovementsGrp_TotalExpensePct": "IRS_ENVINCBEP",
-    "LeadershipDevelopmentGrp_TotalCommunityBenefitExpnsAmt": "IRS_LDATTCBEA",
-    "LeadershipDevelopmentGrp_DirectOffsettingRevenueAmt": "IRS_LDATDORVA",
-    "LeadershipDevelopmentGrp_NetCommunityBenefitExpnsAmt": "IRS_LDATNCBEA",
-    "LeadershipDevelopmentGrp_TotalExpensePct": "IRS_LDATNCBEP",
-    "CoalitionBuildingGrp_TotalCommunityBenefitExpnsAmt": "IRS_CBLDTCBEA",
-    "CoalitionBuildingGrp_DirectOffsettingRevenueAmt": "IRS_CBLDDORVA",
-    "CoalitionBuildingGrp_NetCommunityBenefitExpnsAmt": "IRS_CBLDNCBEA",
-    "CoalitionBuildingGrp_TotalExpensePct": "IRS_CBLDNCBEP",
-    "HealthImprovementAdvocacyGrp_TotalCommunityBenefitExpnsAmt": "IRS_CHAITCBEA",
-    "HealthImprovementAdvocacyGrp_DirectOffsettingRevenueAmt": "IRS_CHAIDORVA",
-    "HealthImprovementAdvocacyGrp_NetCommunityBenefitExpnsAmt": "IRS_CHAINCBEA",
-    "HealthImprovementAdvocacyGrp_TotalExpensePct": "IRS_CHAINCBEP",
-    "WorkforceDevelopmentGrp_TotalCommunityBenefitExpnsAmt": "IRS_WKDVTCBEA",
-    "WorkforceDevelopmentGrp_DirectOffsettingRevenueAmt": "IRS_WKDVDORVA",
-    "WorkforceDevelopmentGrp_NetCommunityBenefitExpnsAmt": "IRS_WKDVNCBEA",
-    "WorkforceDevelopmentGrp_TotalExpensePct": "IRS_WKDVNCBEP",
-    "OtherCommuntityBuildingActyGrp_TotalCommunityBenefitExpnsAmt": "IRS_OCBATCBEA",
-    "OtherCommuntityBuildingActyGrp_DirectOffsettingRevenueAmt": "IRS_OCBADORVA",
-    "OtherCommuntityBuildingActyGrp_NetCommunityBenefitExpnsAmt": "IRS_OCBANCBEA",
-    "OtherCommuntityBuildingActyGrp_TotalExpensePct": "IRS_OCBANCBEP",
-    "TotalCommuntityBuildingActyGrp_TotalCommunityBenefitExpnsAmt": "IRS_TCBATCBEA",
-    "TotalCommuntityBuildingActyGrp_DirectOffsettingRevenueAmt": "IRS_TCBADORVA",
-    "TotalCommuntityBuildingActyGrp_NetCommunityBenefitExpnsAmt": "IRS_TCBANCBEA",
-    "TotalCommuntityBuildingActyGrp_TotalExpensePct": "IRS_TCBANCBEP",
-    "BadDebtExpenseReportedInd": "IRS_RPBDHFMA15",
-    "BadDebtExpenseAmt": "IRS_BADDBTTLAMT",
-    "BadDebtExpenseAttributableAmt": "IRS_BADDBTATFAP",
-    "ReimbursedByMedicareAmt": "IRS_TTLMCRREV",
-    "CostOfCareReimbursedByMedcrAmt": "IRS_TTLMCRCST",
-    "MedicareSurplusOrShortfallAmt": "IRS_TTLMCRSRPLS",
-    "CostAccountingSystemInd": "IRS_MCRCMUCAS",
-    "CostToChargeRatioInd": "IRS_MCRCMUCCR",
-    "CostingMethodologyOtherInd": "IRS_MCRCMUOTH",
-    "WrittenDebtCollectionPolicyInd": "IRS_DBTCOLWRT",
-    "FinancialAssistancePrvsnInd": "IRS_DBTCOLFAP",
-    "ManagementCompany_BusinessNameLine1Txt": "IRS_MCJVNAME",
-    "ManagementCompany_PrimaryActivitiesTxt": "IRS_MCJVDOPA",
-    "ManagementCompany_OrgProfitOrOwnershipPct": "IRS_MJORGPRFPCT",
-    "ManagementCompany_OfcrEtcProfitOrOwnershipPct": "IRS_MJODTPRFPCT",
-    "ManagementCompany_PhysiciansProfitOrOwnershipPct": "IRS_MJMDSPRFPCT",
-    "HospitalFacilitiesCnt": "IRS_TOTCNTFCLTY",
-    "HospitalFacilitiesGrp": "IRS_LSTALLFCLTY",
-    "FacilityNum1BusinessName": "IRS_FC1BUSNAME",
-    "FacilityNum1Street": "IRS_FC1ADDRESS",
-    "FacilityNum1City": "IRS_FC1CITYNAME",
-    "FacilityNum1State": "IRS_FC1STATEABB",
-    "FacilityNum1ZIP": "IRS_FC1ZIPCODE",
-    "FacilityNum1Country": "IRS_FC1COUNTRY",
-    "FacilityNum2BusinessName": "IRS_FC2BUSNAME",
-    "FacilityNum2Street": "IRS_FC2ADDRESS",
-    "FacilityNum2City": "IRS_FC2CITYNAME",
-    "FacilityNum2State": "IRS_FC2STATEABB",
-    "FacilityNum2ZIP": "IRS_FC2ZIPCODE",
-    "FacilityNum2Country": "IRS_FC2COUNTRY",
-    "SubordinateHospitalName": "IRS_SUBHSPNAME",
-    "SubordinateHospitalEIN": "IRS_SUBHSPEIN",
-    "LicensedHospitalInd": "IRS_FCISLICHSP",
-    "GeneralMedicalAndSurgicalInd": "IRS_FCISGMSHSP",
-    "ChildrensHospitalInd": "IRS_FCISCLDHSP",
-    "TeachingHospitalInd": "IRS_FCISTCHHSP",
-    "CriticalAccessHospitalInd": "IRS_FCISCRAHSP",
-    "ResearchFacilityInd": "IRS_FCISRSRCHF",
-    "FirstLicensedCYOrPYInd": "IRS_CHNAVB1",
-    "TaxExemptHospitalCYOrPYInd": "IRS_CHNAVB2",
-    "CHNAConductedInd": "IRS_CHNAVB3",
-    "CommunityDefinitionInd": "IRS_CHNAVB3A",
-    "CommunityDemographicsInd": "IRS_CHNAVB3B",
-    "ExistingResourcesInd": "IRS_CHNAVB3C",
-    "HowDataObtainedInd": "IRS_CHNAVB3D",
-    "CommunityHealthNeedsInd": "IRS_CHNAVB3E",
-    "OtherHealthIssuesInd": "IRS_CHNAVB3F",
-    "CommunityHlthNeedsIdProcessInd": "IRS_CHNAVB3G",
-    "ConsultingProcessInd": "IRS_CHNAVB3H",
-    "PriorCHNAImpactInd": "IRS_CHNAVB3I",
-    "CHNAOtherInd": "IRS_CHNAVB3J",
-    "CHNAConductedYr": "IRS_CHNAVB4",
-    "TakeIntoAccountOthersInputInd": "IRS_CHNAVB5",
-    "CHNAConductedWithOtherFcltsInd": "IRS_CHNAVB6A",
-    "CHNAConductedWithNonFcltsInd": "IRS_CHNAVB6B",
-    "CHNAReportWidelyAvailableInd": "IRS_CHNAVB7",
-    "RptAvailableOnOwnWebsiteInd": "IRS_CHNAVB7A",
-    "OwnWebsiteURLTxt": "IRS_CHNAVB7AURL",
-    "OtherWebsiteInd": "IRS_CHNAVB7B",
-    "OtherWebsiteURLTxt": "IRS_CHNAVB7BURL",
-    "PaperCopyPublicInspectionInd": "IRS_CHNAVB7C",
-    "RptAvailableThruOtherMethodInd": "IRS_CHNAVB7D",
-    "ImplementationStrategyAdoptInd": "IRS_CHNAVB8",
-    "ImplementationStrategyAdptYr": "IRS_CHNAVB9",
-    "StrategyPostedWebsiteInd": "IRS_CHNAVB10",
-    "StrategyWebsiteURLTxt": "IRS_CHNAVB10A",
-    "StrategyAttachedInd": "IRS_CHNAVB10B",
-    "BinaryAttachment": "IRS_CHNAVB10B2",
-    "OrganizationIncurExciseTaxInd": "IRS_CHNAVB12A",
-    "Form4720FiledInd": "IRS_CHNAVB12B",
-    "ExciseReportForm4720ForAllAmt": "IRS_CHNAVB12C",
-    "EligCriteriaExplainedInd": "IRS_FAPVB13",
-    "FPGFamilyIncmLmtFreeDscntInd": "IRS_FAPVB13A",
-    "FPGFamilyIncmLmtFreeCarePct": "IRS_FAPVB13AFC",
-    "FPGFamilyIncmLmtDscntCarePct": "IRS_FAPVB13ADC",
-    "IncomeLevelCriteriaInd": "IRS_FAPVB13B",
-    "AssetLevelCriteriaInd": "IRS_FAPVB13C",
-    "MedicalIndigencyCriteriaInd": "IRS_FAPVB13D",
-    "InsuranceStatusCriteriaInd": "IRS_FAPVB13E",
-    "UnderinsuranceStatCriteriaInd": "IRS_FAPVB13F",
-    "ResidencyCriteriaInd": "IRS_FAPVB13G",
-    "OtherCriteriaInd": "IRS_FAPVB13H",
-    "ExplainedBasisInd": "IRS_FAPVB14",
-    "AppFinancialAsstExplnInd": "IRS_FAPVB15",
-    "DescribedInfoInd": "IRS_FAPVB15A",
-    "DescribedSuprtDocInd": "IRS_FAPVB15B",
-    "ProvidedHospitalContactInd": "IRS_FAPVB15C",
-    "ProvidedNonprofitContactInd": "IRS_FAPVB15D",
-    "OtherMethodInd": "IRS_FAPVB15E",
-    "IncludesPublicityMeasuresInd": "IRS_FAPVB16",
-    "FAPAvailableOnWebsiteInd": "IRS_FAPVB16A",
-    "FAPAvailableOnWebsiteURLTxt": "IRS_FAPVB16AURL",
-    "FAPAppAvailableOnWebsiteInd": "IRS_FAPVB16B",
-    "FAPAppAvailableOnWebsiteURLTxt": "IRS_FAPVB16BURL",
-    "FAPSummaryOnWebsiteInd": "IRS_FAPVB16C",
-    "FAPSummaryOnWebsiteURLTxt": "IRS_FAPVB16CURL",
-    "FAPAvlblOnRequestNoChargeInd": "IRS_FAPVB16D",
-    "FAPAppAvlblOnRequestNoChrgInd": "IRS_FAPVB16E",
-    "FAPSumAvlblOnRequestNoChrgInd": "IRS_FAPVB16F",
-    "NotifiedFAPCopyBillDisplayInd": "IRS_FAPVB16G",
-    "CommuntityNotifiedFAPInd": "IRS_FAPVB16H",
-    "FAPTranslatedInd": "IRS_FAPVB16I",
-    "OtherPublicityInd": "IRS_FAPVB16J",
-    "FAPActionsOnNonpaymentInd": "IRS_BACVB17",
-    "PermitReportToCreditAgencyInd": "IRS_BACVB18A",
-    "PermitSellingDebtInd": "IRS_BACVB18B",
-    "PermitDeferDenyRqrPaymentInd": "IRS_BACVB18C",
-    "PermitLegalJudicialProcessInd": "IRS_BACVB18D",
-    "PermitOtherActionsInd": "IRS_BACVB18E",
-    "PermitNoActionsInd": "IRS_BACVB18F",
-    "CollectionActivitiesInd": "IRS_BACVB19",
-    "ReportingToCreditAgencyInd": "IRS_BACVB19A",
-    "EngagedSellingDebtInd": "IRS_BACVB19B",
-    "EngageDeferDenyRqrPaymentInd": "IRS_BACVB19C",
-    "EngagedLegalJudicialProcessInd": "IRS_BACVB19D",
-    "OtherActionsInd": "IRS_BACVB19E",
-    "ProvidedWrittenNoticeInd": "IRS_BACVB20A",
-    "MadeEffortOrallyNotifyInd": "IRS_BACVB20B",
-    "ProcessedFAPApplicationInd": "IRS_BACVB20C",
-    "MadePresumptiveEligDetermInd": "IRS_BACVB20D",
-    "OtherActionsTakenInd": "IRS_BACVB20E",
-    "NoneMadeInd": "IRS_BACVB20F",
-    "NondisEmergencyCarePolicyInd": "IRS_EMCVB21",
-    "NoEmergencyCareInd": "IRS_EMCVB21A",
-    "NoEmergencyCarePolicyInd": "IRS_EMCVB21B",
-    "EmergencyCareLimitedInd": "IRS_EMCVB21C",
-    "OtherReasonInd": "IRS_EMCVB21D",
-    "LookBackMedicareInd": "IRS_EMCVB22A",
-    "LookBackMedicarePrivateInd": "IRS_EMCVB22B",
-    "LookBackMedicaidMedcrPrvtInd": "IRS_EMCVB22C",
-    "ProspectiveMedicareMedicaidInd": "IRS_EMCVB22D",
-    "AmountsGenerallyBilledInd": "IRS_EMCVB23",
-    "GrossChargesInd": "IRS_EMCVB24",
-    "SupplementalFacilityNum": "IRS_TOTCNTOHF",
-    "OthHlthCareFcltsGrp_BusinessName": "IRS_OHFBUSNAME",
-    "OthHlthCareFcltsGrp_AddressLine1Txt": "IRS_OHFADDRESS",
-    "OthHlthCareFcltsGrp_CityNm": "IRS_OHFCITYNAME",
-    "OthHlthCareFcltsGrp_StateAbbreviationCd": "IRS_OHFSTATEABB",
-    "OthHlthCareFcltsGrp_ZIPCd": "IRS_OHFZIPCODE",
-}
-
     # Helper functions
     # These small functions each do one job:
     #  - get_text: Safely read text from an XML element
@@ -1232,6 +1117,12 @@ rename_dict = {
 def get_text(tag):
     return tag.text.strip() if tag and tag.text else None
 
+def find_path(tag, path):
+    """The tag at path ("Filer/USAddress/City") below tag, each step found like soup.find, or None."""
+    for name in path.split("/"):
+        tag = tag.find(name) if tag else None
+    return tag
+
 def parse_bool(value):
     """Convert raw tag text to a standardized 'Yes' or 'No'."""
     if value is None:
@@ -1525,262 +1416,3048 @@ def extract_scheduleH_data(soup):
 
     return sch_data
 
-    # EXTRACT DATA
-    # This function ties together reading one XML, pulling metadata,
-    # calling extract_scheduleH_data, and packaging everything as one row
-def extract_data(xml_file, ReleaseYear, ReleaseSource, ReleaseDownload, ReleaseFileName):
-    try:
-        with open(xml_file, "r", encoding="utf-8") as file:
-            content = file.read()
-        soup = BeautifulSoup(content, "xml")
-
-        # BASE METADATA
-        base = {}
-        base["FileName"] = os.path.basename(xml_file)
-        base["TaxPeriodBeginDt"] = get_text(soup.find("TaxPeriodBeginDt"))
-        base["TaxPeriodEndDt"] = get_text(soup.find("TaxPeriodEndDt"))
-        base["TaxYr"] = get_text(soup.find("TaxYr"))
-        base["PreparationDt"] = get_text(soup.find("PreparationDt"))
-
-        filer = soup.find("Filer")
-        if filer:
-            base["Filer_EIN"] = get_text(filer.find("EIN"))
-            bn = filer.find("BusinessName")
-            base["Filer_BusinessName"] = get_text(bn.find("BusinessNameLine1Txt")) if bn else None
-            base["Filer_BusinessNameControlTxt"] = get_text(filer.find("BusinessNameControlTxt"))
-            base["Filer_PhoneNum"] = get_text(filer.find("PhoneNum"))
-            us_addr = filer.find("USAddress")
-            foreign_addr = filer.find("ForeignAddress")
-            if us_addr:
-                base["Filer_AddressLine1Txt"] = get_text(us_addr.find("AddressLine1Txt"))
-                base["Filer_CityNm"] = get_text(us_addr.find("CityNm"))
-                base["Filer_StateAbbreviationCd"] = get_text(us_addr.find("StateAbbreviationCd"))
-                base["Filer_ZIPCd"] = get_text(us_addr.find("ZIPCd"))
-                base["Filer_Country"] = "USA"
-            elif foreign_addr:
-                base["Filer_AddressLine1Txt"] = get_text(foreign_addr.find("AddressLine1Txt"))
-                base["Filer_CityNm"] = get_text(foreign_addr.find("CityNm"))
-                base["Filer_StateAbbreviationCd"] = get_text(foreign_addr.find("ProvinceOrStateNm"))
-                base["Filer_ZIPCd"] = get_text(foreign_addr.find("ForeignPostalCd"))
-                base["Filer_Country"] = get_text(foreign_addr.find("CountryCd"))
-            else:
-                for key in [
-                    "Filer_AddressLine1Txt", "Filer_CityNm", "Filer_StateAbbreviationCd",
-                    "Filer_ZIPCd", "Filer_Country"
-                ]:
-                    base[key] = None
+    # EXTRACT DATA (BeautifulSoup reference engine)
+    # This function ties together pulling metadata from one parsed XML,
+    # calling extract_scheduleH_data, and packaging everything as one row.
+    # It is the original extraction logic and is kept as the reference the streaming engine is checked against.
+def extract_data_soup(content, file_name, release_info):
+    soup = BeautifulSoup(content.decode("utf-8"), "xml")
+    if phase_timing:
+        parse_finished_at[0] = time.perf_counter()
+    return_tag = soup.find("Return")
+    family = schema_family_for(return_tag.get("returnVersion") if return_tag else None)
+
+    # BASE METADATA
+    base = {}
+    base["FileName"] = file_name
+    base["TaxPeriodBeginDt"] = get_text(soup.find("TaxPeriodBeginDt"))
+    base["TaxPeriodEndDt"] = get_text(soup.find("TaxPeriodEndDt"))
+    base["TaxYr"] = get_text(soup.find("TaxYr"))
+    base["PreparationDt"] = get_text(soup.find("PreparationDt"))
+    irs990 = soup.find("IRS990")
+    filing_amended_return[0] = get_text(irs990.find("AmendedReturnInd")) if irs990 else None
+
+    filer = soup.find("Filer")
+    if filer:
+        base["Filer_EIN"] = get_text(filer.find("EIN"))
+        bn = filer.find("BusinessName")
+        base["Filer_BusinessName"] = get_text(bn.find("BusinessNameLine1Txt")) if bn else None
+        base["Filer_BusinessNameControlTxt"] = get_text(filer.find("BusinessNameControlTxt"))
+        base["Filer_PhoneNum"] = get_text(filer.find("PhoneNum"))
+        us_addr = filer.find("USAddress")
+        foreign_addr = filer.find("ForeignAddress")
+        if us_addr:
+            base["Filer_AddressLine1Txt"] = get_text(us_addr.find("AddressLine1Txt"))
+            base["Filer_CityNm"] = get_text(us_addr.find("CityNm"))
+            base["Filer_StateAbbreviationCd"] = get_text(us_addr.find("StateAbbreviationCd"))
+            base["Filer_ZIPCd"] = get_text(us_addr.find("ZIPCd"))
+            base["Filer_Country"] = "USA"
+        elif foreign_addr:
+            base["Filer_AddressLine1Txt"] = get_text(foreign_addr.find("AddressLine1Txt"))
+            base["Filer_CityNm"] = get_text(foreign_addr.find("CityNm"))
+            base["Filer_StateAbbreviationCd"] = get_text(foreign_addr.find("ProvinceOrStateNm"))
+            base["Filer_ZIPCd"] = get_text(foreign_addr.find("ForeignPostalCd"))
+            base["Filer_Country"] = get_text(foreign_addr.find("CountryCd"))
         else:
             for key in [
-                "Filer_EIN", "Filer_BusinessName", "Filer_BusinessNameControlTxt", "Filer_PhoneNum",
-                "Filer_AddressLine1Txt", "Filer_CityNm", "Filer_StateAbbreviationCd", "Filer_ZIPCd", "Filer_Country"
+                "Filer_AddressLine1Txt", "Filer_CityNm", "Filer_StateAbbreviationCd",
+                "Filer_ZIPCd", "Filer_Country"
             ]:
                 base[key] = None
-       
-        supp_info = soup.find("SupplementalInformationGrp")
-        if supp_info:
-            fac_tag = supp_info.find_next_sibling("FacilityNum")
-            supplemental_facility_num = fac_tag.text.strip() if fac_tag and fac_tag.text else None
+    else:
+        for key in [
+            "Filer_EIN", "Filer_BusinessName", "Filer_BusinessNameControlTxt", "Filer_PhoneNum",
+            "Filer_AddressLine1Txt", "Filer_CityNm", "Filer_StateAbbreviationCd", "Filer_ZIPCd", "Filer_Country"
+        ]:
+            base[key] = None
+
+    supp_info = soup.find("SupplementalInformationGrp")
+    if supp_info:
+        fac_tag = supp_info.find_next_sibling("FacilityNum")
+        supplemental_facility_num = fac_tag.text.strip() if fac_tag and fac_tag.text else None
+    else:
+        supplemental_facility_num = None
+    base["SupplementalFacilityNum"] = supplemental_facility_num
+
+    # EXTRACT SCHEDULE H
+    scheduleH_tag = soup.find("IRS990ScheduleH")
+    if not scheduleH_tag:
+        return None
+    sch_data = extract_scheduleH_data(scheduleH_tag)
+
+    # OUTSIDE fields
+    outside_field_names = [
+        "TotalEmployeeCnt",
+        "TotalGrossUBIAmt",
+        "NetUnrelatedBusTxblIncmAmt",
+        "PYContributionsGrantsAmt",
+        "CYContributionsGrantsAmt",
+        "PYProgramServiceRevenueAmt",
+        "CYProgramServiceRevenueAmt",
+        "PYInvestmentIncomeAmt",
+        "CYInvestmentIncomeAmt",
+        "PYOtherRevenueAmt",
+        "CYOtherRevenueAmt",
+        "PYTotalRevenueAmt",
+        "CYTotalRevenueAmt",
+        "PYGrantsAndSimilarPaidAmt",
+        "CYGrantsAndSimilarPaidAmt",
+        "PYBenefitsPaidToMembersAmt",
+        "CYBenefitsPaidToMembersAmt",
+        "PYSalariesCompEmpBnftPaidAmt",
+        "CYSalariesCompEmpBnftPaidAmt",
+        "PYTotalProfFndrsngExpnsAmt",
+        "CYTotalProfFndrsngExpnsAmt",
+        "CYTotalFundraisingExpenseAmt",
+        "PYOtherExpensesAmt",
+        "CYOtherExpensesAmt",
+        "PYTotalExpensesAmt",
+        "CYTotalExpensesAmt",
+        "PYRevenuesLessExpensesAmt",
+        "CYRevenuesLessExpensesAmt",
+        "TotalAssetsBOYAmt",
+        "TotalAssetsEOYAmt",
+        "TotalLiabilitiesBOYAmt",
+        "TotalLiabilitiesEOYAmt",
+        "NetAssetsOrFundBalancesBOYAmt",
+        "NetAssetsOrFundBalancesEOYAmt",
+    ]
+    outside = {}
+    for field in outside_field_names:
+        outside[field] = get_text(soup.find(field))
+
+    # Combine
+    data = {}
+    data.update(base)
+    data.update(sch_data)
+    data.update(outside)
+
+    # Tags the filing's schema family renamed (see schema_families) are looked up along the family's path instead,
+    # the filer address from whichever address group the lookups above used
+    us_address = bool(filer and filer.find("USAddress"))
+    for raw_name, path in schema_overrides.get(family, {}).items():
+        if raw_name == "AmendedReturnInd":
+            filing_amended_return[0] = get_text(find_path(soup, path))
+        elif raw_name in filer_foreign_address_columns:
+            if not us_address:
+                data[filer_foreign_address_columns[raw_name]] = get_text(find_path(soup, path))
+        elif raw_name not in filer_address_columns or us_address:
+            data[raw_name] = get_text(find_path(soup, path))
+
+    # Insert the 4 release columns
+    data["ReleaseYear"] = release_info["ReleaseYear"]
+    data["ReleaseSource"] = release_info["ReleaseSource"]
+    data["ReleaseDownload"] = release_info["ReleaseDownload"]
+    data["ReleaseFileName"] = release_info["ReleaseFileName"]
+
+    # Return row in output order
+    return [data.get(field.raw_name) for field in field_registry]
+
+    # STREAMING EXTRACTION ENGINE
+    # The BeautifulSoup engine above calls soup.find(...) once per column, and every call walks
+    # the XML tree again from the top. That is several hundred full walks for a single filing.
+    # The streaming engine below reads each file exactly once, top to bottom, with lxml's iterparse.
+    #
+    # Before any file is read, the paths in field_registry are compiled into a dispatch table of "scopes":
+    #  - a scope is an XML group we search inside (the whole document, <Filer>, <IRS990ScheduleH>, ...)
+    #  - each scope maps a tag name either to an output slot (a position in the row) or to a nested scope
+    # While walking, every opening tag is looked up in the scopes that are currently open.
+    # The first matching tag fills the slot, which is exactly what soup.find(...) returns.
+    # A few columns need a small finishing step (addresses, facility lists), done in finish_streaming_row.
+ScopeRule = namedtuple("ScopeRule", ["fields", "scopes", "flag", "record_width"])
+
+def scope_rule(fields=None, scopes=None, flag=None, record_width=0):
+    """
+    One scope of the dispatch table.
+    fields: tag name -> slot filled with that tag's text
+    scopes: tag name -> nested ScopeRule searched inside that tag
+    flag: slot set to True when the scope's tag is found (for repeating scopes, the slot holding the list of records)
+    record_width: for repeating groups (every <HospitalFacilitiesGrp>), the size of each per-occurrence record
+    """
+    return ScopeRule(fields or {}, scopes or {}, flag, record_width)
+
+# Per-facility record layout for every <HospitalFacilitiesGrp>
+facility_record_slots = {
+    "FacilityNum": 0,
+    "BusinessName": 1,
+    "BusinessNameLine1Txt": 2,
+    "USAddress": 3,
+    "AddressLine1Txt": 4,
+    "CityNm": 5,
+    "StateAbbreviationCd": 6,
+    "ZIPCd": 7,
+    # Only filled with facility_table on
+    "BusinessNameLine2Txt": 8,
+    "FacilityReportingGroupCd": 9,
+    "LicensedHospitalInd": 10,
+    "GeneralMedicalAndSurgicalInd": 11,
+    "ChildrensHospitalInd": 12,
+    "TeachingHospitalInd": 13,
+    "CriticalAccessHospitalInd": 14,
+    "ResearchFacilityInd": 15,
+}
+
+# Per-block record layout for every <HospitalFcltyPoliciesPrctcGrp> (facility_table only)
+policy_record_slots = {
+    "FacilityReportingGroupCd": 0,
+    **{field.path: i + 1 for i, field in enumerate(facility_policy_fields)},
+}
+
+# Values the walk collects that are not output columns themselves: the foreign filer address
+streaming_helper_paths = {
+    "Filer_Foreign_AddressLine1Txt": "Filer/ForeignAddress/AddressLine1Txt",
+    "Filer_Foreign_CityNm": "Filer/ForeignAddress/CityNm",
+    "Filer_Foreign_ProvinceOrStateNm": "Filer/ForeignAddress/ProvinceOrStateNm",
+    "Filer_Foreign_ForeignPostalCd": "Filer/ForeignAddress/ForeignPostalCd",
+    "Filer_Foreign_CountryCd": "Filer/ForeignAddress/CountryCd",
+    "AmendedReturnInd": "IRS990/AmendedReturnInd",
+}
+
+# The Filer columns the foreign address fills when a filing has no US address
+filer_foreign_address_columns = {
+    "Filer_Foreign_AddressLine1Txt": "Filer_AddressLine1Txt",
+    "Filer_Foreign_CityNm": "Filer_CityNm",
+    "Filer_Foreign_ProvinceOrStateNm": "Filer_StateAbbreviationCd",
+    "Filer_Foreign_ForeignPostalCd": "Filer_ZIPCd",
+    "Filer_Foreign_CountryCd": "Filer_Country",
+}
+
+# Groups whose mere presence matters: path -> name of the slot set to True when the group is found
+streaming_scope_flags = {
+    "IRS990ScheduleH": "IRS990ScheduleH",
+    "Filer/USAddress": "Filer_USAddress",
+    "Filer/ForeignAddress": "Filer_ForeignAddress",
+    "IRS990ScheduleH/DiscountedCareOthPercentageGrp": "DiscountedCareOthPercentageGrp",
+}
+
+# The output columns each helper value, flag and the facility records are needed for, so that with
+# selected_columns the walk leaves out the ones nothing asks for. The IRS990ScheduleH flag is always needed.
+filer_address_columns = {"Filer_AddressLine1Txt", "Filer_CityNm", "Filer_StateAbbreviationCd", "Filer_ZIPCd", "Filer_Country"}
+streaming_helper_columns = {
+    "Filer_Foreign_AddressLine1Txt": {"Filer_AddressLine1Txt"},
+    "Filer_Foreign_CityNm": {"Filer_CityNm"},
+    "Filer_Foreign_ProvinceOrStateNm": {"Filer_StateAbbreviationCd"},
+    "Filer_Foreign_ForeignPostalCd": {"Filer_ZIPCd"},
+    "Filer_Foreign_CountryCd": {"Filer_Country"},
+    "Filer_USAddress": filer_address_columns,
+    "Filer_ForeignAddress": filer_address_columns,
+    "DiscountedCareOthPercentageGrp": {"FPGReferenceDiscountedCareInd_DiscountedCareOthPercentageGrp"},
+    # Only for dedupe_policy, which adds it to the columns
+    "AmendedReturnInd": {"AmendedReturnInd"},
+    "HospitalFacilities": {
+        "HospitalFacilitiesGrp",
+        *(f"FacilityNum{i}{part}" for i in (1, 2) for part in ("BusinessName", "Street", "City", "State", "ZIP", "Country")),
+    },
+}
+
+def compile_streaming_plan(path_overrides=None, columns=None):
+    """
+    Build the dispatch table from the paths in field_registry.
+    path_overrides ({raw name: path}) replaces registry (or helper) paths for one schema family (see schema_families).
+    columns (a set of raw names) leaves out everything those columns do not need; None keeps every column.
+    Returns (root scope, slot lookup by raw name, total number of slots, watch list).
+    The first len(field_registry) slots are the output row itself; helper values get the slots after them,
+    in the same order for every table.
+    The watch list is None when every column is extracted. Otherwise it holds (slot, scopes it lies in, repeating)
+    for every slot the columns need, which tells the walk when it can stop (see extract_data_streaming).
+    """
+    path_overrides = path_overrides or {}
+    if facility_table and columns is not None:
+        # The facility table copies the filing's columns from its row
+        columns = set(columns) | {field.raw_name for field in facility_filing_fields}
+    if dedupe_policy and columns is not None:
+        columns = set(columns) | {field.raw_name for field in dedupe_fields} | {"AmendedReturnInd"}
+    slots = dict(field_positions)
+    for name in [*streaming_helper_paths, *streaming_scope_flags.values(), "HospitalFacilities", "HospitalPolicies"]:
+        slots[name] = len(slots)
+
+    def needed(name):
+        if columns is None or (facility_table and name == "HospitalFacilities"):
+            return True
+        if name in field_positions:
+            return name in columns
+        return name not in streaming_helper_columns or bool(streaming_helper_columns[name] & columns)
+
+    # Group the paths into a tree of {"fields": {tag: slot}, "scopes": {tag: subtree}}
+    tree = {"fields": {}, "scopes": {}}
+
+    def node_at(groups):
+        node = tree
+        for group in groups:
+            node = node["scopes"].setdefault(group, {"fields": {}, "scopes": {}})
+        return node
+
+    paths = [(field.raw_name, field.path) for field in field_registry if field.path] + list(streaming_helper_paths.items())
+    paths = [(name, path_overrides.get(name, path)) for name, path in paths if needed(name)]
+    flag_paths = [(path, flag) for path, flag in streaming_scope_flags.items() if needed(flag)]
+    for name, path in paths:
+        *groups, tag = path.split("/")
+        node_at(groups)["fields"][tag] = slots[name]
+    for path, _ in flag_paths:
+        node_at(path.split("/"))
+
+    def build(node, path):
+        flag = streaming_scope_flags.get(path)
+        return scope_rule(
+            fields=node["fields"],
+            scopes={tag: build(child, f"{path}/{tag}" if path else tag) for tag, child in node["scopes"].items()},
+            flag=slots[flag] if flag is not None and needed(flag) else None,
+        )
+
+    root = build(tree, "")
+    schedule_h = root.scopes["IRS990ScheduleH"]
+
+    # Every <HospitalFacilitiesGrp> gets its own record, used for the facility list and the first two facilities
+    # (with facility_table, the record also keeps the facility's other tags)
+    if needed("HospitalFacilities"):
+        facility_tags = ["FacilityNum"]
+        name_tags = ["BusinessNameLine1Txt"]
+        if facility_table:
+            facility_tags += ["FacilityReportingGroupCd"] + [
+                field.path for field in facility_own_fields if field.path and "/" not in field.path and field.path != "FacilityNum"
+            ]
+            name_tags.append("BusinessNameLine2Txt")
+        schedule_h.scopes["HospitalFacilitiesGrp"] = scope_rule(
+            fields={tag: facility_record_slots[tag] for tag in dict.fromkeys(facility_tags)},
+            scopes={
+                "BusinessName": scope_rule(
+                    fields={tag: facility_record_slots[tag] for tag in name_tags},
+                    flag=facility_record_slots["BusinessName"],
+                ),
+                "USAddress": scope_rule(
+                    fields={
+                        tag: facility_record_slots[tag]
+                        for tag in ("AddressLine1Txt", "CityNm", "StateAbbreviationCd", "ZIPCd")
+                    },
+                    flag=facility_record_slots["USAddress"],
+                ),
+            },
+            flag=slots["HospitalFacilities"],
+            record_width=len(facility_record_slots),
+        )
+
+    # With facility_table, every <HospitalFcltyPoliciesPrctcGrp> gets its own record as well. It hangs off the root
+    # scope, because <IRS990ScheduleH> already has a scope for this tag: the first block, for the main row.
+    if facility_table:
+        root.scopes["HospitalFcltyPoliciesPrctcGrp"] = scope_rule(
+            fields=policy_record_slots,
+            flag=slots["HospitalPolicies"],
+            record_width=len(policy_record_slots),
+        )
+
+    if columns is None:
+        return root, slots, len(slots), None
+
+    def scopes_along(groups):
+        rules = [root]
+        for group in groups:
+            rules.append(rules[-1].scopes[group])
+        return tuple(rules[1:])
+
+    watch = [(slots[name], scopes_along(path.split("/")[:-1]), False) for name, path in paths]
+    watch += [(slots[flag], scopes_along(path.split("/")[:-1]), False) for path, flag in flag_paths]
+    # Facilities repeat, and SupplementalFacilityNum is found outside the scopes: both are settled once
+    # <IRS990ScheduleH> has closed
+    if needed("HospitalFacilities"):
+        watch.append((slots["HospitalFacilities"], (schedule_h,), True))
+    if facility_table:
+        watch.append((slots["HospitalPolicies"], (schedule_h,), True))
+    if "SupplementalFacilityNum" in columns:
+        watch.append((slots["SupplementalFacilityNum"], (schedule_h,), False))
+    return root, slots, len(slots), watch
+
+streaming_plan, streaming_slots, streaming_width, streaming_watch = compile_streaming_plan(columns=output_raw_names)
+
+    # SCHEMA VERSIONS
+    # Every filing names the IRS e-file schema it was written with: <Return returnVersion="2019v5.1">.
+    # The IRS renames or moves tags between schema versions now and then. schema_families lists ranges of
+    # versions whose tags are known, each with the paths that differ from field_registry for that range.
+    # Each family gets its own dispatch table, compiled once at startup, and the streaming engine picks
+    # the table from the returnVersion of each file. The BeautifulSoup engine looks the overridden columns up
+    # along the family's paths (see schema_overrides), so both engines still give the same rows.
+    # Files with a version outside every range (a new schema the IRS released after this list was written,
+    # or no returnVersion at all) use the plain field_registry paths and are counted, so the run reports
+    # which versions still need a look.
+    #  - (family name, first version, last version, {raw name: path that replaces the registry path})
+schema_families = [
+    # 2009v1.0 through 2012v2.x, before the IRS renamed most tags in 2013v3.0: the return header, the filer and the
+    # Form 990 summary lines carry their old names (TaxYear instead of TaxYr, ...CurrentYear instead of CY...Amt,
+    # AmendedReturn instead of AmendedReturnInd). Schedule H is not supported for these filings: its columns keep the
+    # registry paths, so the ones whose tags were renamed in 2013v3.0 come out empty.
+    ("2009v1.0-2012v2.x", "2009v1.0", "2012v2.99", {
+        "TaxPeriodBeginDt": "ReturnHeader/TaxPeriodBeginDate",
+        "TaxPeriodEndDt": "ReturnHeader/TaxPeriodEndDate",
+        "TaxYr": "ReturnHeader/TaxYear",
+        "PreparationDt": "ReturnHeader/Preparer/DatePrepared",
+        "Filer_BusinessName": "Filer/Name/BusinessNameLine1",
+        "Filer_BusinessNameControlTxt": "Filer/NameControl",
+        "Filer_PhoneNum": "Filer/Phone",
+        "Filer_AddressLine1Txt": "Filer/USAddress/AddressLine1",
+        "Filer_CityNm": "Filer/USAddress/City",
+        "Filer_StateAbbreviationCd": "Filer/USAddress/State",
+        "Filer_ZIPCd": "Filer/USAddress/ZIPCode",
+        "Filer_Foreign_AddressLine1Txt": "Filer/ForeignAddress/AddressLine1",
+        "Filer_Foreign_CityNm": "Filer/ForeignAddress/City",
+        "Filer_Foreign_ProvinceOrStateNm": "Filer/ForeignAddress/ProvinceOrState",
+        "Filer_Foreign_ForeignPostalCd": "Filer/ForeignAddress/PostalCode",
+        "Filer_Foreign_CountryCd": "Filer/ForeignAddress/Country",
+        "AmendedReturnInd": "IRS990/AmendedReturn",
+        "TotalEmployeeCnt": "IRS990/TotalNbrEmployees",
+        "TotalGrossUBIAmt": "IRS990/TotalGrossUBI",
+        "NetUnrelatedBusTxblIncmAmt": "IRS990/NetUnrelatedBusinessTxblIncome",
+        "PYContributionsGrantsAmt": "IRS990/ContributionsGrantsPriorYear",
+        "CYContributionsGrantsAmt": "IRS990/ContributionsGrantsCurrentYear",
+        "PYProgramServiceRevenueAmt": "IRS990/ProgramServiceRevenuePriorYear",
+        "CYProgramServiceRevenueAmt": "IRS990/ProgramServiceRevenueCY",
+        "PYInvestmentIncomeAmt": "IRS990/InvestmentIncomePriorYear",
+        "CYInvestmentIncomeAmt": "IRS990/InvestmentIncomeCurrentYear",
+        "PYOtherRevenueAmt": "IRS990/OtherRevenuePriorYear",
+        "CYOtherRevenueAmt": "IRS990/OtherRevenueCurrentYear",
+        "PYTotalRevenueAmt": "IRS990/TotalRevenuePriorYear",
+        "CYTotalRevenueAmt": "IRS990/TotalRevenueCurrentYear",
+        "PYGrantsAndSimilarPaidAmt": "IRS990/GrantsAndSimilarAmntsPriorYear",
+        "CYGrantsAndSimilarPaidAmt": "IRS990/GrantsAndSimilarAmntsCY",
+        "PYBenefitsPaidToMembersAmt": "IRS990/BenefitsPaidToMembersPriorYear",
+        "CYBenefitsPaidToMembersAmt": "IRS990/BenefitsPaidToMembersCY",
+        "PYSalariesCompEmpBnftPaidAmt": "IRS990/SalariesEtcPriorYear",
+        "CYSalariesCompEmpBnftPaidAmt": "IRS990/SalariesEtcCurrentYear",
+        "PYTotalProfFndrsngExpnsAmt": "IRS990/TotalProfFundrsngExpPriorYear",
+        "CYTotalProfFndrsngExpnsAmt": "IRS990/TotalProfFundrsngExpCY",
+        "CYTotalFundraisingExpenseAmt": "IRS990/TotalFundrsngExpCurrentYear",
+        "PYOtherExpensesAmt": "IRS990/OtherExpensePriorYear",
+        "CYOtherExpensesAmt": "IRS990/OtherExpensesCurrentYear",
+        "PYTotalExpensesAmt": "IRS990/TotalExpensesPriorYear",
+        "CYTotalExpensesAmt": "IRS990/TotalExpensesCurrentYear",
+        "PYRevenuesLessExpensesAmt": "IRS990/RevenuesLessExpensesPriorYear",
+        "CYRevenuesLessExpensesAmt": "IRS990/RevenuesLessExpensesCY",
+        "TotalAssetsBOYAmt": "IRS990/TotalAssetsBOY",
+        "TotalAssetsEOYAmt": "IRS990/TotalAssetsEOY",
+        "TotalLiabilitiesBOYAmt": "IRS990/TotalLiabilitiesBOY",
+        "TotalLiabilitiesEOYAmt": "IRS990/TotalLiabilitiesEOY",
+        "NetAssetsOrFundBalancesBOYAmt": "IRS990/NetAssetsOrFundBalancesBOY",
+        "NetAssetsOrFundBalancesEOYAmt": "IRS990/NetAssetsOrFundBalancesEOY",
+    }),
+    # From 2013v3.0 (the first schema with today's tag names) through 2024v5.x every column keeps its registry path:
+    # none of the tags read here, Schedule H included, was renamed within that range, so no overrides are needed.
+    # Those paths are scoped because some tags repeat: <OtherInd>, for one, appears in several Schedule H groups, and
+    # only the ones inside <CostingMethodologyUsedGrp> and <HospitalFcltyPoliciesPrctcGrp> are wanted.
+    # A renamed tag in a later schema gets its own family with an override, e.g.
+    # ("2025v1.0-", "2025v1.0", "2099v9.9", {"CHNAOtherInd": "IRS990ScheduleH/HospitalFcltyPoliciesPrctcGrp/NewTagNm"}),
+    ("2013v3.0-2024v5.x", "2013v3.0", "2024v5.99", {}),
+]
+
+def schema_version_key(version):
+    """(year, major, minor) for a returnVersion such as "2019v5.1", or None if it does not look like one."""
+    match = re.fullmatch(r"\s*(\d{4})v(\d+)\.(\d+)\s*", version or "")
+    return tuple(int(part) for part in match.groups()) if match else None
+
+# Family name -> {raw name: path}, for the BeautifulSoup engine
+schema_overrides = {name: overrides for name, _, _, overrides in schema_families}
+
+# Family name -> (root scope, watch list)
+schema_plans = {
+    name: compile_streaming_plan(overrides, output_raw_names)[::3]
+    for name, _, _, overrides in schema_families
+}
+
+# returnVersion -> family name (None for an unknown version), filled as versions are seen
+schema_family_by_version = {}
+
+# How many filings were read with each family's table ("unknown <version>" for the rest)
+schema_version_stats = Counter()
+
+def schema_family_of(version):
+    """Name of the family a returnVersion belongs to (None if unknown)."""
+    if version not in schema_family_by_version:
+        key = schema_version_key(version)
+        schema_family_by_version[version] = next(
+            (
+                name for name, first, last, _ in schema_families
+                if key and schema_version_key(first) <= key <= schema_version_key(last)
+            ),
+            None,
+        )
+    return schema_family_by_version[version]
+
+def schema_family_for(version):
+    """schema_family_of(version), counted in schema_version_stats."""
+    family = schema_family_of(version)
+    schema_version_stats[family or f"unknown {version or 'no version'}"] += 1
+    return family
+
+def schema_version_summary(stats):
+    """One line such as '2013v3.0-2024v5.x 1,204, unknown 2 (2025v1.0 1, no version 1)'."""
+    known = [f"{name} {stats[name]:,}" for name, _, _, _ in schema_families if stats[name]]
+    unknown = sorted((key[len("unknown "):], count) for key, count in stats.items() if key.startswith("unknown ") and count)
+    parts = known + [f"unknown {sum(count for _, count in unknown):,}"]
+    if unknown:
+        parts[-1] += " (" + ", ".join(f"{version} {count:,}" for version, count in unknown) + ")"
+    return ", ".join(parts)
+
+# Marks a slot whose tag has not been seen yet
+UNSET = object()
+
+# "{http://www.irs.gov/efile}EIN" -> "EIN", cached because the same few hundred tags repeat in every file
+local_tag_names = {}
+
+def element_text(elem):
+    """
+    Same result as get_text(tag) on the BeautifulSoup tree: all text inside the tag, stripped.
+    BeautifulSoup shrinks whitespace-only text between child tags to one newline or space, so we do too.
+    """
+    if len(elem) == 0:
+        text = elem.text
+    else:
+        text = "".join(
+            piece if piece.strip(" \n\t\f\r") else ("\n" if "\n" in piece else " ")
+            for piece in elem.itertext()
+        )
+    return text.strip() if text else None
+
+def finish_streaming_row(raw, file_name, release_info):
+    """Turn the slot buffer filled by the walk into an output row, or None without Schedule H."""
+    s = streaming_slots
+    if raw[s["IRS990ScheduleH"]] is UNSET:
+        return None
+
+    row = [None if value is UNSET else value for value in raw[:len(field_registry)]]
+    row[s["FileName"]] = file_name
+    for key in ("ReleaseYear", "ReleaseSource", "ReleaseDownload", "ReleaseFileName"):
+        row[s[key]] = release_info[key]
+
+    def value(name):
+        v = raw[s[name]]
+        return None if v is UNSET else v
+
+    # Filer address: a US address wins, otherwise the foreign address fills the same columns
+    if raw[s["Filer_USAddress"]] is not UNSET:
+        row[s["Filer_Country"]] = "USA"
+    elif raw[s["Filer_ForeignAddress"]] is not UNSET:
+        for helper, column in filer_foreign_address_columns.items():
+            row[s[column]] = value(helper)
+
+    if raw[s["DiscountedCareOthPercentageGrp"]] is not UNSET:
+        col = s["FPGReferenceDiscountedCareInd_DiscountedCareOthPercentageGrp"]
+        row[col] = parse_dcop(row[col])
+
+    # Part V facilities: the joined "num|name" list plus the first two facilities' details
+    facilities = raw[s["HospitalFacilities"]]
+    if facilities is not UNSET:
+        f = facility_record_slots
+        facilities = [[None if v is UNSET else v for v in record] for record in facilities]
+        row[s["HospitalFacilitiesGrp"]] = ";".join(
+            f"{fac[f['FacilityNum']]}|{fac[f['BusinessNameLine1Txt']] if fac[f['BusinessName']] else ''}"
+            for fac in facilities
+        )
+        for idx, fac in enumerate(facilities[:2]):
+            prefix = f"FacilityNum{idx+1}"
+            row[s[f"{prefix}BusinessName"]] = fac[f["BusinessNameLine1Txt"]] if fac[f["BusinessName"]] else None
+            if fac[f["USAddress"]]:
+                row[s[f"{prefix}Street"]] = fac[f["AddressLine1Txt"]]
+                row[s[f"{prefix}City"]] = fac[f["CityNm"]]
+                row[s[f"{prefix}State"]] = fac[f["StateAbbreviationCd"]]
+                row[s[f"{prefix}ZIP"]] = fac[f["ZIPCd"]]
+                row[s[f"{prefix}Country"]] = "USA"
+
+    row[s["SupplementalFacilityNum"]] = value("SupplementalFacilityNum")
+    filing_amended_return[0] = value("AmendedReturnInd")
+
+    if facility_table and facilities is not UNSET:
+        policies = raw[s["HospitalPolicies"]]
+        policies = [] if policies is UNSET else [[None if v is UNSET else v for v in record] for record in policies]
+        filing_facility_rows.extend(facility_table_rows(row, facilities, policies))
+    return row
+
+# The facility table rows of the file extract_data_streaming finished last (facility_table only)
+filing_facility_rows = []
+
+# The AmendedReturnInd of the file an engine (or the extraction cache) finished last, for dedupe_values
+filing_amended_return = [None]
+
+def facility_table_rows(row, facilities, policies):
+    """
+    One facility table row per facility record of a filing.
+    A facility's policy block is the <HospitalFcltyPoliciesPrctcGrp> with the same FacilityReportingGroupCd;
+    without one, the blocks are matched to facilities in order when there are as many of each, and a single
+    block describes every facility.
+    """
+    f = facility_record_slots
+    filing_values = [row[field_positions[field.raw_name]] for field in facility_filing_fields]
+    by_code = {}
+    for policy in policies:
+        by_code.setdefault(policy[policy_record_slots["FacilityReportingGroupCd"]], policy)
+    by_code.pop(None, None)
+
+    table_rows = []
+    for i, fac in enumerate(facilities):
+        code = fac[f["FacilityReportingGroupCd"]]
+        if code in by_code:
+            policy = by_code[code]
+        elif len(policies) == len(facilities) or len(policies) == 1:
+            policy = policies[i if len(policies) > 1 else 0]
         else:
-            supplemental_facility_num = None
-        base["SupplementalFacilityNum"] = supplemental_facility_num
-
-        # EXTRACT SCHEDULE H
-        scheduleH_tag = soup.find("IRS990ScheduleH")
-        if not scheduleH_tag:
-            return None
-        sch_data = extract_scheduleH_data(scheduleH_tag)
-
-        # OUTSIDE fields
-        outside_field_names = [
-            "TotalEmployeeCnt",
-            "TotalGrossUBIAmt",
-            "NetUnrelatedBusTxblIncmAmt",
-            "PYContributionsGrantsAmt",
-            "CYContributionsGrantsAmt",
-            "PYProgramServiceRevenueAmt",
-            "CYProgramServiceRevenueAmt",
-            "PYInvestmentIncomeAmt",
-            "CYInvestmentIncomeAmt",
-            "PYOtherRevenueAmt",
-            "CYOtherRevenueAmt",
-            "PYTotalRevenueAmt",
-            "CYTotalRevenueAmt",
-            "PYGrantsAndSimilarPaidAmt",
-            "CYGrantsAndSimilarPaidAmt",
-            "PYBenefitsPaidToMembersAmt",
-            "CYBenefitsPaidToMembersAmt",
-            "PYSalariesCompEmpBnftPaidAmt",
-            "CYSalariesCompEmpBnftPaidAmt",
-            "PYTotalProfFndrsngExpnsAmt",
-            "CYTotalProfFndrsngExpnsAmt",
-            "CYTotalFundraisingExpenseAmt",
-            "PYOtherExpensesAmt",
-            "CYOtherExpensesAmt",
-            "PYTotalExpensesAmt",
-            "CYTotalExpensesAmt",
-            "PYRevenuesLessExpensesAmt",
-            "CYRevenuesLessExpensesAmt",
-            "TotalAssetsBOYAmt",
-            "TotalAssetsEOYAmt",
-            "TotalLiabilitiesBOYAmt",
-            "TotalLiabilitiesEOYAmt",
-            "NetAssetsOrFundBalancesBOYAmt",
-            "NetAssetsOrFundBalancesEOYAmt",
+            policy = None
+        own_values = [
+            ("USA" if fac[f["USAddress"]] else None) if field.raw_name == "Country" else fac[f[field.raw_name]]
+            for field in facility_own_fields
         ]
-        outside = {}
-        for field in outside_field_names:
-            outside[field] = get_text(soup.find(field))
+        policy_values = [
+            policy[policy_record_slots[field.path]] if policy else None
+            for field in facility_policy_fields
+        ]
+        table_rows.append(tuple(filing_values + own_values + policy_values))
+    return table_rows
+
+def extract_data_streaming(content, file_name, release_info):
+    """Walk one XML document (bytes) once and return its output row, or None without Schedule H."""
+    raw = [UNSET] * streaming_width
+    supp_slot = streaming_slots["SupplementalFacilityNum"]
+
+    parser = etree.iterparse(
+        io.BytesIO(content), events=("start", "end"), recover=True, remove_comments=True, remove_pis=True
+    )
+    # The first event opens <Return>, which says which schema (and so which dispatch table) the file uses
+    plan, watch = streaming_plan, streaming_watch
+    for event, elem in parser:
+        family = schema_family_for(elem.get("returnVersion"))
+        if family:
+            plan, watch = schema_plans[family]
+        break
+    # With selected_columns, the ids of the scopes that have closed (nothing inside them can be found anymore),
+    # and how many watch list entries are known to be settled; a settled entry stays settled
+    closed = set()
+    settled_count = 0
+
+    # Open scopes: (rule, slot buffer it writes into, the element that opened it, child scopes already used)
+    active = [(plan, raw, None, set())]
+    # Tags whose text we are waiting for: (element, slot buffer, slot)
+    pending = []
+    # <FacilityNum> next to the first <SupplementalInformationGrp> (soup's find_next_sibling)
+    supp_seen = False
+    supp_parent = None
+
+    for event, elem in parser:
+        if event == "start":
+            tag = elem.tag
+            name = local_tag_names.get(tag)
+            if name is None:
+                name = local_tag_names[tag] = tag.rpartition("}")[2]
+
+            for i in range(len(active)):
+                rule, target, _, used = active[i]
+                slot = rule.fields.get(name)
+                if slot is not None and target[slot] is UNSET:
+                    target[slot] = None
+                    pending.append((elem, target, slot))
+                child = rule.scopes.get(name)
+                if child is None:
+                    continue
+                if child.record_width:
+                    records = target[child.flag]
+                    if records is UNSET:
+                        records = target[child.flag] = []
+                    record = [UNSET] * child.record_width
+                    records.append(record)
+                    active.append((child, record, elem, set()))
+                elif name not in used:
+                    used.add(name)
+                    if child.flag is not None:
+                        target[child.flag] = True
+                    active.append((child, target, elem, set()))
+
+            if name == "SupplementalInformationGrp" and not supp_seen:
+                supp_seen = True
+                supp_parent = elem.getparent()
+            elif name == "FacilityNum" and supp_seen and raw[supp_slot] is UNSET and elem.getparent() is supp_parent:
+                raw[supp_slot] = None
+                pending.append((elem, raw, supp_slot))
+        else:
+            while pending and pending[-1][0] is elem:
+                _, target, slot = pending.pop()
+                target[slot] = element_text(elem)
+            scope_closed = False
+            while len(active) > 1 and active[-1][2] is elem:
+                rule = active.pop()[0]
+                if watch is not None and not rule.record_width:
+                    closed.add(id(rule))
+                    scope_closed = True
+            # Nothing above this tag still needs its text, so free it
+            if not pending:
+                elem.clear()
+                # Stop reading once every slot the selected columns need is filled or can no longer be found
+                if scope_closed:
+                    while settled_count < len(watch):
+                        slot, scopes, repeating = watch[settled_count]
+                        if (raw[slot] is UNSET or repeating) and not any(id(scope) in closed for scope in scopes):
+                            break
+                        settled_count += 1
+                    else:
+                        break
+
+    if phase_timing:
+        parse_finished_at[0] = time.perf_counter()
+    return finish_streaming_row(raw, file_name, release_info)
+
+    # PRE-FILTER
+    # A cheap byte search that runs before parsing. Files rejected here are only memory-mapped,
+    # never copied into Python or handed to the XML parser.
+    # No "<" in the marker on purpose: it also catches prefixed tags like <efile:IRS990ScheduleH>.
+    # Extra matches only cost a parse, while a missed Schedule H would silently drop a row.
+schedule_h_marker = b"IRS990ScheduleH"
+return_type_pattern = re.compile(rb"<(?:[\w.-]+:)?ReturnTypeCd>\s*([^<\s]+)")
+
+# How many files were parsed vs skipped, by reason ("parsed", "no_schedule_h", "return_type"),
+# and how many were taken from the extraction cache ("cached")
+prefilter_stats = Counter()
+
+def prefilter_reason(buffer, size=None):
+    """
+    Return why a filing can be skipped without parsing, or None if it must be parsed.
+    buffer can be bytes, an mmap or a reused bytearray; size limits the check to its first size bytes.
+    """
+    end = len(buffer) if size is None else size
+    if buffer[:2] in (b"\xff\xfe", b"\xfe\xff"):
+        return None  # UTF-16 file: a byte search cannot see its tags, so always parse it
+    if prefilter_schedule_h and buffer.find(schedule_h_marker, 0, end) == -1:
+        return "no_schedule_h"
+    if prefilter_return_types:
+        match = return_type_pattern.search(buffer, 0, end)
+        if match and match.group(1).decode("utf-8", "replace") not in prefilter_return_types:
+            return "return_type"
+    return None
+
+def content_hash(buffer):
+    """Short fingerprint of a file's bytes (bytes, mmap or memoryview), used by the manifest and the extraction cache."""
+    return hashlib.blake2b(buffer, digest_size=16).hexdigest()
+
+def read_filing(xml_file):
+    """
+    Read one XML file for parsing.
+    Returns (content, None, hash), or (None, reason, hash) when the pre-filter shows it cannot produce a row.
+    The hash is only computed when the manifest or the extraction cache needs it, otherwise it is None.
+    """
+    with open(xml_file, "rb") as file:
+        if not (prefilter_schedule_h or prefilter_return_types):
+            content = file.read()
+            return content, None, content_hash(content) if resume_with_manifest or extraction_cache else None
+        if os.fstat(file.fileno()).st_size == 0:
+            return None, "no_schedule_h", content_hash(b"") if resume_with_manifest or extraction_cache else None
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            digest = content_hash(mm) if resume_with_manifest or extraction_cache else None
+            reason = prefilter_reason(mm)
+            if reason:
+                return None, reason, digest
+            return mm[:], None, digest
+
+def prefilter_summary(stats):
+    """
+    One line such as 'parsed 1,204, skipped 48,311 (no Schedule H 48,311, return type 0)',
+    plus ', from the extraction cache 310' when files were taken from the cache.
+    """
+    skipped = stats["no_schedule_h"] + stats["return_type"]
+    summary = (
+        f"parsed {stats['parsed']:,}, skipped {skipped:,} "
+        f"(no Schedule H {stats['no_schedule_h']:,}, return type {stats['return_type']:,})"
+    )
+    if stats["cached"]:
+        summary += f", from the extraction cache {stats['cached']:,}"
+    return summary
+
+    # PHASE TIMING (phase_timing)
+    # Every file's time is split into three phases:
+    #  - read: opening the file (or ZIP member), reading its bytes and the pre-filter check
+    #  - parse: building the XML tree (soup engine) or the single walk through the file (streaming engine)
+    #  - extract: pulling the columns out of the tree (soup) or finishing the row after the walk (streaming)
+    # The streaming engine finds the values while it walks, so most of its time shows up as "parse".
+    # Writing is timed per chunk of rows in the main process. With phase_timing off, all of this costs one
+    # "if" per file.
+
+# Per-file timings collected in this process since they were last handed back:
+# (file name, bytes or None if the pre-filter skipped it, read, parse, extract seconds, outcome)
+phase_records = []
+
+# Set by the extraction engines when their parse phase ends
+parse_finished_at = [0.0]
+
+# File time histogram buckets, upper limits in milliseconds
+phase_histogram_limits = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000]
 
-        # Combine
-        data = {}
-        data.update(base)
-        data.update(sch_data)
-        data.update(outside)
+def new_phase_report():
+    """Running totals for the timing report. Only the top files are kept, so memory does not grow with the run."""
+    report = {
+        "releases": {},
+        "histogram": Counter(),
+        "slowest": [],
+        "largest": [],
+        "csv_file": None,
+        "csv_writer": None,
+    }
+    if phase_timing_csv:
+        report["csv_file"] = open(phase_timing_csv, "w", newline="", encoding="utf-8")
+        report["csv_writer"] = csv.writer(report["csv_file"])
+        report["csv_writer"].writerow(["release", "file", "bytes", "read_s", "parse_s", "extract_s", "outcome"])
+    return report
 
-        # Insert the 4 release columns
-        data["ReleaseYear"] = ReleaseYear
-        data["ReleaseSource"] = ReleaseSource
-        data["ReleaseDownload"] = ReleaseDownload
-        data["ReleaseFileName"] = ReleaseFileName
+def release_phase_totals(report, release):
+    return report["releases"].setdefault(release, Counter())
 
-        # Return row in correct order
-        return [data.get(col) for col in columns_order]
+def keep_top(heap, item):
+    if len(heap) < phase_timing_top:
+        heapq.heappush(heap, item)
+    else:
+        heapq.heappushpop(heap, item)
+
+def add_phase_records(report, release, records):
+    """Add one chunk's per-file timings to the report."""
+    totals = release_phase_totals(report, release)
+    for file_name, size, read_s, parse_s, extract_s, outcome in records:
+        totals["files"] += 1
+        totals["bytes"] += size or 0
+        totals["read"] += read_s
+        totals["parse"] += parse_s
+        totals["extract"] += extract_s
+        total_ms = (read_s + parse_s + extract_s) * 1000
+        report["histogram"][next((limit for limit in phase_histogram_limits if total_ms < limit), None)] += 1
+        keep_top(report["slowest"], (total_ms, release, file_name))
+        if size:
+            keep_top(report["largest"], (size, release, file_name))
+        if report["csv_writer"]:
+            report["csv_writer"].writerow([release, file_name, size, read_s, parse_s, extract_s, outcome])
+
+def add_write_time(report, release, seconds):
+    release_phase_totals(report, release)["write"] += seconds
+
+def print_phase_report(report):
+    print("\nTiming report (seconds)")
+    print(f"{'release':<28}{'files':>10}{'MB':>10}{'read':>10}{'parse':>10}{'extract':>10}{'write':>10}")
+    overall = Counter()
+    for release, totals in report["releases"].items():
+        overall.update(totals)
+        print(
+            f"{release[:27]:<28}{totals['files']:>10,}{totals['bytes'] / 2**20:>10,.1f}"
+            f"{totals['read']:>10.2f}{totals['parse']:>10.2f}{totals['extract']:>10.2f}{totals['write']:>10.2f}"
+        )
+    print(
+        f"{'total':<28}{overall['files']:>10,}{overall['bytes'] / 2**20:>10,.1f}"
+        f"{overall['read']:>10.2f}{overall['parse']:>10.2f}{overall['extract']:>10.2f}{overall['write']:>10.2f}"
+    )
+
+    print("\nTime per file (read + parse + extract)")
+    largest_count = max(report["histogram"].values(), default=0)
+    lower = 0
+    for limit in phase_histogram_limits + [None]:
+        count = report["histogram"][limit]
+        label = f"{lower}-{limit} ms" if limit else f">= {lower} ms"
+        bar = "#" * round(40 * count / largest_count) if largest_count else ""
+        print(f"  {label:>14} {count:>10,} {bar}")
+        lower = limit
+
+    print(f"\n{phase_timing_top} slowest files")
+    for total_ms, release, file_name in sorted(report["slowest"], reverse=True):
+        print(f"  {total_ms:>10.1f} ms  {release}: {file_name}")
+    print(f"\n{phase_timing_top} largest files parsed")
+    for size, release, file_name in sorted(report["largest"], reverse=True):
+        print(f"  {size / 2**20:>10.2f} MB  {release}: {file_name}")
+
+    if report["csv_file"]:
+        report["csv_file"].close()
+        print(f"\nPer-file timings saved to: {phase_timing_csv}")
+
+    # EXTRACT DATA
+    # These functions take one filing (a file on disk or a member of a ZIP), run the pre-filter,
+    # and hand it to the selected extraction engine.
+    # extract_data and extract_zip_member return one row in output order (see field_registry), or None when the filing
+    # has no Schedule H (including files the pre-filter skipped).
+    # A file that fails does not stop the run: process_filing notes (path, phase, exception class, message) in
+    # filing_failures, and extract_chunk hands them to the main process, which writes them to the error log.
+filing_failures = []
+
+def process_filing(read, label, file_name, release_info, engine=None, cached=None):
+    """
+    Read one filing with read() -> (content, skip_reason, hash), count the pre-filter outcome and extract its row.
+    Returns (row or None, outcome, hash); outcome is "row", "no_schedule_h", "return_type" or "error".
+    cached(hash), if given, returns the (row, outcome) the extraction cache has for the content, or None to parse it.
+    An error is noted in filing_failures with label (the file's path) and the phase it happened in
+    ("read", "cache" or "parse").
+    """
+    phase = "read"
+    try:
+        if phase_timing:
+            started = time.perf_counter()
+        content, skip_reason, digest = read()
+        if cached and not skip_reason and digest:
+            phase = "cache"
+            hit = cached(digest)
+            if hit:
+                prefilter_stats["cached"] += 1
+                return hit[0], hit[1], digest
+        prefilter_stats[skip_reason or "parsed"] += 1
+        if skip_reason:
+            if phase_timing:
+                phase_records.append((file_name, None, time.perf_counter() - started, 0.0, 0.0, skip_reason))
+            return None, skip_reason, digest
+        if phase_timing:
+            read_finished = parse_finished_at[0] = time.perf_counter()
+        phase = "parse"
+        if (engine or extraction_engine) == "soup":
+            row = extract_data_soup(content, file_name, release_info)
+        else:
+            row = extract_data_streaming(content, file_name, release_info)
+        outcome = "row" if row else "no_schedule_h"
+        if phase_timing:
+            # An engine that stops early (no Schedule H) leaves parse_finished_at at the end of its parse
+            finished = time.perf_counter()
+            parsed = max(parse_finished_at[0], read_finished)
+            phase_records.append((
+                file_name, len(content), read_finished - started, parsed - read_finished, finished - parsed, outcome,
+            ))
+        return row, outcome, digest
 
     except Exception as e:
-        print(f"Error processing {xml_file}: {e}")
+        filing_failures.append((label, phase, type(e).__name__, str(e)))
+        return None, "error", None
+
+def print_filing_failure():
+    """Print (and forget) the failure process_filing just noted, for the functions that extract one file on their own."""
+    label, phase, exception, message = filing_failures.pop()
+    print(f"Error processing {label} ({phase}): {exception}: {message}")
+
+def extract_data(xml_file, ReleaseYear, ReleaseSource, ReleaseDownload, ReleaseFileName, engine=None):
+    release_info = {
+        "ReleaseYear": ReleaseYear,
+        "ReleaseSource": ReleaseSource,
+        "ReleaseDownload": ReleaseDownload,
+        "ReleaseFileName": ReleaseFileName,
+    }
+    row, outcome, _ = process_filing(lambda: read_filing(xml_file), xml_file, os.path.basename(xml_file), release_info, engine)
+    if outcome == "error":
+        print_filing_failure()
+    return row
+
+    # ZIP ARCHIVE INPUT
+    # Reads XML members straight out of an IRS ZIP download, without writing them to disk.
+    # Every member is decompressed into the same reusable buffer, so the many members
+    # the pre-filter rejects never allocate a new bytes object.
+def read_zip_member(archive, info, buffer):
+    """
+    Decompress one ZIP member into buffer (a bytearray that grows as needed and is reused).
+    Returns (content, None, hash), or (None, reason, hash) when the pre-filter shows it cannot produce a row.
+    """
+    if len(buffer) < info.file_size:
+        buffer.extend(bytes(info.file_size - len(buffer)))
+    size = 0
+    with archive.open(info) as member, memoryview(buffer) as view:
+        while size < info.file_size:
+            count = member.readinto(view[size:info.file_size])
+            if not count:
+                break
+            size += count
+        digest = content_hash(view[:size]) if resume_with_manifest or extraction_cache else None
+        reason = prefilter_reason(buffer, size)
+        if reason:
+            return None, reason, digest
+        return bytes(view[:size]), None, digest
+
+def extract_zip_member(archive, info, buffer, release_info, engine=None):
+    row, outcome, _ = process_filing(
+        lambda: read_zip_member(archive, info, buffer),
+        f"{archive.filename}:{info.filename}", os.path.basename(info.filename), release_info, engine,
+    )
+    if outcome == "error":
+        print_filing_failure()
+    return row
+
+def zip_member_mtime(info):
+    """A ZIP member's modified time as seconds since 1970, comparable with os.stat's st_mtime."""
+    return time.mktime(info.date_time + (0, 0, -1))
+
+def zip_xml_members(archive):
+    """All XML files inside an open ZIP, in archive order."""
+    return [info for info in archive.infolist() if not info.is_dir() and info.filename.lower().endswith(".xml")]
+
+def compare_extraction_engines(xml_file):
+    """
+    Run both engines on one XML file and return the columns where they disagree,
+    as {column: (soup value, streaming value)}. An empty dict means identical output.
+    """
+    soup_row = extract_data(xml_file, "", "", "", "", engine="soup")
+    streaming_row = extract_data(xml_file, "", "", "", "", engine="streaming")
+    if soup_row is None or streaming_row is None:
+        return {} if soup_row is streaming_row else {"<row>": (soup_row, streaming_row)}
+    return {
+        col: (a, b)
+        for col, a, b in zip((field.name for field in field_registry), soup_row, streaming_row)
+        if a != b
+    }
+
+
+    # PARALLEL EXTRACTION
+    # Files are handed out in chunks: each worker process receives a list of file names plus the release info,
+    # and sends back its rows as compact tuples. Chunks are collected in the order they were handed out,
+    # so the output row order does not depend on how many workers run or which one finishes first.
+
+# The ZIP a worker currently has open: [path, ZipFile, reusable buffer]. Chunks arrive one release
+# at a time, so keeping only the latest one open avoids re-reading its directory for every chunk.
+worker_archive = [None, None, None]
+
+def open_worker_archive(zip_path):
+    if worker_archive[0] != zip_path:
+        if worker_archive[1] is not None:
+            worker_archive[1].close()
+        worker_archive[:] = [zip_path, zipfile.ZipFile(zip_path), bytearray()]
+    return worker_archive[1], worker_archive[2]
+
+def prefetch_reads(reads, thread_count, max_bytes):
+    """
+    Call every function in reads (each returns (content, skip reason, hash)) on thread_count background threads,
+    ahead of the caller, and yield them back in order as functions that return the finished result
+    (or raise its error), ready for process_filing. Threads stop reading ahead while max_bytes of read
+    files are waiting, so memory stays bounded however slow the parsing is.
+    """
+    results = {}
+    state = {"next": 0, "buffered": 0, "stopped": False}
+    condition = threading.Condition()
+
+    def reader():
+        while True:
+            with condition:
+                # An empty buffer always lets the next file through, so a file larger than max_bytes cannot stall
+                while state["buffered"] >= max_bytes and not state["stopped"]:
+                    condition.wait()
+                if state["stopped"] or state["next"] >= len(reads):
+                    return
+                index = state["next"]
+                state["next"] += 1
+            try:
+                result, error = reads[index](), None
+                size = len(result[0]) if result[0] is not None else 0
+            except Exception as e:
+                result, error, size = None, e, 0
+            with condition:
+                results[index] = (result, error, size)
+                state["buffered"] += size
+                condition.notify_all()
+
+    def finished(result, error):
+        def read():
+            if error is not None:
+                raise error
+            return result
+        return read
+
+    threads = [threading.Thread(target=reader, daemon=True) for _ in range(min(thread_count, len(reads)))]
+    for thread in threads:
+        thread.start()
+    try:
+        for index in range(len(reads)):
+            with condition:
+                while index not in results:
+                    condition.wait()
+                result, error, size = results.pop(index)
+                state["buffered"] -= size
+                condition.notify_all()
+            yield finished(result, error)
+    finally:
+        with condition:
+            state["stopped"] = True
+            condition.notify_all()
+        for thread in threads:
+            thread.join()
+
+def extract_chunk(task):
+    """
+    Extract one chunk of files from a release folder or ZIP.
+    task is (folder or ZIP path, is_zip, list of file names, release_info).
+    Returns (number of files, file results, pre-filter counts for the chunk, schema version counts for the chunk,
+    per-file timings, malformed value counts for the chunk, failures), where each file result is (file name, outcome, content hash, row tuple or None,
+    facility table rows, dedupe values) in the order the files were given, and each failure is
+    (file name, path, phase, exception class, message).
+    The timings are only collected with phase_timing on (see phase_records), otherwise the list is empty.
+    The facility table rows are only collected with facility_table on, otherwise they are ().
+    The dedupe values (see dedupe_values) are only filled for rows with dedupe_policy on, otherwise they are None.
+    """
+    source_path, is_zip, file_names, release_info = task
+    stats_before = prefilter_stats.copy()
+    versions_before = schema_version_stats.copy()
+    errors_before = typed_value_errors.copy()
+    file_results = []
+    chunk_failures = []
+    cache = open_worker_cache() if extraction_cache else None
+    if is_zip:
+        archive, buffer = open_worker_archive(source_path)
+        infos = [archive.getinfo(name) for name in file_names]
+        # (name in the chunk, label for errors, file name in the row)
+        files = [(name, f"{source_path}:{name}", os.path.basename(name)) for name in file_names]
+        aliases = [zip_member_alias(info) for info in infos] if cache else [None] * len(file_names)
+    else:
+        xml_paths = [os.path.join(source_path, file_name) for file_name in file_names]
+        files = list(zip(file_names, xml_paths, file_names))
+        aliases = [file_alias(xml_path) for xml_path in xml_paths] if cache else [None] * len(file_names)
+
+    # Files the extraction cache already knows by their alias are neither read nor parsed
+    hits = cached_filings_for_aliases(cache, aliases) if cache else {}
+    to_read = [i for i, alias in enumerate(aliases) if alias not in hits]
+    if is_zip:
+        if prefetch_threads:
+            # Every read gets its own buffer, since the threads decompress at the same time
+            reads = prefetch_reads(
+                [lambda info=infos[i]: read_zip_member(archive, info, bytearray()) for i in to_read],
+                prefetch_threads, prefetch_buffer_mb * 1024 * 1024,
+            )
+        else:
+            reads = (lambda info=infos[i]: read_zip_member(archive, info, buffer) for i in to_read)
+    else:
+        reads = [lambda xml_path=xml_paths[i]: read_filing(xml_path) for i in to_read]
+        if prefetch_threads:
+            reads = prefetch_reads(reads, prefetch_threads, prefetch_buffer_mb * 1024 * 1024)
+    reads = iter(reads)
+
+    for (name, label, file_name), alias in zip(files, aliases):
+        filing_facility_rows.clear()
+        filing_amended_return[0] = None
+        if alias in hits:
+            digest, entry = hits[alias]
+            row, outcome = cached_filing(cache, digest, entry, file_name, release_info)
+            prefilter_stats["cached"] += 1
+        else:
+            # A file with a new alias can still be in the cache under its content hash, e.g. from another release
+            cached = (lambda digest, file_name=file_name: cached_filing_for_hash(cache, digest, file_name, release_info)) if cache else None
+            row, outcome, digest = process_filing(next(reads), label, file_name, release_info, cached=cached)
+            if outcome == "error":
+                chunk_failures.append((name, *filing_failures.pop()))
+        # The cache keeps the values as text, so they can be converted for any later settings
+        if cache and alias not in hits:
+            remember_filing(cache, alias, digest, outcome, row, filing_facility_rows)
+        facilities = tuple(project_facility_row(facility_row) for facility_row in filing_facility_rows) if row else ()
+        file_results.append((
+            name, outcome, digest, project_row(row) if row else None, facilities,
+            dedupe_values(row, filing_amended_return[0]) if dedupe_policy and row else None,
+        ))
+    if cache:
+        save_worker_cache(cache)
+    # Hand the counts back to the main process, which adds them to its own prefilter_stats
+    chunk_stats = prefilter_stats - stats_before
+    prefilter_stats.subtract(chunk_stats)
+    chunk_versions = schema_version_stats - versions_before
+    schema_version_stats.subtract(chunk_versions)
+    chunk_timings = phase_records[:]
+    phase_records.clear()
+    chunk_errors = typed_value_errors - errors_before
+    typed_value_errors.subtract(chunk_errors)
+    return len(file_names), file_results, chunk_stats, chunk_versions, chunk_timings, chunk_errors, chunk_failures
+
+def scan_release_folder(folder_path, fingerprints=None):
+    """
+    Yield the XML file names in a release folder, in directory order, as the folder is being read.
+    Names and file types come straight from the directory entries. With fingerprints (a dict), each file's
+    (size, modified time) is added to it before its name is yielded; on Windows these come with the directory
+    entry as well, elsewhere they cost one stat call per file.
+    """
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if entry.name.endswith(".xml") and entry.is_file():
+                if fingerprints is not None:
+                    stat = entry.stat()
+                    fingerprints[entry.name] = (stat.st_size, stat.st_mtime)
+                yield entry.name
+
+def list_release_files(source_path, is_zip, with_fingerprints=False):
+    """
+    The XML file names in a release folder or ZIP, and {name: (size, modified time)} when with_fingerprints
+    (always filled for ZIPs, where it costs nothing).
+    """
+    if is_zip:
+        with zipfile.ZipFile(source_path) as archive:
+            members = zip_xml_members(archive)
+        return [info.filename for info in members], {info.filename: (info.file_size, zip_member_mtime(info)) for info in members}
+    fingerprints = {}
+    file_names = list(scan_release_folder(source_path, fingerprints if with_fingerprints else None))
+    return file_names, fingerprints
+
+def make_chunks(source_path, is_zip, file_names, release_info):
+    """Hand out file_names as tasks of chunk_size files."""
+    chunk = []
+    for name in file_names:
+        chunk.append(name)
+        if len(chunk) == chunk_size:
+            yield (source_path, is_zip, chunk, release_info)
+            chunk = []
+    if chunk:
+        yield (source_path, is_zip, chunk, release_info)
+
+    # SAVED FOLDER LISTINGS (reuse_folder_listings)
+    # Each release folder's listing (names in directory order, sizes and modified times) is saved in a small database
+    # in parent_folder, together with the folder's own modified time. That time changes whenever a file is added to,
+    # removed from or renamed in the folder, so while it is unchanged the saved listing is used instead of reading the
+    # folder again. A file that is overwritten in place keeps the folder's time, so the saved listing keeps its old
+    # size and modified time; the IRS files are never changed that way, but delete the database if you edit files.
+
+def folder_listings_path():
+    return os.path.join(parent_folder, "folder listings.sqlite")
+
+def open_folder_listings(path):
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS listed_folders (source TEXT PRIMARY KEY, path TEXT, folder_mtime INTEGER, listed_at TEXT)"
+    )
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS listed_files ("
+        " source TEXT, position INTEGER, name TEXT, size INTEGER, mtime REAL, PRIMARY KEY (source, position))"
+    )
+    connection.commit()
+    return connection
+
+def saved_folder_listing(connection, folder_path):
+    """(file names, {name: (size, modified time)}) as saved for a release folder, or None when the folder changed since."""
+    source = os.path.basename(folder_path)
+    found = connection.execute("SELECT folder_mtime FROM listed_folders WHERE source = ?", (source,)).fetchone()
+    if found is None or found[0] != os.stat(folder_path).st_mtime_ns:
         return None
+    fingerprints = {
+        name: (size, mtime)
+        for name, size, mtime in connection.execute(
+            "SELECT name, size, mtime FROM listed_files WHERE source = ? ORDER BY position", (source,)
+        )
+    }
+    return list(fingerprints), fingerprints
 
-    # MAIN EXECUTION
-    # This final block:
-    #  - finds all yearly ZIP folders,
-    #  - iterates through each XML in each folder,
-    #  - builds a big list of rows,
-    #  - then converts to a table and writes it out as a CSV.
-print("Extracting...")
+def save_folder_listing(connection, folder_path, folder_mtime, fingerprints):
+    """Save a release folder's listing: fingerprints holds every file, in the order the folder listed them."""
+    source = os.path.basename(folder_path)
+    connection.execute("DELETE FROM listed_files WHERE source = ?", (source,))
+    connection.executemany(
+        "INSERT INTO listed_files VALUES (?, ?, ?, ?, ?)",
+        [(source, position, name, size, mtime) for position, (name, (size, mtime)) in enumerate(fingerprints.items())],
+    )
+    connection.execute(
+        "INSERT OR REPLACE INTO listed_folders VALUES (?, ?, ?, ?)",
+        (source, folder_path, folder_mtime, time.strftime("%Y-%m-%d %H:%M:%S")),
+    )
+    connection.commit()
+
+    # OUTPUT
+    # Rows come out of the extraction already in output order (field_registry), so instead of collecting
+    # every row into one giant table at the end, each chunk's rows are written straight to the CSV.
+    # Memory use stays the same no matter how many filings a release has.
+
+def open_csv_output(csv_path, append=False, header=None):
+    """
+    Open csv_path for writing rows and return (file, csv writer).
+    The header (output_header unless given) is written first, unless we are appending to a file that already has it.
+    """
+    file = open(csv_path, "a" if append else "w", newline="", encoding="utf-8")
+    writer = csv.writer(file, lineterminator=os.linesep)
+    if file.tell() == 0:
+        writer.writerow(header or output_header)
+    return file, writer
+
+def facility_output_path(csv_path):
+    """Where the facility table goes: "IRS 990H 2025.csv" -> "IRS 990H 2025 facilities.csv"."""
+    stem, extension = os.path.splitext(csv_path)
+    return f"{stem} facilities{extension}"
+
+def write_csv_rows(writer, rows):
+    """Write a batch of extracted rows as CSV lines."""
+    writer.writerows(rows)
+
+    # TYPED OUTPUT (Parquet / Arrow IPC)
+    # Each column's type is its kind in field_registry: amounts and counts are whole numbers, percentages decimals,
+    # check boxes (...Ind) True/False and dates dates. "category" columns are dictionary encoded (each different value is
+    # stored once), which pandas, R and DuckDB read as categoricals. Everything else stays text.
+    # A value that does not fit its type (e.g. "N/A" in an amount) is left empty.
+    # Each release gets its own partition folder, and rows are written to it in row groups of
+    # typed_output_batch_rows while the release is being processed.
+
+typed_partition_columns = ("IRS_RELEASEYEAR", "IRS_RELEASETEOS")
+typed_output_batch_rows = 50000
+
+def typed_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def typed_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def typed_bool(value):
+    if value is None:
+        return None
+    return {"X": True, "1": True, "TRUE": True, "0": False, "FALSE": False}.get(value.strip().upper())
+
+def typed_date(value):
+    try:
+        return datetime.date.fromisoformat(value.strip()[:10])
+    except (AttributeError, ValueError):
+        return None
+
+typed_converters = {
+    "int": typed_int, "float": typed_float, "bool": typed_bool, "date": typed_date, "string": None, "category": None,
+}
+
+    # TYPED VALUES (typed_values)
+    # With typed_values on, project_row and project_facility_row convert every value with the converter of its column's
+    # kind while the file is extracted (in the worker), so the writers get whole numbers, decimals, True/False and dates.
+    # A non-empty value the converter cannot read is left empty and counted in typed_value_errors, by column.
+
+# Malformed values per column name ({column: count}), handed back to the main process like prefilter_stats
+typed_value_errors = Counter()
+
+def typed_row_converters(fields):
+    """(position, converter, column name) for every column of fields that is not plain text."""
+    return [(i, typed_converters[field.kind], field.name) for i, field in enumerate(fields) if typed_converters[field.kind]]
+
+output_converters = typed_row_converters(output_fields)
+facility_converters = typed_row_converters(facility_table_fields)
+
+def convert_row(values, converters):
+    """Convert a row's text values (a list) in place; a value that does not fit is left empty and counted."""
+    for i, convert, column in converters:
+        value = values[i]
+        if value is not None:
+            values[i] = convert(value)
+            if values[i] is None and value.strip():
+                typed_value_errors[column] += 1
+
+def typed_value_summary(errors):
+    """One line such as '3 left empty (IRS_FAPFCPGOTH 2, IRS_TOTEMPCNT 1)', or 'none'."""
+    if not errors:
+        return "none"
+    columns = ", ".join(f"{column} {count:,}" for column, count in errors.most_common())
+    return f"{sum(errors.values()):,} left empty ({columns})"
+
+# (output column, position in the row, kind) for every column stored inside the files;
+# the partition columns are only in the folder names
+def typed_columns_for(fields):
+    return [
+        (field.name, index, field.kind)
+        for index, field in enumerate(fields)
+        if field.name not in typed_partition_columns
+    ]
+
+typed_columns = typed_columns_for(output_fields)
+typed_facility_columns = typed_columns_for(facility_table_fields)
+
+def typed_output_schema(columns=None):
+    arrow_types = {
+        "int": pa.int64(), "float": pa.float64(), "bool": pa.bool_(), "date": pa.date32(), "string": pa.string(),
+        "category": pa.dictionary(pa.int32(), pa.string()),
+    }
+    return pa.schema([pa.field(column, arrow_types[kind]) for column, _, kind in columns or typed_columns])
+
+def typed_output_folder(csv_path):
+    return os.path.splitext(csv_path)[0]
+
+def typed_output_extension():
+    return ".parquet" if output_format == "parquet" else ".arrow"
+
+def remove_typed_output(folder):
+    """Delete the part files an earlier run wrote, so a fresh run does not add to them."""
+    for path in glob.glob(os.path.join(glob.escape(folder), "*", "*", "part-*" + typed_output_extension())):
+        os.remove(path)
+
+def open_typed_partition(folder, release_info, columns=None):
+    """
+    Start a new part file in the partition folder of one release and return its state.
+    columns is typed_columns unless given (typed_facility_columns for the facility table).
+    It is written under a temporary name and only gets its real name once it is complete.
+    """
+    columns = columns or typed_columns
+    partition_folder = os.path.join(
+        folder,
+        f"IRS_RELEASEYEAR={release_info['ReleaseYear'] or '__HIVE_DEFAULT_PARTITION__'}",
+        f"IRS_RELEASETEOS={release_info['ReleaseFileName'] or '__HIVE_DEFAULT_PARTITION__'}",
+    )
+    os.makedirs(partition_folder, exist_ok=True)
+    extension = typed_output_extension()
+    part = 0
+    while os.path.exists(os.path.join(partition_folder, f"part-{part}{extension}")):
+        part += 1
+    path = os.path.join(partition_folder, f"part-{part}{extension}")
+    temporary_path = os.path.join(partition_folder, f".part-{part}{extension}.tmp")
+    schema = typed_output_schema(columns)
+    if output_format == "parquet":
+        writer = pq.ParquetWriter(temporary_path, schema)
+    else:
+        writer = pa.ipc.new_file(temporary_path, schema)
+    return {
+        "path": path, "temporary_path": temporary_path, "columns": columns, "schema": schema, "writer": writer, "rows": [],
+    }
+
+def write_typed_rows(partition, rows):
+    """Buffer rows for a partition and write a row group whenever typed_output_batch_rows are waiting."""
+    partition["rows"].extend(rows)
+    if len(partition["rows"]) >= typed_output_batch_rows:
+        flush_typed_rows(partition)
+
+def flush_typed_rows(partition):
+    if not partition["rows"]:
+        return
+    values = list(zip(*partition["rows"]))
+    arrays = []
+    for (column, index, kind), field in zip(partition["columns"], partition["schema"]):
+        # With typed_values the rows were already converted while extracting
+        convert = None if typed_values else typed_converters[kind]
+        column_values = values[index] if convert is None else [convert(value) for value in values[index]]
+        arrays.append(pa.array(column_values, type=field.type))
+    partition["writer"].write_table(pa.Table.from_arrays(arrays, schema=partition["schema"]))
+    partition["rows"] = []
+
+def close_typed_partition(partition):
+    flush_typed_rows(partition)
+    partition["writer"].close()
+    os.replace(partition["temporary_path"], partition["path"])
+
+    # COMMUNITY BENEFIT CHECKS (validate_community_benefit)
+    # Each rule says that one amount column (total) should equal the sum of other amount columns (parts), each added
+    # or subtracted (sign). Rows are collected into batches of validation_batch_rows, and each batch is checked with one
+    # NumPy array per amount column, so every rule is a few array operations per batch instead of a Python loop per row.
+
+ValidationRule = namedtuple("ValidationRule", ["name", "total", "parts"])
+
+validation_batch_rows = 50000
+validation_amounts = ("TotalCommunityBenefitExpnsAmt", "DirectOffsettingRevenueAmt", "NetCommunityBenefitExpnsAmt")
+validation_key_columns = ("IRS_FILER_EIN", "IRS_TAXPERENDDT", "IRS_RELEASETEOS", "IRS_RELEASEXML")
+
+    # (total line, its lines, what the form calls it)
+community_benefit_totals = [
+    ("TotalFinancialAssistanceTyp", ["FinancialAssistanceAtCostTyp", "UnreimbursedMedicaidGrp", "UnreimbursedCostsGrp"], "Part I 7a + 7b + 7c"),
+    ("TotalOtherBenefitsGrp", [
+        "CommunityHealthServicesGrp", "HealthProfessionsEducationGrp", "SubsidizedHealthServicesGrp", "ResearchGrp",
+        "CashAndInKindContributionsGrp",
+    ], "Part I 7e through 7i"),
+    ("TotalCommunityBenefitsGrp", ["TotalFinancialAssistanceTyp", "TotalOtherBenefitsGrp"], "Part I 7d + 7j"),
+    ("TotalCommuntityBuildingActyGrp", [
+        "PhysicalImprvAndHousingGrp", "EconomicDevelopmentGrp", "CommunitySupportGrp", "EnvironmentalImprovementsGrp",
+        "LeadershipDevelopmentGrp", "CoalitionBuildingGrp", "HealthImprovementAdvocacyGrp", "WorkforceDevelopmentGrp",
+        "OtherCommuntityBuildingActyGrp",
+    ], "Part II lines 1 through 9"),
+]
+
+def amount_column(group, amount):
+    """The output column of one amount of one group, e.g. IRS_FAACNCBEA (IRS_TFMTCBEA does not follow the pattern)."""
+    return field_registry[field_positions[f"{group}_{amount}"]].name
+
+def community_benefit_rules():
+    rules = []
+    for group in dict.fromkeys(group for total, parts, _ in community_benefit_totals for group in [*parts, total]):
+        total, offsetting, net = (amount_column(group, amount) for amount in validation_amounts)
+        rules.append(ValidationRule(f"{net} = {total} - {offsetting}", net, ((1, total), (-1, offsetting))))
+    for total_group, groups, description in community_benefit_totals:
+        for amount in validation_amounts:
+            total = amount_column(total_group, amount)
+            rules.append(ValidationRule(f"{total} = {description}", total, tuple((1, amount_column(group, amount)) for group in groups)))
+    return rules
+
+def validation_path(csv_path):
+    return os.path.splitext(csv_path)[0] + ".validation.csv"
+
+def amount_array(values):
+    """One column of amounts as a NumPy array; empty and malformed amounts count as 0."""
+    values = [value or 0 for value in values]
+    try:
+        return np.array(values, dtype=np.int64)
+    except (TypeError, ValueError, OverflowError):
+        return np.array([typed_int(value) or 0 for value in values], dtype=np.int64)
+
+def open_validation(csv_path, append=False):
+    """
+    Start checking the rows written to csv_path and return the checks' state.
+    The list of broken rules starts over unless append; it is only created once a rule is broken.
+    Rules whose columns are not in the output (selected_columns) are left out.
+    """
+    path = validation_path(csv_path)
+    if not append and os.path.exists(path):
+        os.remove(path)
+    positions = {name: i for i, name in enumerate(output_header)}
+    rules = []
+    skipped = 0
+    for rule in community_benefit_rules():
+        if rule.total in positions and all(column in positions for _, column in rule.parts):
+            rules.append((rule.name, positions[rule.total], tuple((sign, positions[column]) for sign, column in rule.parts)))
+        else:
+            skipped += 1
+    if skipped:
+        print(f"Community benefit checks: {skipped} rules left out, their columns are not in selected_columns")
+    return {
+        "path": path, "rules": rules, "rows": [], "checked": 0, "flagged": 0, "counts": Counter(),
+        "amount_positions": sorted({position for _, total, parts in rules for position in (total, *(p for _, p in parts))}),
+        "key_positions": [positions[column] for column in validation_key_columns if column in positions],
+        "file": None, "writer": None,
+    }
+
+def validate_rows(validation, rows):
+    """Add rows to the current batch and check it whenever validation_batch_rows are waiting."""
+    validation["rows"].extend(rows)
+    if len(validation["rows"]) >= validation_batch_rows:
+        check_validation_batch(validation)
+
+def check_validation_batch(validation):
+    rows = validation["rows"]
+    if not rows:
+        return
+    columns = list(zip(*rows))
+    amounts = {position: amount_array(columns[position]) for position in validation["amount_positions"]}
+    flagged = np.zeros(len(rows), dtype=bool)
+    # The key columns of the flagged table, only gathered once a rule is broken
+    keys = None
+    for name, total, parts in validation["rules"]:
+        reported = amounts[total]
+        expected = sum(sign * amounts[position] for sign, position in parts)
+        broken = np.abs(reported - expected) > validation_tolerance
+        count = int(np.count_nonzero(broken))
+        if not count:
+            continue
+        validation["counts"][name] += count
+        flagged |= broken
+        if validation["writer"] is None:
+            key_header = [output_header[position] for position in validation["key_positions"]]
+            validation["file"], validation["writer"] = open_csv_output(
+                validation["path"], append=True, header=key_header + ["Rule", "Reported", "Expected", "Difference"],
+            )
+        if keys is None:
+            keys = list(zip(*(columns[position] for position in validation["key_positions"]))) or [()] * len(rows)
+        # Plain Python numbers for the CSV, taken out of the arrays in one go
+        indexes = np.flatnonzero(broken)
+        validation["writer"].writerows(
+            (*keys[i], name, reported_amount, expected_amount, reported_amount - expected_amount)
+            for i, reported_amount, expected_amount in zip(indexes.tolist(), reported[indexes].tolist(), expected[indexes].tolist())
+        )
+    validation["checked"] += len(rows)
+    validation["flagged"] += int(np.count_nonzero(flagged))
+    validation["rows"] = []
 
-results = []
+def close_validation(validation):
+    check_validation_batch(validation)
+    if validation["file"] is not None:
+        validation["file"].close()
 
-# 1) List all subfolders under parent_folder
-subfolders = [
-    os.path.join(parent_folder, sf)
-    for sf in os.listdir(parent_folder)
-    if os.path.isdir(os.path.join(parent_folder, sf))
+def print_validation_summary(validation):
+    print(f"Community benefit checks: {validation['checked']:,} rows checked, {validation['flagged']:,} with an amount that does not add up")
+    for name, _, _ in validation["rules"]:
+        if validation["counts"][name]:
+            print(f" => {name}: {validation['counts'][name]:,} rows")
+    if validation["flagged"]:
+        print(f" => Listed in {validation['path']}")
+
+    # DUPLICATE FILINGS (dedupe_policy)
+    # Rows are told apart by (Filer_EIN, TaxPeriodEndDt). Next to every row, the workers send back the few values the
+    # policy compares (see dedupe_values), taken from the full row, so this works with any selected_columns.
+    # The main process keeps one small entry per organization and tax period: the rank of the best row so far,
+    # ending with that row's number in the run. The rows themselves wait in a temporary spill file in the order they
+    # arrived. Once every release has been read, the spill file is read back and only the best row of each organization
+    # and tax period (plus every row without an EIN or tax period) is passed on to the output, with its facility rows.
+    # Memory use grows with the number of organizations and periods, not with the size of the rows.
+
+dedupe_policy_rules = ("amended", "preparation_date", "release")
+
+def dedupe_values(row, amended):
+    """(EIN, tax period end, amended?, preparation date) of a full row and its AmendedReturnInd, which is all the dedupe stage needs."""
+    return (
+        row[field_positions["Filer_EIN"]],
+        row[field_positions["TaxPeriodEndDt"]],
+        (amended or "").lower() in ("x", "1", "true"),
+        row[field_positions["PreparationDt"]] or "",
+    )
+
+def new_dedupe():
+    # A single rule can be given on its own: dedupe_policy = "amended"
+    policy = (dedupe_policy,) if isinstance(dedupe_policy, str) else tuple(dedupe_policy)
+    for rule in policy:
+        if rule not in dedupe_policy_rules:
+            raise SystemExit(
+                f'dedupe_policy: {rule!r} is not one of: {", ".join(dedupe_policy_rules)}'
+                ' (use a list or tuple for more than one, e.g. ("amended", "release"))'
+            )
+    # index: {(EIN, tax period end): rank of the best row}, releases: {release number: release_info}
+    return {"policy": policy, "index": {}, "spill": tempfile.TemporaryFile(), "rows": 0, "duplicates": 0, "releases": {}}
+
+def add_to_dedupe(dedupe, release_number, release_info, results):
+    """Rank one chunk's (file name, row, facility rows, dedupe values) against the best rows so far and park them in the spill file."""
+    index = dedupe["index"]
+    dedupe["releases"][release_number] = release_info
+    release_rank = (release_info["ReleaseYear"], release_info["ReleaseDownload"], release_number)
+    parked = []
+    for _, row, facilities, (ein, period, amended, preparation_date) in results:
+        number = dedupe["rows"]
+        dedupe["rows"] += 1
+        keyed = bool(ein and period)
+        if keyed:
+            key = (ein.strip(), period.strip())
+            by_rule = {"amended": amended, "preparation_date": preparation_date, "release": release_rank}
+            rank = (*(by_rule[rule] for rule in dedupe["policy"]), number)
+            best = index.get(key)
+            if best is not None:
+                dedupe["duplicates"] += 1
+            if best is None or rank > best:
+                index[key] = rank
+        parked.append((row, facilities, keyed))
+    pickle.dump((release_number, parked), dedupe["spill"], protocol=pickle.HIGHEST_PROTOCOL)
+
+def deduplicated_chunks(dedupe):
+    """Read the spill file back as (release number, release_info, rows, facility rows) with only the rows that are kept."""
+    kept = {rank[-1] for rank in dedupe["index"].values()}
+    spill = dedupe["spill"]
+    spill.seek(0)
+    number = 0
+    while True:
+        try:
+            release_number, parked = pickle.load(spill)
+        except EOFError:
+            break
+        rows, facility_rows = [], []
+        for row, facilities, keyed in parked:
+            if not keyed or number in kept:
+                rows.append(row)
+                facility_rows.extend(facilities)
+            number += 1
+        yield release_number, dedupe["releases"][release_number], rows, facility_rows
+    spill.close()
+
+def dedupe_summary(dedupe):
+    """One line such as 'kept 1,180 of 1,204 rows, 24 duplicates of an organization and tax period dropped'."""
+    return (
+        f"kept {dedupe['rows'] - dedupe['duplicates']:,} of {dedupe['rows']:,} rows, "
+        f"{dedupe['duplicates']:,} duplicates of an organization and tax period dropped"
+    )
+
+def load_output_dataframe(path=None):
+    """
+    Load an output (output_csv unless path is given, e.g. the facility table) into a pandas DataFrame.
+    Check boxes and "category" columns become pandas categoricals, the other CSV columns stay text;
+    Parquet / Arrow output keeps its stored types. Needs pandas (pip install pandas).
+    """
+    import pandas as pd
+    path = path or output_csv
+    if output_format != "csv":
+        import pyarrow.dataset
+        folder = typed_output_folder(path)
+        # The release columns come from the partition folder names, as categoricals too
+        partitioning = pyarrow.dataset.HivePartitioning.discover(infer_dictionary=True)
+        data = pyarrow.dataset.dataset(folder, format="parquet" if output_format == "parquet" else "ipc", partitioning=partitioning)
+        return data.to_table().to_pandas()
+    kinds = {field.name: field.kind for field in field_registry + facility_table_fields}
+    with open(path, newline="", encoding="utf-8") as file:
+        header = next(csv.reader(file))
+    dtypes = {column: "category" if kinds.get(column) in ("bool", "category") else str for column in header}
+    return pd.read_csv(path, dtype=dtypes, keep_default_na=False, na_values=[""])
+
+    # RESUMABLE RUNS (processed-file manifest)
+    # With resume_with_manifest on, every processed file is recorded in a SQLite database next to output_csv:
+    # its release folder/ZIP, file name, size, modified time, content hash and outcome.
+    # Rows are appended to the CSV one chunk at a time, and the manifest is committed right after each append,
+    # together with the CSV's length at that moment. If a run crashes, the next run cuts the CSV back to the
+    # last committed length and redoes only the files after it, so no row is lost or written twice.
+    # With Parquet / Arrow output, a release's files are recorded once its part file is complete, and new
+    # rows from later runs go into a new part file.
+    # For CSV output the manifest also keeps where each file's rows are in the CSV(s) (byte offset and length).
+    # When a file's content changed, the new rows are appended and the old ones are noted in superseded_rows, in the
+    # same commit; at the end of the run the CSV is copied without them and the offsets after them are moved up.
+
+# Outcomes that are final: files with these are skipped while unchanged. Errors and files skipped because of
+# prefilter_return_types are tried again on the next run.
+manifest_final_outcomes = ("row", "no_schedule_h")
+
+def manifest_path_for(csv_path):
+    return os.path.splitext(csv_path)[0] + ".manifest.sqlite"
+
+def csv_tail_hash(csv_path, length):
+    """Hash of the last 64 KB before length, used to tell whether the CSV is still the one the manifest wrote."""
+    with open(csv_path, "rb") as file:
+        file.seek(max(0, length - 65536))
+        return content_hash(file.read(length - file.tell()))
+
+def open_manifest(csv_path, facility_csv_path=None):
+    """
+    Open (or create) the manifest for csv_path and make the CSV match it:
+    rows written after the last commit are cut off, and a CSV the manifest did not write starts over.
+    facility_csv_path (the facility table CSV, with facility_table on) is kept in step the same way.
+    """
+    connection = sqlite3.connect(manifest_path_for(csv_path))
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS processed_files ("
+        " source TEXT, name TEXT, size INTEGER, mtime REAL, content_hash TEXT, outcome TEXT, processed_at TEXT,"
+        " PRIMARY KEY (source, name))"
+    )
+    # Where each file's rows are, added after the first manifests were written
+    columns = {column for _, column, *_ in connection.execute("PRAGMA table_info(processed_files)")}
+    for column in manifest_range_columns:
+        if column not in columns:
+            connection.execute(f"ALTER TABLE processed_files ADD COLUMN {column} INTEGER")
+    connection.execute("CREATE TABLE IF NOT EXISTS superseded_rows (output TEXT, offset INTEGER, length INTEGER)")
+    connection.execute("CREATE TABLE IF NOT EXISTS run_state (key TEXT PRIMARY KEY, value TEXT)")
+    state = dict(connection.execute("SELECT key, value FROM run_state"))
+    # (CSV path, run_state key prefix, committed length, current length)
+    outputs = []
+    for path, key in ((csv_path, "csv"), (facility_csv_path, "facility_csv")):
+        if path:
+            current = os.path.getsize(path) if os.path.exists(path) else 0
+            outputs.append((path, key, int(state.get(f"{key}_length", 0)), current))
+
+    for path, key, committed, current in outputs:
+        if committed and (current < committed or csv_tail_hash(path, committed) != state.get(f"{key}_tail_hash")):
+            print(f"{path} was changed outside of this script, so the manifest starts over.")
+            connection.execute("DELETE FROM processed_files")
+            connection.execute("DELETE FROM superseded_rows")
+            outputs = [(path, key, 0, current) for path, key, _, current in outputs]
+            break
+    for path, key, committed, current in outputs:
+        if current > committed:
+            if committed:
+                print(f"Resuming: removing rows written after the last saved point in {path}")
+            with open(path, "r+b") as file:
+                file.truncate(committed)
+        save_manifest_csv_state(connection, path, committed, key)
+    connection.commit()
+    return connection
+
+def save_manifest_csv_state(connection, csv_path, length, key="csv"):
+    tail = csv_tail_hash(csv_path, length) if length else ""
+    connection.executemany(
+        "INSERT OR REPLACE INTO run_state (key, value) VALUES (?, ?)",
+        [(f"{key}_length", str(length)), (f"{key}_tail_hash", tail)],
+    )
+
+manifest_range_columns = ("csv_offset", "csv_length", "facility_offset", "facility_length")
+
+def manifest_entries(connection, source):
+    """
+    {file name: (size, mtime, content hash, outcome, CSV offset, length, facility CSV offset, length)} for everything
+    already recorded for one release folder/ZIP. The offsets are None where the rows' place is not known.
+    """
+    return {
+        name: tuple(entry)
+        for name, *entry in connection.execute(
+            "SELECT name, size, mtime, content_hash, outcome, csv_offset, csv_length, facility_offset, facility_length"
+            " FROM processed_files WHERE source = ?", (source,)
+        )
+    }
+
+def superseded_entries(previous, file_results):
+    """The manifest entries of the files in a chunk whose content changed since their row was written."""
+    return [
+        previous[name] for name, _, digest, _, _, _ in file_results
+        if name in previous and previous[name][3] == "row" and previous[name][2] != digest
+    ]
+
+def csv_byte_length(rows):
+    """How many bytes rows take up once written by open_csv_output's writer."""
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator=os.linesep).writerows(rows)
+    return len(buffer.getvalue().encode("utf-8"))
+
+def manifest_row_ranges(results, output_file, facility_file):
+    """
+    {file name: (CSV offset, length, facility CSV offset, length)} for the rows of one chunk that are about to be
+    appended, results being its (file name, row, facility rows, dedupe values) in the order they are written.
+    """
+    ends = []
+    for file in (output_file, facility_file):
+        if file is not None:
+            file.flush()
+        ends.append(os.fstat(file.fileno()).st_size if file is not None else 0)
+    csv_offset, facility_offset = ends
+    ranges = {}
+    for name, row, facilities, _ in results:
+        csv_length = csv_byte_length([row])
+        facility_length = csv_byte_length(facilities)
+        ranges[name] = (csv_offset, csv_length, facility_offset, facility_length)
+        csv_offset += csv_length
+        facility_offset += facility_length
+    return ranges
+
+def record_manifest_chunk(connection, source, file_results, fingerprints, csv_path, facility_csv_path=None, ranges=None, superseded=()):
+    """
+    Record one chunk's files and the CSV length(s) after its rows were appended, in a single commit.
+    ranges are where the files' new rows are (see manifest_row_ranges), superseded the manifest entries of the old
+    rows they replace; those are noted for drop_superseded_rows.
+    """
+    processed_at = time.strftime("%Y-%m-%d %H:%M:%S")
+    ranges = ranges or {}
+    connection.executemany(
+        "INSERT OR REPLACE INTO processed_files"
+        " (source, name, size, mtime, content_hash, outcome, processed_at, csv_offset, csv_length, facility_offset, facility_length)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (source, name, *fingerprints[name], digest, outcome, processed_at, *ranges.get(name, (None, None, None, None)))
+            for name, outcome, digest, _, _, _ in file_results
+        ],
+    )
+    connection.executemany(
+        "INSERT INTO superseded_rows VALUES (?, ?, ?)",
+        [
+            (output, offset, length)
+            for entry in superseded
+            for output, offset, length in (("csv", *entry[4:6]), ("facility_csv", *entry[6:8]))
+            if offset is not None and length
+        ],
+    )
+    for path, key in ((csv_path, "csv"), (facility_csv_path, "facility_csv")):
+        if path:
+            save_manifest_csv_state(connection, path, os.path.getsize(path) if os.path.exists(path) else 0, key)
+    connection.commit()
+
+def drop_superseded_rows(connection, csv_path, facility_csv_path=None):
+    """
+    Take the old rows of files that changed out of the CSV(s), now that their new rows are written, and move the
+    recorded offsets of the rows after them up. Returns how many rows were taken out of csv_path.
+    """
+    dropped = 0
+    for path, key, column in ((csv_path, "csv", "csv"), (facility_csv_path, "facility_csv", "facility")):
+        ranges = connection.execute(
+            "SELECT offset, length FROM superseded_rows WHERE output = ? ORDER BY offset", (key,)
+        ).fetchall()
+        if not path or not ranges or not os.path.exists(path):
+            continue
+        # Copied to a new file next to it, which then takes its place
+        temporary_path = path + ".tmp"
+        with open(path, "rb") as source, open(temporary_path, "wb") as target:
+            position = 0
+            for offset, length in ranges + [(os.path.getsize(path), 0)]:
+                remaining = offset - position
+                while remaining > 0:
+                    block = source.read(min(remaining, 1 << 20))
+                    target.write(block)
+                    remaining -= len(block)
+                source.seek(length, os.SEEK_CUR)
+                position = offset + length
+            target.flush()
+            os.fsync(target.fileno())
+        os.replace(temporary_path, path)
+        connection.execute(
+            f"UPDATE processed_files SET {column}_offset = {column}_offset - ("
+            f" SELECT COALESCE(SUM(length), 0) FROM superseded_rows WHERE output = ? AND offset < processed_files.{column}_offset)"
+            f" WHERE {column}_offset IS NOT NULL", (key,)
+        )
+        save_manifest_csv_state(connection, path, os.path.getsize(path), key)
+        if key == "csv":
+            dropped = len(ranges)
+    connection.execute("DELETE FROM superseded_rows")
+    connection.commit()
+    return dropped
+
+    # DELTA RELEASES (delta_releases)
+    # The record is a small JSON file next to output_csv:
+    #   {"releases": {"2025_TEOS_XML_01A": {"records": 1234, "ingested": "2025-02-03 10:00:00"}, ...}, "pending": null}
+    # Before a release is added, "pending" notes how long the CSV(s) are and which part files exist. The release only
+    # goes into "releases" once all its rows are on disk, so if a run stops in the middle of a release, the next run first
+    # cuts the CSV(s) back to the noted length (or removes the newer part files) and then adds that release again.
+    # Adding a release to the output is therefore all or nothing.
+
+def ingested_releases_path(csv_path):
+    return os.path.splitext(csv_path)[0] + ".releases.json"
+
+def typed_output_parts(folders):
+    """Every part file in the given typed output folders."""
+    return sorted(
+        path
+        for folder in folders if folder
+        for path in glob.glob(os.path.join(glob.escape(folder), "*", "*", "part-*" + typed_output_extension()))
+    )
+
+def save_ingested_releases(csv_path, record):
+    """Write the record under a temporary name and then swap it in, so it is never half written."""
+    path = ingested_releases_path(csv_path)
+    with open(path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(record, file, indent=1)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(path + ".tmp", path)
+
+def load_ingested_releases(csv_path, typed_folders=()):
+    """
+    The record of the releases already in the output of csv_path, or None when there is none yet.
+    A release an earlier run did not finish adding is taken out of the output again first.
+    """
+    path = ingested_releases_path(csv_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as file:
+        record = json.load(file)
+    pending = record["pending"]
+    if pending:
+        print(f"Removing the rows of {pending['release']}, which an earlier run did not finish adding")
+        for output_path, length in pending["lengths"].items():
+            if os.path.exists(output_path):
+                if length:
+                    with open(output_path, "r+b") as file:
+                        file.truncate(length)
+                else:
+                    os.remove(output_path)
+        kept_parts = set(pending["parts"])
+        for part in typed_output_parts(typed_folders):
+            if part not in kept_parts:
+                os.remove(part)
+        record["pending"] = None
+        save_ingested_releases(csv_path, record)
+    return record
+
+def csv_header(csv_path):
+    with open(csv_path, newline="", encoding="utf-8") as file:
+        return next(csv.reader(file), None)
+
+    # EXTRACTION CACHE (extraction_cache)
+    # One SQLite database shared by every run, parent folder and release. Each entry is what extracting one filing gave:
+    # its outcome and, for a row, the extracted values and facility table rows. The release columns and the file name
+    # are left out and filled in from wherever the filing is found, so the same filing in two releases (e.g. in
+    # download990xml_2018_1 and 2018_TEOS_XML_CT1) is extracted only once.
+    # Entries are keyed by the file's content hash and the extraction spec (see extraction_spec). To skip even reading
+    # a file, each file is also remembered by an alias that costs nothing to get: a file in a folder by its path, size and
+    # modified time, a ZIP member by its name, size and CRC from the ZIP's directory (the same in every release).
+    # An entry also lists the columns it holds with their tag paths, so a run with fewer selected_columns can use it,
+    # while a changed or added field in field_registry extracts the filings with a row again (the rest stay cached).
+    # Every entry has a last used time; entries that were not used for the longest are removed first (see evict_extraction_cache).
+
+# Bump this when a change to the extraction code (anything besides the tag paths in field_registry) changes the rows
+extraction_cache_code_version = 1
+
+# Columns that depend on where a filing was found, not on its content
+cache_release_fields = ("ReleaseYear", "ReleaseSource", "ReleaseDownload", "ReleaseFileName", "FileName")
+cache_release_facility_slots = [
+    (i, field_positions[field.raw_name]) for i, field in enumerate(facility_filing_fields) if field.raw_name in cache_release_fields
 ]
 
-# 2) Loop through each release folder
-for subfolder_path in subfolders:
-    subfolder_name = os.path.basename(subfolder_path)
+def extraction_spec():
+    """Hash of the settings and code, besides the columns, that decide what extracting a filing gives."""
+    parts = [extraction_cache_code_version, extraction_engine, schema_families]
+    if facility_table:
+        parts.append(facility_table_fields)
+    return content_hash(repr(parts).encode())
+
+def open_extraction_cache(path):
+    connection = sqlite3.connect(path, timeout=600)
+    # Several worker processes add to the cache at the same time
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS cached_filings ("
+        " content_hash TEXT, spec TEXT, outcome TEXT, field_set TEXT, row_values TEXT, facility_rows TEXT,"
+        " size INTEGER, last_used REAL, PRIMARY KEY (content_hash, spec))"
+    )
+    connection.execute("CREATE INDEX IF NOT EXISTS cached_filings_last_used ON cached_filings (last_used)")
+    # The columns (raw_name, tag path) an entry's row_values were extracted for
+    connection.execute("CREATE TABLE IF NOT EXISTS field_sets (field_set TEXT PRIMARY KEY, fields TEXT)")
+    connection.execute("CREATE TABLE IF NOT EXISTS file_aliases (alias TEXT PRIMARY KEY, content_hash TEXT)")
+    connection.commit()
+    return connection
+
+def file_alias(xml_path):
+    try:
+        stat = os.stat(xml_path)
+    except OSError:
+        return None  # process_filing reports the error when the file is read
+    return f"{os.path.abspath(xml_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+def zip_member_alias(info):
+    return f"zip:{os.path.basename(info.filename)}|{info.file_size}|{info.CRC:08x}"
+
+# The extraction cache as seen by this process: its connection, this run's spec and columns, and what the current
+# chunk adds to it. Like worker_archive, it is opened by the first chunk and kept open.
+worker_cache = {}
+
+def open_worker_cache():
+    if not worker_cache:
+        extracted = output_fields + [field for field in dedupe_fields if field not in output_fields] if dedupe_policy else output_fields
+        fields = [
+            (field.raw_name, field.path) for field in extracted if field.raw_name not in cache_release_fields
+        ]
+        raw_names = [raw_name for raw_name, _ in fields]
+        if dedupe_policy:
+            # Kept next to the columns under its own name, though it is not one
+            fields.append(("AmendedReturnInd", streaming_helper_paths["AmendedReturnInd"]))
+        fields_text = json.dumps(fields)
+        field_set = content_hash(fields_text.encode())
+        connection = open_extraction_cache(extraction_cache)
+        connection.execute("INSERT OR IGNORE INTO field_sets VALUES (?, ?)", (field_set, fields_text))
+        connection.commit()
+        worker_cache.update(
+            connection=connection, spec=extraction_spec(), field_set=field_set,
+            fields=set(fields), raw_names=raw_names,
+            # {field set: True when it holds every column this run needs}
+            usable={field_set: True},
+            entries=[], aliases=[], used=set(),
+        )
+    return worker_cache
+
+def field_set_usable(cache, field_set):
+    if field_set not in cache["usable"]:
+        found = cache["connection"].execute("SELECT fields FROM field_sets WHERE field_set = ?", (field_set,)).fetchone()
+        stored = {tuple(field) for field in json.loads(found[0])} if found else set()
+        cache["usable"][field_set] = cache["fields"] <= stored
+    return cache["usable"][field_set]
+
+def cached_entries(cache, digests):
+    """{content hash: (outcome, row values, facility rows)} for the digests with an entry this run can use."""
+    entries = {}
+    digests = list(digests)
+    for i in range(0, len(digests), 500):
+        batch = digests[i:i + 500]
+        for digest, outcome, field_set, row_values, facility_rows in cache["connection"].execute(
+            "SELECT content_hash, outcome, field_set, row_values, facility_rows FROM cached_filings"
+            f" WHERE spec = ? AND content_hash IN ({', '.join('?' * len(batch))})", (cache["spec"], *batch),
+        ):
+            if outcome == "no_schedule_h" or field_set_usable(cache, field_set):
+                entries[digest] = (outcome, row_values, facility_rows)
+    return entries
+
+def cached_filings_for_aliases(cache, aliases):
+    """{alias: (content hash, entry)} for the aliases whose filing has an entry this run can use."""
+    known = {}
+    names = [alias for alias in aliases if alias]
+    for i in range(0, len(names), 500):
+        batch = names[i:i + 500]
+        known.update(cache["connection"].execute(
+            f"SELECT alias, content_hash FROM file_aliases WHERE alias IN ({', '.join('?' * len(batch))})", batch,
+        ))
+    entries = cached_entries(cache, set(known.values()))
+    return {alias: (digest, entries[digest]) for alias, digest in known.items() if digest in entries}
 
-    release_info = release_info_for_subfolder.get(subfolder_name, {
+def cached_filing(cache, digest, entry, file_name, release_info):
+    """
+    The (row, outcome) of a cache entry, with the release columns and file name of where the filing was found this time.
+    Its facility table rows go to filing_facility_rows, as if the streaming engine had just extracted them.
+    """
+    cache["used"].add(digest)
+    outcome, row_values, facility_rows = entry
+    if outcome != "row":
+        return None, outcome
+    values = json.loads(row_values)
+    row = [None] * len(field_registry)
+    for raw_name in cache["raw_names"]:
+        row[field_positions[raw_name]] = values.get(raw_name)
+    for raw_name in cache_release_fields[:4]:
+        row[field_positions[raw_name]] = release_info[raw_name]
+    row[field_positions["FileName"]] = file_name
+    filing_amended_return[0] = values.get("AmendedReturnInd")
+    if facility_rows:
+        for facility_row in json.loads(facility_rows):
+            for i, position in cache_release_facility_slots:
+                facility_row[i] = row[position]
+            filing_facility_rows.append(tuple(facility_row))
+    return row, outcome
+
+def cached_filing_for_hash(cache, digest, file_name, release_info):
+    entry = cached_entries(cache, [digest]).get(digest)
+    return cached_filing(cache, digest, entry, file_name, release_info) if entry else None
+
+def remember_filing(cache, alias, digest, outcome, row, facilities):
+    """Queue a processed file's alias and, if it was extracted (not taken from the cache), its entry."""
+    if outcome not in ("row", "no_schedule_h") or not digest:
+        return  # errors are tried again, and return_type depends on prefilter_return_types
+    if alias:
+        cache["aliases"].append((alias, digest))
+    if digest in cache["used"]:
+        return
+    row_values = facility_rows = None
+    field_set = None
+    if row:
+        field_set = cache["field_set"]
+        values = {
+            raw_name: row[field_positions[raw_name]]
+            for raw_name in cache["raw_names"] if row[field_positions[raw_name]] is not None
+        }
+        if dedupe_policy and filing_amended_return[0] is not None:
+            values["AmendedReturnInd"] = filing_amended_return[0]
+        row_values = json.dumps(values)
+        facility_rows = json.dumps([list(facility_row) for facility_row in facilities]) if facility_table else None
+    # About 100 bytes for the keys and the alias on top of the values
+    size = 100 + len(row_values or "") + len(facility_rows or "")
+    cache["entries"].append((digest, cache["spec"], outcome, field_set, row_values, facility_rows, size, time.time()))
+    cache["used"].add(digest)
+
+def save_worker_cache(cache):
+    """Write the current chunk's new entries and aliases, and the last used time of the entries it used, in one commit."""
+    connection = cache["connection"]
+    connection.executemany("INSERT OR REPLACE INTO cached_filings VALUES (?, ?, ?, ?, ?, ?, ?, ?)", cache["entries"])
+    connection.executemany("INSERT OR REPLACE INTO file_aliases VALUES (?, ?)", cache["aliases"])
+    now = time.time()
+    connection.executemany(
+        "UPDATE cached_filings SET last_used = ? WHERE content_hash = ? AND spec = ?",
+        [(now, digest, cache["spec"]) for digest in cache["used"]],
+    )
+    connection.commit()
+    cache["entries"].clear()
+    cache["aliases"].clear()
+    cache["used"].clear()
+
+def remove_unused_cache_rows(connection):
+    """Drop aliases and field sets no entry refers to anymore."""
+    connection.execute("DELETE FROM file_aliases WHERE content_hash NOT IN (SELECT content_hash FROM cached_filings)")
+    connection.execute(
+        "DELETE FROM field_sets WHERE field_set NOT IN (SELECT field_set FROM cached_filings WHERE field_set IS NOT NULL)"
+    )
+
+def evict_extraction_cache(connection, max_bytes):
+    """Remove the least recently used entries until the cache holds at most max_bytes. Returns how many were removed."""
+    total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM cached_filings").fetchone()[0]
+    evicted = []
+    if total > max_bytes:
+        for digest, spec, size in connection.execute("SELECT content_hash, spec, size FROM cached_filings ORDER BY last_used"):
+            if total <= max_bytes:
+                break
+            evicted.append((digest, spec))
+            total -= size
+        connection.executemany("DELETE FROM cached_filings WHERE content_hash = ? AND spec = ?", evicted)
+        remove_unused_cache_rows(connection)
+    connection.commit()
+    return len(evicted)
+
+def extraction_cache_summary(connection):
+    """One line such as '48,311 filings (1,204 with a row), 310.5 MB of 2,048 MB'."""
+    filings, rows, size = connection.execute(
+        "SELECT COUNT(*), COALESCE(SUM(outcome = 'row'), 0), COALESCE(SUM(size), 0) FROM cached_filings"
+    ).fetchone()
+    return f"{filings:,} filings ({rows:,} with a row), {size / 1024 / 1024:,.1f} MB of {extraction_cache_mb:,} MB"
+
+def extraction_cache_command(arguments):
+    """
+    python "Parsing Code.py" cache info          what the cache holds
+    python "Parsing Code.py" cache prune [MB]    remove the least recently used filings until it holds at most MB
+                                                 (default extraction_cache_mb)
+    python "Parsing Code.py" cache prune-stale   remove the filings extracted with other settings or an older script
+    python "Parsing Code.py" cache clear         remove everything
+    """
+    command = arguments[0] if arguments else "info"
+    if command not in ("info", "prune", "prune-stale", "clear"):
+        raise SystemExit(extraction_cache_command.__doc__)
+    if not extraction_cache:
+        raise SystemExit("extraction_cache is not set; set it to the cache's path near the top of the script first.")
+    if not os.path.exists(extraction_cache):
+        raise SystemExit(f"There is no extraction cache at {extraction_cache} yet.")
+    connection = open_extraction_cache(extraction_cache)
+    if command == "info":
+        print(f"Extraction cache: {extraction_cache}")
+        print(f" => {extraction_cache_summary(connection)}")
+        current, oldest, newest = connection.execute(
+            "SELECT COALESCE(SUM(spec = ?), 0), MIN(last_used), MAX(last_used) FROM cached_filings", (extraction_spec(),)
+        ).fetchone()
+        print(f" => {current:,} filings usable with the current extraction_engine, facility_table and schema_families")
+        aliases = connection.execute("SELECT COUNT(*) FROM file_aliases").fetchone()[0]
+        print(f" => {aliases:,} files (folder files and ZIP members) known without reading them")
+        if oldest is not None:
+            print(f" => Last used between {time.strftime('%Y-%m-%d %H:%M', time.localtime(oldest))}"
+                  f" and {time.strftime('%Y-%m-%d %H:%M', time.localtime(newest))}")
+    else:
+        if command == "prune":
+            megabytes = float(arguments[1]) if len(arguments) > 1 else extraction_cache_mb
+            removed = evict_extraction_cache(connection, megabytes * 1024 * 1024)
+        else:
+            if command == "prune-stale":
+                removed = connection.execute("DELETE FROM cached_filings WHERE spec != ?", (extraction_spec(),)).rowcount
+            else:
+                removed = connection.execute("DELETE FROM cached_filings").rowcount
+            remove_unused_cache_rows(connection)
+            connection.commit()
+        # Give the freed space back to the disk
+        connection.execute("VACUUM")
+        print(f"Removed {removed:,} filings. The cache now holds {extraction_cache_summary(connection)}.")
+    connection.close()
+
+    # FILING INDEX (filing_index)
+    # Scanning a release for the index reads each filing's <ReturnHeader> (the first few KB of the file) and checks
+    # its bytes for a Schedule H, the same check the pre-filter does. The index is a plain SQLite database, so it can
+    # also be opened with any SQLite tool (e.g. DB Browser for SQLite) to look up filings.
+
+def filing_index_path():
+    return os.path.join(parent_folder, "filing index.sqlite")
+
+def open_filing_index(path):
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS filings ("
+        " source TEXT, name TEXT, size INTEGER, mtime REAL, ein TEXT, tax_yr TEXT, tax_period_end_dt TEXT,"
+        " return_type TEXT, state TEXT, return_version TEXT, has_schedule_h INTEGER, PRIMARY KEY (source, name))"
+    )
+    connection.execute("CREATE INDEX IF NOT EXISTS filings_by_ein ON filings (ein)")
+    # Where each release (subfolder or ZIP) is, and when it was last scanned
+    connection.execute("CREATE TABLE IF NOT EXISTS indexed_releases (source TEXT PRIMARY KEY, path TEXT, indexed_at TEXT)")
+    connection.commit()
+    return connection
+
+def index_tag_tables(overrides):
+    """
+    ({header tag: position}, {filer tag: position}) of the values filing_header stores, with the tag names of the
+    schema family whose overrides are given. EIN and state are only taken from inside <Filer> (the preparer has them too).
+    The return type is not a column; schemas before 2013v3.0 call it <ReturnType>.
+    """
+    paths = {field.raw_name: field.path for field in field_registry if field.path}
+
+    def tag(raw_name):
+        return overrides.get(raw_name, paths[raw_name]).rsplit("/", 1)[-1]
+
+    return (
+        {tag("TaxYr"): 1, tag("TaxPeriodEndDt"): 2, "ReturnTypeCd": 3, "ReturnType": 3},
+        {tag("Filer_EIN"): 0, tag("Filer_StateAbbreviationCd"): 4},
+    )
+
+# Family name (None for an unknown version) -> the family's index tag tables
+index_tags = {name: index_tag_tables(overrides) for name, _, _, overrides in schema_families}
+index_tags[None] = index_tag_tables({})
+
+def filing_header(stream):
+    """(EIN, TaxYr, TaxPeriodEndDt, ReturnTypeCd, filer state, returnVersion) from the top of one filing."""
+    values = [None] * 6
+    in_filer = False
+    index_header_tags, index_filer_tags = index_tags[None]
+    parser = etree.iterparse(stream, events=("start", "end"), recover=True, remove_comments=True, remove_pis=True)
+    for event, elem in parser:
+        name = elem.tag.rpartition("}")[2]
+        if event == "start":
+            if name == "Return":
+                values[5] = elem.get("returnVersion")
+                index_header_tags, index_filer_tags = index_tags[schema_family_of(values[5])]
+            elif name == "Filer":
+                in_filer = True
+            continue
+        if name == "ReturnHeader":
+            break
+        if name == "Filer":
+            in_filer = False
+        position = index_filer_tags.get(name) if in_filer else index_header_tags.get(name)
+        if position is not None and values[position] is None:
+            values[position] = (elem.text or "").strip() or None
+    return tuple(values)
+
+def index_chunk(task):
+    """
+    Scan one chunk of files for the filing index.
+    Returns (number of files, [(file name, header values..., has Schedule H), ...], failures), failures being the
+    (file name, label, "index", exception, message) of the files that could not be scanned, like extract_chunk's.
+    """
+    source_path, is_zip, file_names, _ = task
+    records = []
+    failures = []
+    if is_zip:
+        archive, buffer = open_worker_archive(source_path)
+    for name in file_names:
+        try:
+            if is_zip:
+                with archive.open(name) as member:
+                    content = member.read()
+            else:
+                with open(os.path.join(source_path, name), "rb") as file:
+                    content = file.read()
+            # Same rule as the pre-filter: a UTF-16 file cannot be searched by bytes, so it counts as a possible Schedule H
+            has_schedule_h = content[:2] in (b"\xff\xfe", b"\xfe\xff") or schedule_h_marker in content
+            records.append((name, *filing_header(io.BytesIO(content)), int(has_schedule_h)))
+        except Exception as e:
+            # Left out of the index, so it is scanned again by the next run (and extracted by retry)
+            label = f"{source_path}:{name}" if is_zip else os.path.join(source_path, name)
+            failures.append((name, label, "index", type(e).__name__, str(e)))
+    return len(file_names), records, failures
+
+def update_filing_index(connection, source_path, is_zip, run_chunks):
+    """
+    Scan the new and changed files of one release into the index and drop the ones that are gone.
+    Returns the failures of the files that could not be scanned (see index_chunk).
+    """
+    source = os.path.basename(source_path)
+    file_names, fingerprints = list_release_files(source_path, is_zip, with_fingerprints=True)
+    known = {
+        name: (size, mtime)
+        for name, size, mtime in connection.execute("SELECT name, size, mtime FROM filings WHERE source = ?", (source,))
+    }
+    to_scan = [name for name in file_names if known.get(name) != fingerprints[name]]
+    gone = set(known) - set(file_names)
+    connection.executemany("DELETE FROM filings WHERE source = ? AND name = ?", [(source, name) for name in gone])
+
+    failures = []
+    with tqdm(total=len(to_scan), desc="Indexing") as progress:
+        for file_count, records, chunk_failures in run_chunks(index_chunk, make_chunks(source_path, is_zip, to_scan, None)):
+            connection.executemany(
+                "INSERT OR REPLACE INTO filings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(source, name, *fingerprints[name], *values) for name, *values in records],
+            )
+            connection.commit()
+            failures.extend(chunk_failures)
+            progress.update(file_count)
+    # A release with files that could not be scanned does not count as indexed, so the next run scans those again
+    if not failures:
+        connection.execute(
+            "INSERT OR REPLACE INTO indexed_releases VALUES (?, ?, ?)",
+            (source, source_path, time.strftime("%Y-%m-%d %H:%M:%S")),
+        )
+        connection.commit()
+    print(
+        f" => Filing index: {len(to_scan) - len(failures):,} files scanned, {len(gone):,} removed,"
+        f" {len(file_names) - len(to_scan):,} unchanged" + (f", {len(failures):,} failed" if failures else "")
+    )
+    return failures
+
+def release_is_indexed(connection, source):
+    return connection.execute("SELECT 1 FROM indexed_releases WHERE source = ?", (source,)).fetchone() is not None
+
+def select_from_filing_index(connection, source):
+    """
+    The release's filings that have a Schedule H and match the filters, sorted by name,
+    and {name: (size, modified time)} for them.
+    """
+    wanted = {
+        "ein": filter_eins,
+        "tax_yr": filter_tax_years,
+        "state": filter_states,
+        "return_type": prefilter_return_types,
+    }
+    wanted = {column: {str(value) for value in values} for column, values in wanted.items() if values}
+    file_names = []
+    fingerprints = {}
+    rows = connection.execute(
+        "SELECT name, size, mtime, ein, tax_yr, state, return_type, has_schedule_h FROM filings"
+        " WHERE source = ? ORDER BY name", (source,)
+    )
+    for name, size, mtime, ein, tax_yr, state, return_type, has_schedule_h in rows:
+        if prefilter_schedule_h and not has_schedule_h:
+            continue
+        values = {"ein": ein, "tax_yr": tax_yr, "state": state, "return_type": return_type}
+        if any(values[column] not in allowed for column, allowed in wanted.items()):
+            continue
+        file_names.append(name)
+        fingerprints[name] = (size, mtime)
+    return file_names, fingerprints
+
+    # RELEASE NAMES AND BATCH MODE
+    # A release missing from release_info_for_subfolder still gets its year, source URL and file name when its folder
+    # or ZIP keeps the IRS download name, e.g. "2025_TEOS_XML_01A" or "download990xml_2019_2"
+release_name_patterns = [
+    re.compile(r"(\d{4})_TEOS_XML_\w+"),
+    re.compile(r"download990xml_(\d{4})_\d+"),
+]
+
+def release_info_for(subfolder_name):
+    """Release metadata for one subfolder (or ZIP, without ".zip"): from release_info_for_subfolder, else from its name."""
+    if subfolder_name in release_info_for_subfolder:
+        return release_info_for_subfolder[subfolder_name]
+    for pattern in release_name_patterns:
+        match = pattern.fullmatch(subfolder_name)
+        if match:
+            return {
+                "ReleaseYear": match.group(1),
+                "ReleaseSource": f"https://apps.irs.gov/pub/epostcard/990/xml/{match.group(1)}/{subfolder_name}.zip",
+                "ReleaseDownload": "",
+                "ReleaseFileName": f"{subfolder_name}.zip"
+            }
+    return {
         "ReleaseYear": "",
         "ReleaseSource": "",
         "ReleaseDownload": "",
         "ReleaseFileName": ""
-    })
-    ReleaseYear     = release_info["ReleaseYear"]
-    ReleaseSource   = release_info["ReleaseSource"]
-    ReleaseDownload = release_info["ReleaseDownload"]
-    ReleaseFileName = release_info["ReleaseFileName"]
-
-    print(f"\nProcessing subfolder: {subfolder_path}")
-    print(f" => Release Info: Year={ReleaseYear}, Source={ReleaseSource}, FileName={ReleaseFileName}")
-    
-    # 3) For each .xml file inside, call extract_data
-    for file_name in tqdm(os.listdir(subfolder_path)):
-        if not file_name.endswith(".xml"):
+    }
+
+batch_year_pattern = re.compile(r"EIN zip files (\d{4})")
+
+def batch_year_folders():
+    """The (parent folder, output CSV) of every "EIN zip files 20xx" folder in batch_root_folder, oldest year first."""
+    wanted = None if batch_years is None else {str(year) for year in batch_years}
+    years = []
+    with os.scandir(batch_root_folder) as entries:
+        for entry in entries:
+            match = batch_year_pattern.fullmatch(entry.name)
+            if match and entry.is_dir() and (wanted is None or match.group(1) in wanted):
+                years.append((match.group(1), entry.path))
+    if not years:
+        raise SystemExit(f'No "EIN zip files 20xx" folders to extract in {batch_root_folder}')
+    output_folder = batch_output_folder or os.path.join(batch_root_folder, "csv output")
+    os.makedirs(output_folder, exist_ok=True)
+    return [(path, os.path.join(output_folder, f"IRS 990H {year}.csv")) for year, path in sorted(years)]
+
+    # SHARDS (--shard i/N and merge)
+    # A rebuild that is too big for one computer can be split over several: each one runs the script on the same
+    # parent_folder (e.g. on shared storage) with --shard i/N and extracts only the filings whose file name hashes to
+    # shard i of N. The file name is the filing's ObjectId plus "_public.xml", so every computer puts a filing in the same
+    # shard, whether it is read from a folder or a ZIP, without the computers talking to each other.
+    # Each shard writes "IRS 990H 2025.shard 2 of 4.csv". Its first two columns hold the release (folder or ZIP name) and
+    # the file name, and the rows come out sorted by them: every run takes the releases, and each release's files, in
+    # name order. Folder listings come in a different order on different computers (and file systems), so names are the
+    # only key every shard agrees on. The merge command reads all shards side by side, one row at a time (a k-way merge),
+    # and writes exactly the CSV one computer would have written.
+
+shard_key_header = ["ShardRelease", "ShardFile"]
+
+def parse_shard(arguments):
+    """(i, N) from a --shard i/N (or --shard=i/N) command line; None without --shard."""
+    if not arguments:
+        return None
+    if len(arguments) == 2 and arguments[0] == "--shard":
+        text = arguments[1]
+    elif len(arguments) == 1 and arguments[0].startswith("--shard="):
+        text = arguments[0][len("--shard="):]
+    else:
+        text = ""
+    match = re.fullmatch(r"(\d+)/(\d+)", text)
+    if not match:
+        raise SystemExit('Usage: python "Parsing Code.py" [--shard i/N], e.g. --shard 2/4 for the second of four shards')
+    shard = int(match.group(1)), int(match.group(2))
+    if not 1 <= shard[0] <= shard[1]:
+        raise SystemExit(f"--shard {text}: the shard number must be between 1 and {shard[1]}")
+    return shard
+
+def shard_of(name, shard_count):
+    """The shard (1 to shard_count) of one filing, from a stable hash of its file name."""
+    digest = hashlib.blake2b(name.rsplit("/", 1)[-1].encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shard_count + 1
+
+def shard_output_path(csv_path, shard):
+    """Where one shard writes: "IRS 990H 2025.csv" -> "IRS 990H 2025.shard 2 of 4.csv"."""
+    stem, extension = os.path.splitext(csv_path)
+    return f"{stem}.shard {shard[0]} of {shard[1]}{extension}"
+
+def shard_files(file_names, shard):
+    """The names that belong to this shard, in name order (the order of the merge key)."""
+    return sorted(name for name in file_names if shard_of(name, shard[1]) == shard[0])
+
+def shard_count_for(csv_path):
+    """How many shards were written for csv_path, after checking that none of them is missing (0 when there are none)."""
+    folder, file_name = os.path.split(csv_path)
+    stem, extension = os.path.splitext(file_name)
+    pattern = re.compile(re.escape(stem) + r"\.shard (\d+) of (\d+)" + re.escape(extension))
+    found = set()
+    with os.scandir(folder or ".") as entries:
+        for entry in entries:
+            match = pattern.fullmatch(entry.name)
+            if match:
+                found.add((int(match.group(1)), int(match.group(2))))
+    counts = {count for _, count in found}
+    if len(counts) > 1:
+        raise SystemExit(f"The shards next to {csv_path} come from runs with different shard counts {sorted(counts)}; delete the old ones.")
+    if not counts:
+        return 0
+    count = counts.pop()
+    missing = [i for i in range(1, count + 1) if (i, count) not in found]
+    if missing:
+        raise SystemExit(f"Cannot merge {csv_path} yet: shard {', '.join(map(str, missing))} of {count} is not there.")
+    return count
+
+def merge_shard_files(shard_paths, merged_path, header):
+    """Merge sorted shard CSVs into merged_path without the key columns. Returns the number of rows."""
+    files = [open(path, newline="", encoding="utf-8") for path in shard_paths]
+    readers = [csv.reader(file) for file in files]
+    for path, reader in zip(shard_paths, readers):
+        if next(reader, None) != shard_key_header + header:
+            raise SystemExit(f"{path} has other columns than the current settings would write (selected_columns?).")
+    output_file, writer = open_csv_output(merged_path, header=header)
+    rows = 0
+    for row in heapq.merge(*readers, key=lambda row: (row[0], row[1])):
+        writer.writerow(row[2:])
+        rows += 1
+    output_file.close()
+    for file in files:
+        file.close()
+    # Like a run on one computer, which only creates the file once it has a row
+    if not rows:
+        os.remove(merged_path)
+    return rows
+
+def concatenate_csv_files(paths, merged_path):
+    """
+    Write the rows of the CSVs in paths that exist (all with the same header) one after another into merged_path,
+    e.g. the shards' error logs. Returns the number of rows.
+    """
+    if os.path.exists(merged_path):
+        os.remove(merged_path)
+    rows = 0
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, newline="", encoding="utf-8") as file:
+                reader = csv.reader(file)
+                header = next(reader, None)
+                entries = list(reader)
+            if entries:
+                merged_file, writer = open_csv_output(merged_path, append=True, header=header)
+                writer.writerows(entries)
+                merged_file.close()
+                rows += len(entries)
+    return rows
+
+def merge_command():
+    """python "Parsing Code.py" merge: combine the shard outputs of output_csv (or of every year in batch mode)."""
+    years = batch_year_folders() if batch_root_folder else [(parent_folder, output_csv)]
+    for _, csv_path in years:
+        count = shard_count_for(csv_path)
+        if not count:
+            print(f"No shard outputs to merge for {csv_path}")
             continue
-        xml_path = os.path.join(subfolder_path, file_name)
-        row = extract_data(
-            xml_file        = xml_path,
-            ReleaseYear     = ReleaseYear,
-            ReleaseSource   = ReleaseSource,
-            ReleaseDownload = ReleaseDownload,
-            ReleaseFileName = ReleaseFileName
-        )
-        if row:
-            results.append(row)
-
-# 4) After processing all, build a pandas DataFrame, rename columns, reorder, and save to CSV
-if results:
-    df = pd.DataFrame(results, columns=columns_order)
-    df.rename(columns=rename_dict, inplace=True)
-
-    desired_order = [
-    "IRS_RELEASEYEAR","IRS_RELEASESITE","IRS_RELEASEDOWN","IRS_RELEASETEOS",
-    "IRS_RELEASEXML","IRS_TAXPERBEGDT","IRS_TAXPERENDDT","IRS_TAXYEAR",
-    "IRS_PREPAREDT","IRS_FILER_EIN","IRS_FLRBUSNAME","IRS_FLRBUSNMTXT",
-    "IRS_FLRPHONENUM","IRS_FLRADDRESS","IRS_FLRCITYNAME","IRS_FLRSTATEABB",
-    "IRS_FLRZIPCODE","IRS_FLRCOUNTRY","IRS_TOTEMPCNT","IRS_TOTGRUBIAMT",
-    "IRS_NETUBIAMT","IRS_PYCNTGRTAMT","IRS_CYCNTGRTAMT","IRS_PYPSREVAMT",
-    "IRS_CYPSREVAMT","IRS_PYINVINCAMT","IRS_CYINVINCAMT","IRS_PYOTHREVAMT",
-    "IRS_CYOTHREVAMT","IRS_PYTOTREVAMT","IRS_CYTOTREVAMT","IRS_PYGASPAIAMT",
-    "IRS_CYGASPAIAMT","IRS_PYBENPTMAMT","IRS_CYBENPTMAMT","IRS_PYSCEBPAMT",
-    "IRS_CYSCEBPAMT","IRS_PYTPFEXPAMT","IRS_CYTPFEXPAMT","IRS_CYTFEXPAMT",
-    "IRS_PYOTHEXPAMT","IRS_CYOTHEXPAMT","IRS_PYTOTEXPAMT","IRS_CYTOTEXPAMT",
-    "IRS_PYREVLEXAMT","IRS_CYREVLEXAMT","IRS_TLASSBOYAMT","IRS_TLASSEOYAMT",
-    "IRS_TLLBLBOYAMT","IRS_TLLBLEOYAMT","IRS_NAOFBBOYAMT","IRS_NAOFBEOYAMT",
-    "IRS_FNASPOLYN","IRS_FAPWRTNYN","IRS_FAPALLHSP","IRS_FAPMSTHSP",
-    "IRS_FAPTLRHSP","IRS_FAPFCPG100","IRS_FAPFCPG150","IRS_FAPFCPG200",
-    "IRS_FAPFCPGOTH","IRS_FAPDCPG200","IRS_FAPDCPG250","IRS_FAPDCPG300",
-    "IRS_FAPDCPG350","IRS_FAPDCPG400","IRS_FAPDCPGOTH","IRS_FDCRMEDIND",
-    "IRS_FNASBDGT","IRS_EXPEXCBDGT","IRS_UNTOPRFDCR","IRS_PRANCMBNRT",
-    "IRS_CBRPUBAVL","IRS_FAACTCBEA","IRS_FAACDORVA","IRS_FAACNCBEA",
-    "IRS_FAACNCBEP","IRS_UMCDTCBEA","IRS_UMCDDORVA","IRS_UMCDNCBEA",
-    "IRS_UMCDNCBEP","IRS_OMTGTCBEA","IRS_OMTGDORVA","IRS_OMTGNCBEA",
-    "IRS_OMTGNCBEP","IRS_TFMTCBEA","IRS_TFMTDORVA","IRS_TFMTNCBEA",
-    "IRS_TFMTNCBEP","IRS_CHISTCBEA","IRS_CHISDORVA","IRS_CHISNCBEA",
-    "IRS_CHISNCBEP","IRS_HPEDTCBEA","IRS_HPEDDORVA","IRS_HPEDNCBEA",
-    "IRS_HPEDNCBEP","IRS_SBHSTCBEA","IRS_SBHSDORVA","IRS_SBHSNCBEA",
-    "IRS_SBHSNCBEP","IRS_RSCHTCBEA","IRS_RSCHDORVA","IRS_RSCHNCBEA",
-    "IRS_RSCHNCBEP","IRS_CIKCTCBEA","IRS_CIKCDORVA","IRS_CIKCNCBEA",
-    "IRS_CIKCNCBEP","IRS_TOBNTCBEA","IRS_TOBNDORVA","IRS_TOBNNCBEA",
-    "IRS_TOBNNCBEP","IRS_TCBNTCBEA","IRS_TCBNDORVA","IRS_TCBNNCBEA",
-    "IRS_TCBNNCBEP","IRS_PIAHTCBEA","IRS_PIAHDORVA","IRS_PIAHNCBEA",
-    "IRS_PIAHNCBEP","IRS_ECDVTCBEA","IRS_ECDVDORVA","IRS_ECDVNCBEA",
-    "IRS_ECDVNCBEP","IRS_CSPTTCBEA","IRS_CSPTDORVA","IRS_CSPTNCBEA",
-    "IRS_CSPTNCBEP","IRS_ENVITCBEA","IRS_ENVIDORVA","IRS_ENVINCBEA",
-    "IRS_ENVINCBEP","IRS_LDATTCBEA","IRS_LDATDORVA","IRS_LDATNCBEA",
-    "IRS_LDATNCBEP","IRS_CBLDTCBEA","IRS_CBLDDORVA","IRS_CBLDNCBEA",
-    "IRS_CBLDNCBEP","IRS_CHAITCBEA","IRS_CHAIDORVA","IRS_CHAINCBEA",
-    "IRS_CHAINCBEP","IRS_WKDVTCBEA","IRS_WKDVDORVA","IRS_WKDVNCBEA",
-    "IRS_WKDVNCBEP","IRS_OCBATCBEA","IRS_OCBADORVA","IRS_OCBANCBEA",
-    "IRS_OCBANCBEP","IRS_TCBATCBEA","IRS_TCBADORVA","IRS_TCBANCBEA",
-    "IRS_TCBANCBEP","IRS_RPBDHFMA15","IRS_BADDBTTLAMT","IRS_BADDBTATFAP",
-    "IRS_TTLMCRREV","IRS_TTLMCRCST","IRS_TTLMCRSRPLS","IRS_MCRCMUCAS",
-    "IRS_MCRCMUCCR","IRS_MCRCMUOTH","IRS_DBTCOLWRT","IRS_DBTCOLFAP",
-    "IRS_MCJVNAME","IRS_MCJVDOPA","IRS_MJORGPRFPCT","IRS_MJODTPRFPCT",
-    "IRS_MJMDSPRFPCT","IRS_TOTCNTFCLTY","IRS_LSTALLFCLTY","IRS_FC1BUSNAME",
-    "IRS_FC1ADDRESS","IRS_FC1CITYNAME","IRS_FC1STATEABB","IRS_FC1ZIPCODE",
-    "IRS_FC1COUNTRY","IRS_FC2BUSNAME","IRS_FC2ADDRESS","IRS_FC2CITYNAME",
-    "IRS_FC2STATEABB","IRS_FC2ZIPCODE","IRS_FC2COUNTRY","IRS_SUBHSPNAME",
-    "IRS_SUBHSPEIN","IRS_FCISLICHSP","IRS_FCISGMSHSP","IRS_FCISCLDHSP",
-    "IRS_FCISTCHHSP","IRS_FCISCRAHSP","IRS_FCISRSRCHF","IRS_CHNAVB1",
-    "IRS_CHNAVB2","IRS_CHNAVB3","IRS_CHNAVB3A","IRS_CHNAVB3B","IRS_CHNAVB3C",
-    "IRS_CHNAVB3D","IRS_CHNAVB3E","IRS_CHNAVB3F","IRS_CHNAVB3G","IRS_CHNAVB3H",
-    "IRS_CHNAVB3I","IRS_CHNAVB3J","IRS_CHNAVB4","IRS_CHNAVB5","IRS_CHNAVB6A",
-    "IRS_CHNAVB6B","IRS_CHNAVB7","IRS_CHNAVB7A","IRS_CHNAVB7AURL","IRS_CHNAVB7B",
-    "IRS_CHNAVB7BURL","IRS_CHNAVB7C","IRS_CHNAVB7D","IRS_CHNAVB8","IRS_CHNAVB9",
-    "IRS_CHNAVB10","IRS_CHNAVB10A","IRS_CHNAVB10B","IRS_CHNAVB10B2",
-    "IRS_CHNAVB12A","IRS_CHNAVB12B","IRS_CHNAVB12C","IRS_FAPVB13",
-    "IRS_FAPVB13A","IRS_FAPVB13AFC","IRS_FAPVB13ADC","IRS_FAPVB13B",
-    "IRS_FAPVB13C","IRS_FAPVB13D","IRS_FAPVB13E","IRS_FAPVB13F",
-    "IRS_FAPVB13G","IRS_FAPVB13H","IRS_FAPVB14","IRS_FAPVB15","IRS_FAPVB15A",
-    "IRS_FAPVB15B","IRS_FAPVB15C","IRS_FAPVB15D","IRS_FAPVB15E","IRS_FAPVB16",
-    "IRS_FAPVB16A","IRS_FAPVB16AURL","IRS_FAPVB16B","IRS_FAPVB16BURL",
-    "IRS_FAPVB16C","IRS_FAPVB16CURL","IRS_FAPVB16D","IRS_FAPVB16E",
-    "IRS_FAPVB16F","IRS_FAPVB16G","IRS_FAPVB16H","IRS_FAPVB16I","IRS_FAPVB16J",
-    "IRS_BACVB17","IRS_BACVB18A","IRS_BACVB18B","IRS_BACVB18C","IRS_BACVB18D",
-    "IRS_BACVB18E","IRS_BACVB18F","IRS_BACVB19","IRS_BACVB19A","IRS_BACVB19B",
-    "IRS_BACVB19C","IRS_BACVB19D","IRS_BACVB19E","IRS_BACVB20A","IRS_BACVB20B",
-    "IRS_BACVB20C","IRS_BACVB20D","IRS_BACVB20E","IRS_BACVB20F","IRS_EMCVB21",
-    "IRS_EMCVB21A","IRS_EMCVB21B","IRS_EMCVB21C","IRS_EMCVB21D","IRS_EMCVB22A",
-    "IRS_EMCVB22B","IRS_EMCVB22C","IRS_EMCVB22D","IRS_EMCVB23","IRS_EMCVB24",
-    "IRS_TOTCNTOHF","IRS_OHFBUSNAME","IRS_OHFADDRESS","IRS_OHFCITYNAME",
-    "IRS_OHFSTATEABB","IRS_OHFZIPCODE"
-]
-    df = df[desired_order]
+        shards = [(i, count) for i in range(1, count + 1)]
+        rows = merge_shard_files([shard_output_path(csv_path, shard) for shard in shards], csv_path, output_header)
+        print(f"Merged {count} shards: {rows} records saved to: {csv_path}")
+        facility_shards = [facility_output_path(shard_output_path(csv_path, shard)) for shard in shards]
+        if all(os.path.exists(path) for path in facility_shards):
+            facility_csv = facility_output_path(csv_path)
+            rows = merge_shard_files(facility_shards, facility_csv, facility_table_header)
+            print(f"{rows} facility rows saved to: {facility_csv}")
+        failed = concatenate_csv_files([error_log_path(shard_output_path(csv_path, shard)) for shard in shards], error_log_path(csv_path))
+        if failed:
+            print(f"{failed} failed files listed in: {error_log_path(csv_path)}")
+        broken = concatenate_csv_files([validation_path(shard_output_path(csv_path, shard)) for shard in shards], validation_path(csv_path))
+        if broken:
+            print(f"{broken} broken community benefit rules listed in: {validation_path(csv_path)}")
+
+    # FAILED FILES (error log and retry)
+    # Every file that fails is listed in a CSV next to the output, e.g. "IRS 990H 2025.errors.csv", with its path,
+    # the release folder or ZIP it is in, the phase it failed in ("read": opening or reading it, "cache": looking it up in
+    # the extraction cache, "parse": extracting its values, "index": scanning it for the filing index), the exception
+    # and its message. A run that writes the output
+    # from scratch starts the list over; runs that add to the output (delta_releases) add to it.
+    # python "Parsing Code.py" retry extracts only the listed files again, adds the rows of the ones that work now to the
+    # output, and keeps the ones that still fail on the list.
+
+error_log_header = ["FilePath", "Source", "Name", "Release", "Phase", "Exception", "Message", "FailedAt"]
+
+def error_log_path(csv_path):
+    return os.path.splitext(csv_path)[0] + ".errors.csv"
+
+def error_log_entries(chunk_failures, source_path, release_name):
+    """The error log lines for one chunk's failures."""
+    failed_at = time.strftime("%Y-%m-%d %H:%M:%S")
+    return [
+        (label, source_path, name, release_name, phase, exception, message, failed_at)
+        for name, label, phase, exception, message in chunk_failures
+    ]
+
+def read_error_log(csv_path):
+    """The files in the error log of csv_path (each file once, with its latest failure), in the order they were listed."""
+    path = error_log_path(csv_path)
+    if not os.path.exists(path):
+        return []
+    with open(path, newline="", encoding="utf-8") as file:
+        failures = {(entry["Source"], entry["Name"]): entry for entry in csv.DictReader(file)}
+    return list(failures.values())
+
+def retry_failed_files(csv_path):
+    """Extract the files in the error log of csv_path again and add the rows of the ones that work now to its output."""
+    failures = read_error_log(csv_path)
+    if not failures:
+        print(f"No failed files listed for {csv_path}")
+        return
+    print(f"Retrying {len(failures):,} failed files of {csv_path}")
+    facility_csv = facility_output_path(csv_path) if facility_table else None
+    typed_output = output_format != "csv"
+    if not typed_output:
+        for path, header in ((csv_path, output_header), (facility_csv, facility_table_header)):
+            if path and os.path.exists(path) and csv_header(path) != header:
+                raise SystemExit(f"{path} has other columns than the current settings write (selected_columns?).")
+
+    # By release, in the order they failed
+    releases = {}
+    for entry in failures:
+        releases.setdefault((entry["Source"], entry["Release"]), []).append(entry["Name"])
+
+    output_file = output_writer = facility_file = facility_writer = None
+    validation = open_validation(csv_path, append=True) if validate_community_benefit else None
+    still_failing = []
+    records_written = facility_rows_written = 0
+    for (source_path, release_name), names in releases.items():
+        is_zip = source_path.lower().endswith(".zip") and os.path.isfile(source_path)
+        release_info = release_info_for(release_name)
+        partition = facility_partition = None
+        for _, file_results, chunk_stats, chunk_versions, _, chunk_errors, chunk_failures in map(extract_chunk, make_chunks(source_path, is_zip, names, release_info)):
+            rows = [row for _, _, _, row, _, _ in file_results if row]
+            facility_rows = [facility_row for _, _, _, row, facilities, _ in file_results if row for facility_row in facilities]
+            records_written += len(rows)
+            facility_rows_written += len(facility_rows)
+            if validation and rows:
+                validate_rows(validation, rows)
+            if typed_output:
+                # The release's recovered rows go in a new part file of its partition
+                if rows:
+                    if partition is None:
+                        partition = open_typed_partition(typed_output_folder(csv_path), release_info)
+                    write_typed_rows(partition, rows)
+                if facility_rows:
+                    if facility_partition is None:
+                        facility_partition = open_typed_partition(typed_output_folder(facility_csv), release_info, typed_facility_columns)
+                    write_typed_rows(facility_partition, facility_rows)
+            else:
+                if rows:
+                    if output_file is None:
+                        output_file, output_writer = open_csv_output(csv_path, append=True)
+                    write_csv_rows(output_writer, rows)
+                if facility_rows:
+                    if facility_file is None:
+                        facility_file, facility_writer = open_csv_output(facility_csv, append=True, header=facility_table_header)
+                    write_csv_rows(facility_writer, facility_rows)
+            prefilter_stats.update(chunk_stats)
+            schema_version_stats.update(chunk_versions)
+            typed_value_errors.update(chunk_errors)
+            still_failing.extend(error_log_entries(chunk_failures, source_path, release_name))
+        for finished_partition in (partition, facility_partition):
+            if finished_partition is not None:
+                close_typed_partition(finished_partition)
+    for file in (output_file, facility_file):
+        if file is not None:
+            file.close()
+
+    # The error log now only lists the files that still fail
+    path = error_log_path(csv_path)
+    if still_failing:
+        log_file, log_writer = open_csv_output(path + ".tmp", header=error_log_header)
+        log_writer.writerows(still_failing)
+        log_file.close()
+        os.replace(path + ".tmp", path)
+    else:
+        os.remove(path)
+    print(f" => {len(failures) - len(still_failing):,} files worked this time, {len(still_failing):,} still fail")
+    print(f" => {records_written} records added to: {typed_output_folder(csv_path) if typed_output else csv_path}")
+    if facility_table:
+        print(f" => {facility_rows_written} facility rows added to: {typed_output_folder(facility_csv) if typed_output else facility_csv}")
+    if validation:
+        close_validation(validation)
+        print_validation_summary(validation)
+
+def retry_command():
+    """python "Parsing Code.py" retry: extract only the files in the error log again (of every year in batch mode)."""
+    if resume_with_manifest:
+        raise SystemExit("With resume_with_manifest on, just run the script again: it tries the files that failed again by itself.")
+    if dedupe_policy:
+        raise SystemExit("retry cannot be combined with dedupe_policy, since the recovered rows would skip the duplicate check.")
+    if output_format != "csv" and pa is None:
+        raise SystemExit(f'output_format = "{output_format}" needs pyarrow. Install it with: pip install pyarrow')
+    if validate_community_benefit and np is None:
+        raise SystemExit("validate_community_benefit = True needs numpy. Install it with: pip install numpy")
+    years = batch_year_folders() if batch_root_folder else [(parent_folder, output_csv)]
+    for _, csv_path in years:
+        retry_failed_files(csv_path)
+
+    # MAIN EXECUTION
+    # This final block:
+    #  - finds all yearly ZIP folders,
+    #  - iterates through each XML in each folder,
+    #  - and writes the rows to the CSV in batches, one chunk of files at a time.
+    # It only runs when the script is started directly (or from benchmark.py), not when worker processes load it.
+def extract_parent_folder(run_chunks, shard=None):
+    """
+    Extract every release in parent_folder into output_csv. Returns the number of records written.
+    With shard (i, N), only that shard's filings are extracted, and each row starts with its merge key.
+    """
+    stats_at_start = prefilter_stats.copy()
+    versions_at_start = schema_version_stats.copy()
+    errors_at_start = typed_value_errors.copy()
+
+    # 1) List all release sources under parent_folder: extracted subfolders and, optionally, the ZIP downloads themselves
+    # Whether an entry is a folder or a file comes with the directory listing itself, without a stat call per entry
+    # The releases are taken in name order, which does not depend on the file system (and shards rely on it)
+    with os.scandir(parent_folder) as entries:
+        parent_entries = sorted((entry.name, entry.is_dir(), entry.is_file()) for entry in entries)
+    folder_names = {sf for sf, is_dir, _ in parent_entries if is_dir}
+    # (path, is it a ZIP)
+    subfolders = []
+    for sf, is_dir, is_file in parent_entries:
+        if is_dir:
+            subfolders.append((os.path.join(parent_folder, sf), False))
+        elif read_zip_archives and sf.lower().endswith(".zip"):
+            if sf[:-4] in folder_names:
+                print(f"Skipping {sf}: it is already extracted to the subfolder {sf[:-4]}")
+                continue
+            subfolders.append((os.path.join(parent_folder, sf), is_file))
+
+    # With facility_table, a second output gets one row per facility
+    facility_csv = facility_output_path(output_csv) if facility_table else None
+
+    # With resume_with_manifest, processed files are remembered and new rows are appended to the existing CSV
+    manifest = open_manifest(output_csv, facility_csv) if resume_with_manifest else None
+
+    # With dedupe_policy, rows wait until every release is read, and then only one per organization and tax period is written
+    dedupe = new_dedupe() if dedupe_policy else None
+
+    # The CSV is opened when the first rows arrive, so a run that finds nothing leaves output_csv alone
+    output_file = output_writer = None
+    facility_file = facility_writer = None
+    records_written = facility_rows_written = 0
+    # ... except for a shard: the merge expects every shard's files, even when they have no rows
+    if shard:
+        output_file, output_writer = open_csv_output(output_csv, header=shard_key_header + output_header)
+        if facility_table:
+            facility_file, facility_writer = open_csv_output(facility_csv, header=shard_key_header + facility_table_header)
+
+    # Parquet / Arrow output goes to a folder, with one part file per release
+    typed_output = output_format != "csv"
+    if typed_output:
+        output_location = typed_output_folder(output_csv)
+        facility_location = typed_output_folder(facility_csv) if facility_table else None
+    else:
+        output_location = output_csv
+        facility_location = facility_csv
+
+    # With delta_releases, the releases already in the output are skipped and the new ones are added to it;
+    # without a record yet, the output is written from scratch and the record is started
+    record = load_ingested_releases(output_csv, (output_location, facility_location) if typed_output else ()) if delta_releases else None
+    if record is not None and record["releases"] and not os.path.exists(output_location):
+        print(f"{output_location} is gone, so it is written from scratch")
+        record = None
+    appending = manifest is not None or record is not None
+    if record is not None and not typed_output:
+        for path, header in ((output_csv, output_header), (facility_csv, facility_table_header)):
+            if path and os.path.exists(path) and csv_header(path) != header:
+                raise SystemExit(
+                    f"{path} has other columns than the current settings write (selected_columns?). "
+                    f"Delete {ingested_releases_path(output_csv)} to write it from scratch."
+                )
+    if delta_releases and record is None:
+        record = {"releases": {}, "pending": None}
+    elif not delta_releases and not manifest and os.path.exists(ingested_releases_path(output_csv)):
+        # This run writes the output from scratch, so the old record no longer describes it
+        os.remove(ingested_releases_path(output_csv))
+    if typed_output and not appending:
+        remove_typed_output(output_location)
+        if facility_table:
+            remove_typed_output(facility_location)
+
+    # Files that fail go to the error log, which is opened when the first one fails
+    error_log = error_log_writer = None
+    failed_files = 0
+    if not appending and os.path.exists(error_log_path(output_csv)):
+        os.remove(error_log_path(output_csv))
+
+    # With validate_community_benefit, the rows are checked as they are written
+    validation = open_validation(output_csv, append=appending) if validate_community_benefit else None
 
-    df.to_csv(output_csv, index=False)
-    print(f"\nExtraction complete! {len(df)} records saved to: {output_csv}")
-else:
-    print("\nNo valid data found to save.")
\ No newline at end of file
+    report = new_phase_report() if phase_timing else None
+    index = open_filing_index(filing_index_path()) if filing_index else None
+    listings = open_folder_listings(folder_listings_path()) if reuse_folder_listings else None
+
+    # 2) Loop through each release folder (or ZIP file)
+    for release_number, (subfolder_path, is_zip) in enumerate(subfolders):
+        # A ZIP is looked up by its name without ".zip", e.g. "2023_TEOS_XML_01A"
+        subfolder_name = os.path.basename(subfolder_path)[:-4] if is_zip else os.path.basename(subfolder_path)
+
+        release_info = release_info_for(subfolder_name)
+        if record is not None and subfolder_name in record["releases"]:
+            print(f"\nSkipping {subfolder_path}: already in the output ({record['releases'][subfolder_name]['records']} records)")
+            continue
+        ReleaseYear     = release_info["ReleaseYear"]
+        ReleaseSource   = release_info["ReleaseSource"]
+        ReleaseDownload = release_info["ReleaseDownload"]
+        ReleaseFileName = release_info["ReleaseFileName"]
+
+        print(f"\nProcessing subfolder: {subfolder_path}")
+        print(f" => Release Info: Year={ReleaseYear}, Source={ReleaseSource}, FileName={ReleaseFileName}")
+        stats_before = prefilter_stats.copy()
+        versions_before = schema_version_stats.copy()
+        errors_before = typed_value_errors.copy()
+        records_before = records_written
+        failed_before = failed_files
+
+        # Note where the output ends before this release, so the next run can undo an append that was cut off
+        if record is not None:
+            record["pending"] = {
+                "release": subfolder_name,
+                "lengths": {
+                    path: os.path.getsize(path) if os.path.exists(path) and (appending or file is not None) else 0
+                    for path, file in ((output_csv, output_file), (facility_csv, facility_file))
+                    if path and not typed_output
+                },
+                "parts": typed_output_parts((output_location, facility_location)) if typed_output else [],
+            }
+            save_ingested_releases(output_csv, record)
+
+        # 3) List the .xml files inside (or look up the matching ones in the filing index),
+        # split them into chunks, and extract every chunk
+        # fingerprints holds each file's (size, modified time) for the manifest
+        source = os.path.basename(subfolder_path)
+        folder_mtime = None
+        if index:
+            if refresh_filing_index or not release_is_indexed(index, source):
+                index_failures = update_filing_index(index, subfolder_path, is_zip, run_chunks)
+                if index_failures:
+                    if error_log is None:
+                        error_log, error_log_writer = open_csv_output(error_log_path(output_csv), append=True, header=error_log_header)
+                    error_log_writer.writerows(error_log_entries(index_failures, subfolder_path, subfolder_name))
+                    error_log.flush()
+                    failed_files += len(index_failures)
+            file_names, fingerprints = select_from_filing_index(index, source)
+            print(f" => Filing index: {len(file_names):,} filings with a Schedule H match the filters")
+        elif is_zip:
+            file_names, fingerprints = list_release_files(subfolder_path, is_zip)
+        else:
+            saved_listing = saved_folder_listing(listings, subfolder_path) if listings else None
+            if saved_listing:
+                file_names, fingerprints = saved_listing
+                print(f" => Folder listing: {len(file_names):,} XML files, as saved by an earlier run")
+            else:
+                # Saved afterwards with reuse_folder_listings
+                folder_mtime = os.stat(subfolder_path).st_mtime_ns
+                fingerprints = {}
+                file_names = scan_release_folder(subfolder_path, fingerprints if manifest or listings else None)
+
+        # A release's files are taken in name order, not in the order the folder, ZIP or index lists them, so the rows
+        # come out the same on every computer and a merge of shards matches a run on one. A shard keeps only its own files.
+        file_names = shard_files(file_names, shard) if shard else sorted(file_names)
+
+        # Skip files the manifest already has with the same size and modified time
+        previous = manifest_entries(manifest, source) if manifest else {}
+        unchanged_files = 0
+        if previous:
+            listed_files = len(file_names)
+            file_names = [
+                name for name in file_names
+                if name not in previous
+                or previous[name][3] not in manifest_final_outcomes
+                or previous[name][:2] != fingerprints[name]
+            ]
+            unchanged_files = listed_files - len(file_names)
+
+        partition = facility_partition = None
+        manifest_pending = []
+        # Files whose content changed since their row was written, and how many of those old rows can be taken out
+        changed_files = superseded_files = 0
+
+        with tqdm(total=len(file_names)) as progress:
+            for file_count, file_results, chunk_stats, chunk_versions, chunk_timings, chunk_errors, chunk_failures in run_chunks(extract_chunk, make_chunks(subfolder_path, is_zip, file_names, release_info)):
+                # A changed file whose content hash did not change already has its row in the CSV
+                new_results = [
+                    (name, row, facilities, values) for name, outcome, digest, row, facilities, values in file_results
+                    if row and not (name in previous and previous[name][2] == digest and previous[name][3] == "row")
+                ]
+                # ... and one whose content did change has an old row to take out (where its place is known)
+                superseded = superseded_entries(previous, file_results) if previous else []
+                changed_files += len(superseded)
+                superseded = [entry for entry in superseded if entry[4] is not None and not typed_output]
+                superseded_files += len(superseded)
+                if dedupe:
+                    # Written after the last release, see below
+                    add_to_dedupe(dedupe, release_number, release_info, new_results)
+                    new_results = []
+                rows = [row for _, row, _, _ in new_results]
+                facility_rows = [facility_row for _, _, facilities, _ in new_results for facility_row in facilities]
+                if validation and rows:
+                    validate_rows(validation, rows)
+                if shard:
+                    # (release, file name) goes in front, for the merge to sort by
+                    rows = [(source, name, *row) for name, _, _, row, _, _ in file_results if row]
+                    facility_rows = [
+                        (source, name, *facility_row)
+                        for name, _, _, row, facilities, _ in file_results if row for facility_row in facilities
+                    ]
+                records_written += len(rows)
+                facility_rows_written += len(facility_rows)
+                if report:
+                    add_phase_records(report, source, chunk_timings)
+                    write_started = time.perf_counter()
+                if typed_output:
+                    if rows:
+                        if partition is None:
+                            partition = open_typed_partition(output_location, release_info)
+                        write_typed_rows(partition, rows)
+                    if facility_rows:
+                        if facility_partition is None:
+                            facility_partition = open_typed_partition(facility_location, release_info, typed_facility_columns)
+                        write_typed_rows(facility_partition, facility_rows)
+                    # Recorded in the manifest once the part file is complete
+                    manifest_pending.append(file_results)
+                else:
+                    if rows and output_file is None:
+                        output_file, output_writer = open_csv_output(output_csv, append=appending)
+                    if facility_rows and facility_file is None:
+                        facility_file, facility_writer = open_csv_output(
+                            facility_csv, append=appending, header=facility_table_header,
+                        )
+                    # Where each file's rows go, so a later run can take them out again if the file changes
+                    ranges = manifest_row_ranges(new_results, output_file, facility_file) if manifest else None
+                    if rows:
+                        write_csv_rows(output_writer, rows)
+                    if facility_rows:
+                        write_csv_rows(facility_writer, facility_rows)
+                    if manifest:
+                        # Make sure the rows are on disk before the manifest says these files are done
+                        for file in (output_file, facility_file):
+                            if file is not None:
+                                file.flush()
+                                os.fsync(file.fileno())
+                        record_manifest_chunk(
+                            manifest, source, file_results, fingerprints, output_csv, facility_csv, ranges, superseded,
+                        )
+                if report:
+                    add_write_time(report, source, time.perf_counter() - write_started)
+                if chunk_failures:
+                    if error_log is None:
+                        error_log, error_log_writer = open_csv_output(error_log_path(output_csv), append=True, header=error_log_header)
+                    error_log_writer.writerows(error_log_entries(chunk_failures, subfolder_path, subfolder_name))
+                    error_log.flush()
+                    failed_files += len(chunk_failures)
+                prefilter_stats.update(chunk_stats)
+                schema_version_stats.update(chunk_versions)
+                typed_value_errors.update(chunk_errors)
+                progress.update(file_count)
+
+        if partition is not None or facility_partition is not None:
+            if report:
+                write_started = time.perf_counter()
+            for finished_partition in (partition, facility_partition):
+                if finished_partition is not None:
+                    close_typed_partition(finished_partition)
+            if report:
+                add_write_time(report, source, time.perf_counter() - write_started)
+        if manifest and typed_output:
+            for file_results in manifest_pending:
+                record_manifest_chunk(manifest, source, file_results, fingerprints, output_csv, facility_csv)
+        if listings and folder_mtime is not None:
+            save_folder_listing(listings, subfolder_path, folder_mtime, fingerprints)
+        if record is not None:
+            # Every row of the release is on disk now, and only then does it count as added
+            for file in (output_file, facility_file):
+                if file is not None:
+                    file.flush()
+                    os.fsync(file.fileno())
+            record["releases"][subfolder_name] = {
+                "records": records_written - records_before, "ingested": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            record["pending"] = None
+            save_ingested_releases(output_csv, record)
+
+        if previous:
+            print(
+                f" => Manifest: {unchanged_files:,} files unchanged, {progress.n:,} new or changed"
+                + (f" ({changed_files:,} of them with a changed content" if changed_files else "")
+                + (f", {changed_files - superseded_files:,} of whose old rows stay in the output" if changed_files > superseded_files else "")
+                + (")" if changed_files else "")
+            )
+
+        print(f" => Pre-filter: {prefilter_summary(prefilter_stats - stats_before)}")
+        print(f" => Schema versions: {schema_version_summary(schema_version_stats - versions_before)}")
+        if typed_values:
+            print(f" => Malformed values: {typed_value_summary(typed_value_errors - errors_before)}")
+        if failed_files > failed_before:
+            print(f" => Failed: {failed_files - failed_before:,} files, listed in {error_log_path(output_csv)}")
+
+    # 3b) With dedupe_policy, every release's rows are in the spill file now; write the ones that are kept
+    if dedupe:
+        partition = facility_partition = None
+        partition_release = None
+        for release_number, release_info, rows, facility_rows in deduplicated_chunks(dedupe):
+            records_written += len(rows)
+            facility_rows_written += len(facility_rows)
+            if validation and rows:
+                validate_rows(validation, rows)
+            if typed_output:
+                if release_number != partition_release:
+                    for finished_partition in (partition, facility_partition):
+                        if finished_partition is not None:
+                            close_typed_partition(finished_partition)
+                    partition = facility_partition = None
+                    partition_release = release_number
+                if rows:
+                    if partition is None:
+                        partition = open_typed_partition(output_location, release_info)
+                    write_typed_rows(partition, rows)
+                if facility_rows:
+                    if facility_partition is None:
+                        facility_partition = open_typed_partition(facility_location, release_info, typed_facility_columns)
+                    write_typed_rows(facility_partition, facility_rows)
+            else:
+                if rows:
+                    if output_file is None:
+                        output_file, output_writer = open_csv_output(output_csv)
+                    write_csv_rows(output_writer, rows)
+                if facility_rows:
+                    if facility_file is None:
+                        facility_file, facility_writer = open_csv_output(facility_csv, header=facility_table_header)
+                    write_csv_rows(facility_writer, facility_rows)
+        for finished_partition in (partition, facility_partition):
+            if finished_partition is not None:
+                close_typed_partition(finished_partition)
+        print(f"\nDuplicates: {dedupe_summary(dedupe)}")
+
+    print(f"\nPre-filter total: {prefilter_summary(prefilter_stats - stats_at_start)}")
+    print(f"Schema versions total: {schema_version_summary(schema_version_stats - versions_at_start)}")
+    if typed_values:
+        print(f"Malformed values total: {typed_value_summary(typed_value_errors - errors_at_start)}")
+    if failed_files:
+        print(f"Failed files: {failed_files:,}, listed in {error_log_path(output_csv)}")
+        print(' => python "Parsing Code.py" retry extracts just those again and adds their rows')
+    if validation:
+        close_validation(validation)
+        print_validation_summary(validation)
+    if report:
+        print_phase_report(report)
+    if index:
+        index.close()
+    if listings:
+        listings.close()
+
+    # 4) All rows are already in the output, so all that is left is closing it
+    if output_file is not None:
+        output_file.close()
+    if facility_file is not None:
+        facility_file.close()
+    if error_log is not None:
+        error_log.close()
+    if manifest:
+        # The old rows of changed files go last, once their new rows are safely written
+        dropped = drop_superseded_rows(manifest, output_csv, facility_csv)
+        if dropped:
+            print(f"\nManifest: removed the old rows of {dropped:,} changed files from {output_csv}")
+        manifest.close()
+    if appending:
+        print(f"\nExtraction complete! {records_written} new records appended to: {output_location}")
+    elif records_written:
+        print(f"\nExtraction complete! {records_written} records saved to: {output_location}")
+    else:
+        print("\nNo valid data found to save.")
+    if facility_table and (records_written or appending):
+        print(f"{facility_rows_written} facility rows {'appended' if appending else 'saved'} to: {facility_location}")
+    return records_written
+
+def main(shard=None):
+    global parent_folder, output_csv
+    print("Extracting..." if not shard else f"Extracting shard {shard[0]} of {shard[1]}...")
+
+    # Settings that cannot work together stop the run before anything is read
+    if facility_table and extraction_engine != "streaming":
+        raise SystemExit('facility_table = True needs extraction_engine = "streaming"')
+    if dedupe_policy and resume_with_manifest:
+        raise SystemExit("dedupe_policy cannot be combined with resume_with_manifest: rows of earlier runs are already written")
+    if output_format != "csv" and pa is None:
+        raise SystemExit(f'output_format = "{output_format}" needs pyarrow. Install it with: pip install pyarrow')
+    if validate_community_benefit and np is None:
+        raise SystemExit("validate_community_benefit = True needs numpy. Install it with: pip install numpy")
+    if delta_releases and (dedupe_policy or resume_with_manifest):
+        raise SystemExit("delta_releases cannot be combined with dedupe_policy or resume_with_manifest")
+    if shard and (output_format != "csv" or dedupe_policy or resume_with_manifest or delta_releases):
+        raise SystemExit('--shard needs output_format = "csv" and cannot be combined with dedupe_policy, resume_with_manifest or delta_releases')
+
+    # In batch mode every year folder under batch_root_folder gets its own output; otherwise it is just parent_folder
+    years = batch_year_folders() if batch_root_folder else [(parent_folder, output_csv)]
+
+    # The workers open the extraction cache themselves; creating it here first keeps them from racing to do so
+    if extraction_cache:
+        open_extraction_cache(extraction_cache).close()
+
+    # With more than one worker, chunks are spread over a pool of processes; imap returns them in order
+    # The same pool serves every year, so the workers start only once per run
+    pool = multiprocessing.Pool(num_workers) if num_workers is None or num_workers > 1 else None
+    run_chunks = pool.imap if pool else map
+
+    records_written = 0
+    for parent_folder, output_csv in years:
+        if shard:
+            output_csv = shard_output_path(output_csv, shard)
+        if batch_root_folder:
+            print(f"\n=== {os.path.basename(parent_folder)} => {output_csv} ===")
+        records_written += extract_parent_folder(run_chunks, shard)
+
+    if pool:
+        pool.close()
+        pool.join()
+
+    if batch_root_folder:
+        print(f"\nBatch complete! {records_written} records in {len(years)} year outputs")
+        print(f"Pre-filter, all years: {prefilter_summary(prefilter_stats)}")
+    if extraction_cache:
+        cache = open_extraction_cache(extraction_cache)
+        evicted = evict_extraction_cache(cache, extraction_cache_mb * 1024 * 1024)
+        print(f"Extraction cache: {extraction_cache_summary(cache)}" + (f", {evicted:,} least recently used removed" if evicted else ""))
+        cache.close()
+
+if __name__ == "__main__":
+    # python "Parsing Code.py" cache ... looks after the extraction cache instead of extracting
+    # python "Parsing Code.py" --shard 2/4 extracts one shard, and python "Parsing Code.py" merge combines them
+    # python "Parsing Code.py" retry extracts the files in the error log again
+    if sys.argv[1:2] == ["cache"]:
+        extraction_cache_command(sys.argv[2:])
+    elif sys.argv[1:] == ["merge"]:
+        merge_command()
+    elif sys.argv[1:] == ["retry"]:
+        retry_command()
+    else:
+        main(parse_shard(sys.argv[1:]))
@@ -0,0 +1,402 @@
+"""
+Benchmark for "Parsing Code.py".
+It writes a synthetic corpus of IRS 990 XML filings (some with a Schedule H, some without),
+times extract_data on every file and the full folder pipeline, and saves the results as JSON
+so runs can be compared before and after a change.
+
+Usage (from the folder this file is in):
+    python benchmark.py                          # 2,000 filings, default settings
+    python benchmark.py --files 20000 --workers 4 --schedule-h-share 0.1
+    python benchmark.py --compare old.json new.json
+"""
+    # These lines bring in external functionality:
+    #  - argparse: to read the benchmark settings from the command line
+    #  - importlib.util: to load "Parsing Code.py" (its name has a space, so a plain import does not work)
+    #  - json, platform, subprocess: to save the results together with the Python version and git commit
+    #  - random: to build the synthetic filings (always the same ones for the same --seed)
+    #  - resource (not on Windows): to read the peak memory use (RSS)
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+    # Load the parsing script as a module called parsing_code. This runs when this file is imported too,
+    # so worker processes started with "spawn" (Windows, macOS) can find the script's functions.
+script_folder = os.path.dirname(os.path.abspath(__file__))
+spec = importlib.util.spec_from_file_location("parsing_code", os.path.join(script_folder, "Parsing Code.py"))
+parsing_code = importlib.util.module_from_spec(spec)
+sys.modules["parsing_code"] = parsing_code
+spec.loader.exec_module(parsing_code)
+
+    # SYNTHETIC CORPUS
+    # Each filing is a <Return> with a header, an <IRS990> and (for schedule_h_share of them) an <IRS990ScheduleH>
+    # that fills most of the columns the script extracts: Part I/II groups, Part III amounts, management
+    # companies, hospital facilities, facility policies and other health care facilities.
+    # The same seed always gives the same corpus, so results from different commits are comparable.
+efile_namespace = "http://www.irs.gov/efile"
+
+irs990_amounts = [
+    "TotalGrossUBIAmt", "NetUnrelatedBusTxblIncmAmt", "PYContributionsGrantsAmt", "CYContributionsGrantsAmt",
+    "PYProgramServiceRevenueAmt", "CYProgramServiceRevenueAmt", "PYTotalRevenueAmt", "CYTotalRevenueAmt",
+    "PYSalariesCompEmpBnftPaidAmt", "CYSalariesCompEmpBnftPaidAmt", "PYTotalExpensesAmt", "CYTotalExpensesAmt",
+    "PYRevenuesLessExpensesAmt", "CYRevenuesLessExpensesAmt", "TotalAssetsBOYAmt", "TotalAssetsEOYAmt",
+    "TotalLiabilitiesBOYAmt", "TotalLiabilitiesEOYAmt", "NetAssetsOrFundBalancesBOYAmt", "NetAssetsOrFundBalancesEOYAmt",
+]
+
+scheduleH_indicators = [
+    "FinancialAssistancePolicyInd", "WrittenPolicyInd", "AllHospitalsPolicyInd", "Percent200Ind", "Percent400Ind",
+    "FreeCareMedicallyIndigentInd", "FinancialAssistanceBudgetInd", "ExpensesExceedBudgetInd",
+    "UnableToProvideCareInd", "AnnualCommunityBnftReportInd", "ReportPublicallyAvailableInd",
+]
+
+scheduleH_groups = [
+    "FinancialAssistanceAtCostTyp", "UnreimbursedMedicaidGrp", "UnreimbursedCostsGrp", "TotalFinancialAssistanceTyp",
+    "CommunityHealthServicesGrp", "HealthProfessionsEducationGrp", "SubsidizedHealthServicesGrp", "ResearchGrp",
+    "CashAndInKindContributionsGrp", "TotalOtherBenefitsGrp", "TotalCommunityBenefitsGrp",
+    "PhysicalImprvAndHousingGrp", "EconomicDevelopmentGrp", "CommunitySupportGrp", "EnvironmentalImprovementsGrp",
+    "LeadershipDevelopmentGrp", "CoalitionBuildingGrp", "HealthImprovementAdvocacyGrp", "WorkforceDevelopmentGrp",
+    "OtherCommuntityBuildingActyGrp", "TotalCommuntityBuildingActyGrp",
+]
+
+facility_policy_indicators = [
+    "FirstLicensedCYOrPYInd", "TaxExemptHospitalCYOrPYInd", "CHNAConductedInd", "CommunityDefinitionInd",
+    "CommunityDemographicsInd", "ExistingResourcesInd", "OtherInd", "RptAvailableOnOwnWebsiteInd",
+    "ImplementationStrategyAdoptInd", "EligCriteriaExplainedInd", "IncomeLevelCriteriaInd", "OtherMethodInd",
+    "FAPAvailableOnWebsiteInd", "PermitNoActionsInd", "OtherActionsInd", "LookBackMedicareInd", "GrossChargesInd",
+]
+
+def element(tag, *children, text=None):
+    """<tag>text</tag> or <tag> with child elements, as a string."""
+    if text is not None:
+        return f"<{tag}>{text}</{tag}>"
+    return f"<{tag}>" + "".join(children) + f"</{tag}>"
+
+def us_address(rng):
+    return element(
+        "USAddress",
+        element("AddressLine1Txt", text=f"{rng.randint(1, 9999)} MAIN ST"),
+        element("CityNm", text=rng.choice(["SPRINGFIELD", "RIVERSIDE", "FAIRVIEW", "MADISON"])),
+        element("StateAbbreviationCd", text=rng.choice(["CA", "NY", "TX", "IL", "OH", "PA"])),
+        element("ZIPCd", text=f"{rng.randint(10000, 99999)}"),
+    )
+
+def amount(rng):
+    return str(rng.randint(-1000000, 900000000))
+
+def make_schedule_h(rng, facilities):
+    parts = [element(tag, text=rng.choice(["X", "1", "0", "true", "false"])) for tag in scheduleH_indicators]
+    parts.append(element("DiscountedCareOthPercentageGrp", element("DiscountedCareOtherPct", text="300")))
+    for group in scheduleH_groups:
+        parts.append(element(
+            group,
+            element("TotalCommunityBenefitExpnsAmt", text=amount(rng)),
+            element("DirectOffsettingRevenueAmt", text=amount(rng)),
+            element("NetCommunityBenefitExpnsAmt", text=amount(rng)),
+            element("TotalExpensePct", text=f"0.{rng.randint(1, 9999):04d}"),
+        ))
+    parts += [element(tag, text=amount(rng)) for tag in (
+        "BadDebtExpenseAmt", "BadDebtExpenseAttributableAmt", "ReimbursedByMedicareAmt",
+        "CostOfCareReimbursedByMedcrAmt", "MedicareSurplusOrShortfallAmt",
+    )]
+    parts.append(element("CostingMethodologyUsedGrp", element("CostToChargeRatioInd", text="X")))
+    parts.append(element("WrittenDebtCollectionPolicyInd", text="1"))
+    parts.append(element(
+        "ManagementCoAndJntVenturesGrp",
+        element("BusinessName", element("BusinessNameLine1Txt", text="IMAGING PARTNERS LLC")),
+        element("PrimaryActivitiesTxt", text="IMAGING"),
+        element("OrgProfitOrOwnershipPct", text="0.5"),
+        element("PhysiciansProfitOrOwnershipPct", text="0.25"),
+    ))
+    parts.append(element("HospitalFacilitiesCnt", text=str(facilities)))
+    for number in range(1, facilities + 1):
+        parts.append(element(
+            "HospitalFacilitiesGrp",
+            element("FacilityNum", text=str(number)),
+            element("BusinessName", element("BusinessNameLine1Txt", text=f"GENERAL HOSPITAL {number}")),
+            us_address(rng),
+            element("LicensedHospitalInd", text="X"),
+            element("GeneralMedicalAndSurgicalInd", text="X"),
+        ))
+    for _ in range(max(1, facilities)):
+        parts.append(element(
+            "HospitalFcltyPoliciesPrctcGrp",
+            element("FacilityReportingGroupCd", text="A"),
+            element("CHNAConductedYr", text="2019"),
+            element("OwnWebsiteURLTxt", text="WWW.EXAMPLE.ORG"),
+            element("FPGFamilyIncmLmtFreeCarePct", text="200"),
+            *[element(tag, text=rng.choice(["0", "1", "X"])) for tag in facility_policy_indicators],
+        ))
+    parts.append(element(
+        "SupplementalInformationGrp",
+        element("FormAndLineReferenceDesc", text="PART I, LINE 7"),
+        element("ExplanationTxt", text="COSTS ARE BASED ON THE COST TO CHARGE RATIO."),
+    ))
+    parts.append(element(
+        "OthHlthCareFcltsNotHospitalGrp",
+        element(
+            "OthHlthCareFcltsGrp",
+            element("BusinessName", element("BusinessNameLine1Txt", text="COMMUNITY CLINIC")),
+            us_address(rng),
+            element("FacilityTypeDesc", text="OUTPATIENT CLINIC"),
+        ),
+    ))
+    return element("IRS990ScheduleH", *parts)
+
+def make_filing(rng, has_schedule_h=True, facilities=2, padding=0, return_type="990", version="2019v5.1"):
+    """
+    One synthetic filing as UTF-8 bytes.
+    padding adds that many characters of mission text, to mimic the large filings that carry long
+    schedules (Schedule O, J, ...) next to Schedule H.
+    """
+    header = element(
+        "ReturnHeader",
+        element("ReturnTs", text="2020-05-01T00:00:00-05:00"),
+        element("TaxPeriodEndDt", text="2019-12-31"),
+        element("ReturnTypeCd", text=return_type),
+        element("TaxPeriodBeginDt", text="2019-01-01"),
+        element(
+            "Filer",
+            element("EIN", text=str(rng.randint(100000000, 999999999))),
+            element("BusinessName", element("BusinessNameLine1Txt", text="GENERAL HOSPITAL INC")),
+            element("BusinessNameControlTxt", text="GENE"),
+            element("PhoneNum", text="5555555555"),
+            us_address(rng),
+        ),
+        element("PreparerPersonGrp", element("PreparerPersonNm", text="JANE DOE"), element("PreparationDt", text="2020-05-01")),
+        element("TaxYr", text="2019"),
+    )
+    irs990 = [element("TotalEmployeeCnt", text=str(rng.randint(10, 20000)))]
+    irs990 += [element(tag, text=amount(rng)) for tag in irs990_amounts]
+    if padding:
+        irs990.append(element("ActivityOrMissionDesc", text="TO IMPROVE THE HEALTH OF OUR COMMUNITY. " * (padding // 41 + 1)))
+    documents = [element("IRS990", *irs990)]
+    if has_schedule_h:
+        documents.append(make_schedule_h(rng, facilities))
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        f'<Return xmlns="{efile_namespace}" returnVersion="{version}">'
+        + header + element("ReturnData", *documents) + "</Return>"
+    ).encode("utf-8")
+
+def write_corpus(folder, files, seed=0, schedule_h_share=0.5, facilities=(0, 6), padding=(0, 20000), as_zip=False):
+    """
+    Write files synthetic filings into folder (or into folder + ".zip" with as_zip).
+    facilities and padding are (low, high) ranges each filing picks from. Returns the total size in bytes.
+    """
+    rng = random.Random(seed)
+    total_bytes = 0
+    archive = zipfile.ZipFile(folder + ".zip", "w", zipfile.ZIP_DEFLATED) if as_zip else None
+    if not as_zip:
+        os.makedirs(folder, exist_ok=True)
+    for i in range(files):
+        content = make_filing(
+            rng,
+            has_schedule_h=rng.random() < schedule_h_share,
+            facilities=rng.randint(*facilities),
+            padding=rng.randint(*padding),
+        )
+        name = f"2020{i:014d}_public.xml"
+        if archive:
+            archive.writestr(name, content)
+        else:
+            with open(os.path.join(folder, name), "wb") as file:
+                file.write(content)
+        total_bytes += len(content)
+    if archive:
+        archive.close()
+    return total_bytes
+
+    # MEASUREMENTS
+    # Latencies are per file, in milliseconds. Peak RSS is the most memory the process ever used,
+    # so it covers everything run before it in the same benchmark.
+def peak_rss_mb():
+    """Peak memory (RSS) of this process and of finished worker processes, in MB. None where it cannot be read."""
+    if resource is None:
+        return None
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale / 2**20,
+    }
+
+def percentiles(values, points=(50, 90, 99)):
+    """{"p50": ..., "p90": ..., "p99": ..., "max": ...} of a list of numbers (nearest rank)."""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    result = {f"p{p}": ordered[min(len(ordered) - 1, round(p / 100 * (len(ordered) - 1)))] for p in points}
+    result["max"] = ordered[-1]
+    return result
+
+def throughput(files, total_bytes, seconds):
+    return {
+        "files": files,
+        "megabytes": total_bytes / 2**20,
+        "seconds": seconds,
+        "files_per_second": files / seconds if seconds else None,
+        "megabytes_per_second": total_bytes / 2**20 / seconds if seconds else None,
+    }
+
+def benchmark_extract_data(folder, engine, repeat=1):
+    """Time extract_data on every file in folder, one at a time in this process."""
+    release = ("2020", "https://example.org/2020_TEOS_XML_CT1.zip", "2020-01-01", "2020_TEOS_XML_CT1.zip")
+    paths = sorted(os.path.join(folder, name) for name in os.listdir(folder) if name.endswith(".xml"))
+    total_bytes = sum(os.path.getsize(path) for path in paths) * repeat
+    latencies = []
+    rows = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for path in paths:
+            file_started = time.perf_counter()
+            row = parsing_code.extract_data(path, *release, engine=engine)
+            latencies.append((time.perf_counter() - file_started) * 1000)
+            rows += row is not None
+    result = throughput(len(latencies), total_bytes, time.perf_counter() - started)
+    result["rows"] = rows
+    result["latency_ms"] = percentiles(latencies)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+def benchmark_pipeline(parent_folder, total_bytes, files, settings):
+    """Run the script's whole main() on parent_folder with the given settings and time it."""
+    output_folder = tempfile.mkdtemp(prefix="benchmark_output_")
+    for name, value in settings.items():
+        setattr(parsing_code, name, value)
+    parsing_code.parent_folder = parent_folder
+    parsing_code.output_csv = os.path.join(output_folder, "benchmark.csv")
+    parsing_code.prefilter_stats.clear()
+    started = time.perf_counter()
+    parsing_code.main()
+    result = throughput(files, total_bytes, time.perf_counter() - started)
+    result["prefilter"] = dict(parsing_code.prefilter_stats)
+    result["peak_rss_mb"] = peak_rss_mb()
+    shutil.rmtree(output_folder, ignore_errors=True)
+    return result
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=script_folder, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare_results(old_path, new_path):
+    """Print the files/sec of two saved results side by side."""
+    with open(old_path) as file:
+        old = json.load(file)
+    with open(new_path) as file:
+        new = json.load(file)
+    print(f"{'':<16}{old.get('commit') or old_path:>14}{new.get('commit') or new_path:>14}{'change':>10}")
+    for stage in ("extract_data", "pipeline"):
+        if stage in old and stage in new:
+            a, b = old[stage]["files_per_second"], new[stage]["files_per_second"]
+            print(f"{stage + ' files/s':<16}{a:>14,.1f}{b:>14,.1f}{(b / a - 1) * 100:>+9.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the IRS 990 Schedule H extraction on a synthetic corpus.")
+    parser.add_argument("--files", type=int, default=2000, help="number of synthetic filings (default 2000)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed; the same seed gives the same corpus")
+    parser.add_argument("--schedule-h-share", type=float, default=0.5, help="share of filings with a Schedule H (default 0.5)")
+    parser.add_argument("--facilities", type=int, nargs=2, default=(0, 6), metavar=("MIN", "MAX"), help="hospital facilities per Schedule H")
+    parser.add_argument("--padding", type=int, nargs=2, default=(0, 20000), metavar=("MIN", "MAX"), help="extra characters per filing")
+    parser.add_argument("--engine", default=parsing_code.extraction_engine, choices=["streaming", "soup"])
+    parser.add_argument("--workers", type=int, default=1, help="num_workers for the pipeline run")
+    parser.add_argument("--chunk-size", type=int, default=parsing_code.chunk_size)
+    parser.add_argument("--zip", action="store_true", help="run the pipeline on a ZIP file instead of a folder")
+    parser.add_argument("--repeat", type=int, default=1, help="how many times to time extract_data over the corpus")
+    parser.add_argument("--skip-extract", action="store_true", help="only run the pipeline")
+    parser.add_argument("--skip-pipeline", action="store_true", help="only time extract_data")
+    parser.add_argument("--corpus", help="folder to keep the corpus in (default: a temporary folder, deleted afterwards)")
+    parser.add_argument("--output", help="where to save the JSON results (default: benchmark_<commit>_<time>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two saved result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_results(*args.compare)
+        return
+
+    corpus_parent = args.corpus or tempfile.mkdtemp(prefix="benchmark_corpus_")
+    corpus_folder = os.path.join(corpus_parent, "2020_TEOS_XML_CT1")
+    corpus = {
+        "files": args.files,
+        "seed": args.seed,
+        "schedule_h_share": args.schedule_h_share,
+        "facilities": list(args.facilities),
+        "padding": list(args.padding),
+    }
+    print(f"Writing {args.files:,} synthetic filings to {corpus_folder} ...")
+    total_bytes = write_corpus(
+        corpus_folder, args.files, args.seed, args.schedule_h_share, tuple(args.facilities), tuple(args.padding)
+    )
+    if args.zip:
+        pipeline_parent = os.path.join(corpus_parent, "zip")
+        os.makedirs(pipeline_parent, exist_ok=True)
+        write_corpus(
+            os.path.join(pipeline_parent, "2020_TEOS_XML_CT1"), args.files, args.seed,
+            args.schedule_h_share, tuple(args.facilities), tuple(args.padding), as_zip=True,
+        )
+    else:
+        pipeline_parent = corpus_parent
+
+    results = {
+        "commit": git_commit(),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "corpus": corpus,
+    }
+    try:
+        if not args.skip_extract:
+            print(f"Timing extract_data ({args.engine}) ...")
+            results["extract_data"] = benchmark_extract_data(corpus_folder, args.engine, args.repeat)
+            results["extract_data"]["engine"] = args.engine
+        if not args.skip_pipeline:
+            settings = {
+                "extraction_engine": args.engine,
+                "num_workers": args.workers,
+                "chunk_size": args.chunk_size,
+                "read_zip_archives": args.zip,
+                "resume_with_manifest": False,
+                "output_format": "csv",
+            }
+            print(f"Running the full pipeline ({args.workers} worker(s)) ...")
+            results["pipeline"] = benchmark_pipeline(pipeline_parent, total_bytes, args.files, settings)
+            results["pipeline"]["settings"] = settings
+    finally:
+        if not args.corpus:
+            shutil.rmtree(corpus_parent, ignore_errors=True)
+
+    for stage in ("extract_data", "pipeline"):
+        if stage in results:
+            r = results[stage]
+            line = f"{stage}: {r['files_per_second']:,.1f} files/s, {r['megabytes_per_second']:,.2f} MB/s"
+            if "latency_ms" in r:
+                line += ", latency ms " + ", ".join(f"{k} {v:.2f}" for k, v in r["latency_ms"].items())
+            print(line)
+    rss = peak_rss_mb()
+    if rss:
+        print(f"Peak RSS: {rss['self']:.0f} MB in this process, {rss['children']:.0f} MB in worker processes")
+
+    output = args.output or f"benchmark_{results['commit'] or 'nogit'}_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"Results saved to: {output}")
+
+if __name__ == "__main__":
+    main()